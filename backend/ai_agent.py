@@ -132,15 +132,39 @@
 
 import os
 import re
+import sys
+import json
 import time
+import hashlib
+import asyncio
+import threading
+import contextvars
 from dotenv import load_dotenv
-from urllib.parse import quote_plus
-from langchain_community.utilities import SQLDatabase
 from langchain_openai import ChatOpenAI
 from langchain_community.tools import QuerySQLDatabaseTool
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from sqlalchemy import create_engine, text
+from sqlalchemy import text, inspect, Date, DateTime
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from cache import TTLCache, canonical_question_key
+from metrics import RollingStats, stage, start_trace, stage_metrics, render_prometheus
+from schema_retriever import SchemaRetriever
+from sql_templates import SQLTemplateCache
+from fast_path import FastPathRouter
+from answer_format import format_answer
+from results import make_result, render_for_prompt
+from sql_utils import bound_limit, strip_limit, inline_params, referenced_tables, table_aliases, with_execution_time_hint
+from singleflight import SingleFlight, AsyncSingleFlight
+from stats_service import StatsService, load_metric_catalogue
+from health import HealthProber
+from llm_governor import GovernedChatOpenAI, shared_governor
+from sessions import SessionStore, is_follow_up
+from cost_guard import CostGuard, summarize_plan, parse_active_hours
+from sql_log import SQLLog
+from query_cache import QueryResultCache, probe_versions, probe_versions_async
+from db import get_engine, get_async_engine, get_sql_database, pool_stats
+from db import get_read_engine, get_read_async_engine, pick_replica, record_read, engine_for, async_engine_for, replicas, replica_stats
 
 # Load environment variables
 load_dotenv()
@@ -161,57 +185,133 @@ if not OPENAI_API_KEY:
 
 os.environ["OPENAI_API_KEY"] = OPENAI_API_KEY
 
-# ---------------------------
-# MySQL Connection URI
-# ---------------------------
-user = quote_plus(MYSQL_USER)
-password = quote_plus(MYSQL_PASSWORD)
-mysql_uri = f"mysql+pymysql://{user}:{password}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DB}"
-
-print("=" * 70)
-print("🤖 JETKING ENHANCED AI AGENT (WITH QUERY NORMALIZATION)")
-print("=" * 70)
-print("🔗 Connecting to MySQL...")
+# Answer cache settings
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "600"))
+ANSWER_CACHE_MAX_SIZE = int(os.getenv("ANSWER_CACHE_MAX_SIZE", "1000"))
+
+# SQL generation pipeline: "two_step" (normalize, then generate) or "fused" (single call)
+PIPELINE_MODES = ("two_step", "fused")
+DEFAULT_PIPELINE_MODE = os.getenv("PIPELINE_MODE", "two_step")
+
+# Schema pruning: send only the top-k relevant tables (plus join partners) to the LLM
+SCHEMA_PRUNING = os.getenv("SCHEMA_PRUNING", "true").lower() == "true"
+SCHEMA_TOP_K = int(os.getenv("SCHEMA_TOP_K", "4"))
+
+# SQL template cache: reuse validated SQL for questions with the same normalized shape
+SQL_TEMPLATE_CACHE = os.getenv("SQL_TEMPLATE_CACHE", "true").lower() == "true"
+SQL_TEMPLATE_TTL = float(os.getenv("SQL_TEMPLATE_TTL", "3600"))
+SQL_TEMPLATE_MAX_SIZE = int(os.getenv("SQL_TEMPLATE_MAX_SIZE", "500"))
+
+# Fast path: answer catalogued common questions with precompiled SQL and no LLM call
+FAST_PATH = os.getenv("FAST_PATH", "true").lower() == "true"
+FAST_PATH_CATALOGUE = os.getenv("FAST_PATH_CATALOGUE")  # optional JSON file of extra routes
+
+# Answer rendering: "llm" (answer_chain), "template" (local formatting, LLM only for
+# large results) or "none" (data only)
+ANSWER_MODES = ("llm", "template", "none")
+DEFAULT_ANSWER_MODE = os.getenv("ANSWER_MODE", "llm")
+TEMPLATE_MAX_ROWS = int(os.getenv("TEMPLATE_MAX_ROWS", "20"))
+
+# Structured results: row cap per query and token budget for results in the answer prompt
+MAX_RESULT_ROWS = int(os.getenv("MAX_RESULT_ROWS", "100"))
+ANSWER_PROMPT_TOKENS = int(os.getenv("ANSWER_PROMPT_TOKENS", "800"))
+MAX_RESULT_BYTES = int(os.getenv("MAX_RESULT_BYTES", "262144"))
+FETCH_BATCH_SIZE = int(os.getenv("FETCH_BATCH_SIZE", "50"))
+
+# Query result cache: rows per SQL fingerprint, dropped when a referenced table changes
+RESULT_CACHE = os.getenv("RESULT_CACHE", "true").lower() == "true"
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "300"))
+RESULT_CACHE_MAX_SIZE = int(os.getenv("RESULT_CACHE_MAX_SIZE", "500"))
+RESULT_CACHE_VERSION_INTERVAL = float(os.getenv("RESULT_CACHE_VERSION_INTERVAL", "5"))
+
+# Cost guard: EXPLAIN generated SQL, then rewrite or reject queries over these estimates
+COST_GUARD = os.getenv("COST_GUARD", "true").lower() == "true"
+COST_GUARD_MAX_ROWS = int(os.getenv("COST_GUARD_MAX_ROWS", "1000000"))
+COST_GUARD_MAX_SCAN_ROWS = int(os.getenv("COST_GUARD_MAX_SCAN_ROWS", "20000"))
+COST_GUARD_REWRITE_LIMIT = int(os.getenv("COST_GUARD_REWRITE_LIMIT", "20"))
+COST_GUARD_DATE_RANGE_DAYS = int(os.getenv("COST_GUARD_DATE_RANGE_DAYS", "90"))
+COST_GUARD_ACTIVE_HOURS = os.getenv("COST_GUARD_ACTIVE_HOURS")  # e.g. "9-19"; unset = always enforced
+
+# Deadlines: MySQL execution limit per generated query and overall budget per request
+QUERY_TIMEOUT_SECONDS = float(os.getenv("QUERY_TIMEOUT_SECONDS", "30"))
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("REQUEST_TIMEOUT_SECONDS", "120"))
+
+# Read replicas (MYSQL_REPLICA_URIS in db.py): generated SQL goes to the least-loaded
+# healthy replica, unless the request asks for fresh data or the question is about
+# very recent activity, which reads from the primary
+FRESHNESS_ROUTING = os.getenv("FRESHNESS_ROUTING", "true").lower() == "true"
+REPLICA_HEALTH_INTERVAL = float(os.getenv("REPLICA_HEALTH_INTERVAL", "10"))
+
+# Executed-SQL log: every statement with its latency, as JSONL for scripts/index_advisor.py
+# (set SQL_LOG_PATH to an empty string to disable)
+SQL_LOG_PATH = os.getenv("SQL_LOG_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs", "executed_sql.jsonl"))
+SQL_LOG_MAX_BYTES = int(os.getenv("SQL_LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+
+# Paginated results: validated SQL kept per result id for /results/{id}
+RESULT_STORE_TTL = float(os.getenv("RESULT_STORE_TTL", "3600"))
+RESULT_STORE_MAX_SIZE = int(os.getenv("RESULT_STORE_MAX_SIZE", "1000"))
+RESULT_PAGE_SIZE = int(os.getenv("RESULT_PAGE_SIZE", "50"))
+RESULT_MAX_PAGE_SIZE = int(os.getenv("RESULT_MAX_PAGE_SIZE", "500"))
+
+# Conversation sessions: recent turns per session id, LRU-evicted by count and total size
+SESSION_MAX = int(os.getenv("SESSION_MAX", "1000"))
+SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "5"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(8 * 1024 * 1024)))
+
+# Summary statistics: aggregates refreshed in the background and served from a snapshot
+STATS_REFRESH_SECONDS = float(os.getenv("STATS_REFRESH_SECONDS", "300"))
+STATS_METRICS_FILE = os.getenv("STATS_METRICS_FILE")  # optional JSON file of extra metrics
+
+# Health probing: dependencies are probed in the background; /health serves the cached status
+HEALTH_DB_INTERVAL = float(os.getenv("HEALTH_DB_INTERVAL", "15"))
+HEALTH_LLM_INTERVAL = float(os.getenv("HEALTH_LLM_INTERVAL", "60"))
+HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "10"))
+
+# Batch questions: default and maximum number of questions answered concurrently
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))
+
+# Long text values in query results are shortened to this many characters
+MAX_STRING_LENGTH = 100
 
 # ---------------------------
-# Create SQLAlchemy Engine (for health checks)
+# Connections (created by warm_up(), not at import)
 # ---------------------------
-try:
-    engine = create_engine(
-        mysql_uri,
-        pool_pre_ping=True,
-        pool_recycle=3600,
-        echo=False
-    )
+# Engines and pools are shared process-wide through db.py (MYSQL_POOL_* settings)
+engine = None
+db = None
+async_engine = None
+
+def _connect_database():
+    """Warm-up step: shared SQLAlchemy engine plus a test connection"""
+    global engine
+    print("🔗 Connecting to MySQL...")
+    engine = get_engine()
     
     # Test connection
     with engine.connect() as conn:
         conn.execute(text("SELECT 1"))
     
     print("✅ MySQL connection established successfully")
-    
-except Exception as e:
-    print(f"❌ Database connection error: {e}")
-    raise
 
-# ---------------------------
-# MySQL Connection with LangChain
-# ---------------------------
-try:
-    db = SQLDatabase.from_uri(
-        mysql_uri,
+def _reflect_database():
+    """Warm-up step: LangChain SQLDatabase (reflects every table) and the query tool"""
+    global db, execute_query
+    db = get_sql_database(
         view_support=True,
         sample_rows_in_table_info=2,
-        max_string_length=100,
+        max_string_length=MAX_STRING_LENGTH,
     )
     
     available_tables = db.get_usable_table_names()
     print(f"✅ Connected! Found {len(available_tables)} tables")
     print(f"📋 Tables: {', '.join(available_tables[:15])}...")
-    
-except Exception as e:
-    print(f"❌ Database connection error: {e}")
-    raise
+    execute_query = LimitedQueryTool(db=db)
+
+def _create_async_engine():
+    """Warm-up step: async engine (aiomysql, used by the FastAPI routes)"""
+    global async_engine
+    async_engine = get_async_engine()
 
 # ---------------------------
 # Build Enhanced Schema Information (ALL TABLES)
@@ -426,18 +526,46 @@ ORDER BY student_count DESC
 """
     return schema_info
 
-ENHANCED_SCHEMA = build_enhanced_schema()
-print("✅ Enhanced schema with ALL tables loaded successfully")
+# ---------------------------
+# Relevance-Based Schema Pruning
+# ---------------------------
+ENHANCED_SCHEMA = None
+schema_retriever = None
+
+def _build_schema():
+    """Warm-up step: schema block and its relevance index"""
+    global ENHANCED_SCHEMA, schema_retriever
+    ENHANCED_SCHEMA = build_enhanced_schema()
+    print("✅ Enhanced schema with ALL tables loaded successfully")
+    schema_retriever = SchemaRetriever(ENHANCED_SCHEMA, top_k=SCHEMA_TOP_K)
+    print(f"✅ Schema index built ({len(schema_retriever.chunks)} tables, {schema_retriever.full_tokens} tokens in full schema)")
+
+def select_schema(query: str):
+    """Return the schema block to send with a prompt for this query"""
+    if not SCHEMA_PRUNING:
+        return ENHANCED_SCHEMA
+    with stage("schema_selection"):
+        return schema_retriever.schema_for(query)
+
+def llm_stats():
+    """Return the LLM governor's budgets, concurrency limit and throttling counters"""
+    return shared_governor().stats()
+
+def db_pool_stats():
+    """Return checkout wait percentiles, timeouts and utilization of the primary and replica MySQL pools"""
+    return pool_stats()
+
+def schema_stats():
+    """Return token savings of schema pruning"""
+    if schema_retriever is None:
+        return {"enabled": SCHEMA_PRUNING, "ready": False}
+    return {"enabled": SCHEMA_PRUNING, **schema_retriever.stats()}
 
 # ---------------------------
 # Initialize LLM
 # ---------------------------
-llm = ChatOpenAI(
-    temperature=0,
-    model_name="gpt-4o-mini",
-    request_timeout=90,
-    max_retries=3
-)
+# The client and the chains using it are created by _build_llm() during warm-up
+llm = None
 
 # ---------------------------
 # Query Normalization Layer
@@ -521,8 +649,6 @@ User Question: {question}
 """
 )
 
-normalize_chain = normalization_prompt | llm | StrOutputParser()
-
 # ---------------------------
 # SQL Generation with Enhanced Prompts
 # ---------------------------
@@ -578,7 +704,8 @@ Return only the SQL query:"""
 def normalize_query(question):
     """Normalize and understand user's natural language question"""
     try:
-        normalized = normalize_chain.invoke({"question": question})
+        with stage("normalize"):
+            normalized = normalize_chain.invoke({"question": question})
         print(f"\n🔍 Normalized Query Analysis:")
         print(normalized)
         return normalized
@@ -586,35 +713,186 @@ def normalize_query(question):
         print(f"⚠️ Normalization warning: {e}")
         return f"Intent: general_query\nNormalized Question: {question}"
 
-def generate_sql(question):
+def generate_sql(question, mode: str = None):
     """Generate SQL with normalization and validation"""
+    return plan_query(question, mode)["sql"]
+
+def plan_query(question, mode: str = None):
+    """
+    Produce the normalized analysis and validated SQL for a question.
+    
+    In "fused" mode a single structured LLM call returns intent, tables and
+    SQL together; if that output fails validation the two-step path is used.
+    
+    Returns:
+        dict: sql, normalized_info, pipeline_mode and fallback flag
+    """
+    mode = resolve_pipeline_mode(mode)
+    
+    if mode == "fused":
+        try:
+            plan = generate_sql_fused(question)
+            return {**plan, "pipeline_mode": "fused", "fallback": False}
+        except Exception as e:
+            print(f"⚠️ Fused generation failed, falling back to two-step: {e}")
+            plan = generate_sql_two_step(question)
+            return {**plan, "pipeline_mode": "two_step", "fallback": True}
+    
+    plan = generate_sql_two_step(question)
+    return {**plan, "pipeline_mode": "two_step", "fallback": False}
+
+def resolve_pipeline_mode(mode: str = None):
+    """Validate the requested pipeline mode, defaulting to PIPELINE_MODE"""
+    mode = mode or DEFAULT_PIPELINE_MODE
+    if mode not in PIPELINE_MODES:
+        raise ValueError(f"Unknown pipeline mode '{mode}'. Use one of: {', '.join(PIPELINE_MODES)}")
+    return mode
+
+def clean_llm_sql(raw_sql):
+    """Strip markdown fences from LLM output"""
+    return raw_sql.strip().removeprefix("```sql").removeprefix("```").removesuffix("```").strip()
+
+def generate_sql_two_step(question):
+    """Normalize the question, then generate SQL from the normalized analysis"""
+    normalized_info = normalize_query(question)
+    return sql_from_normalized(normalized_info)
+
+def sql_from_normalized(normalized_info):
+    """Generate and validate SQL from a normalized analysis, reusing cached templates"""
     try:
-        # Step 1: Normalize the query
-        normalized_info = normalize_query(question)
+        # Step 1: Reuse a cached template with the same intent/tables/filters shape
+        templated = _sql_from_template(normalized_info)
+        if templated is not None:
+            return templated
         
         # Step 2: Generate SQL from normalized query
-        raw_sql = (enhanced_sql_prompt | llm | StrOutputParser()).invoke({
-            "schema": ENHANCED_SCHEMA,
-            "normalized_info": normalized_info
-        })
-        
-        # Step 3: Clean SQL
-        sql = raw_sql.strip().removeprefix("```sql").removeprefix("```").removesuffix("```").strip()
+        schema = select_schema(normalized_info)
+        started = time.perf_counter()
+        with stage("sql_generation"):
+            raw_sql = sql_chain.invoke({"schema": schema, "normalized_info": normalized_info})
+        generation_ms = (time.perf_counter() - started) * 1000
         
-        # Step 4: Validate SQL
-        sql = validate_and_clean_sql(sql)
+        # Step 3: Clean and validate SQL
+        sql = validate_and_clean_sql(clean_llm_sql(raw_sql))
+        _store_sql_template(normalized_info, sql, generation_ms)
         
         print(f"\n📝 Generated SQL:")
         print(sql)
-        return sql
+        return {"sql": sql, "normalized_info": normalized_info, "template_hit": False}
         
     except Exception as e:
         print(f"❌ SQL Generation Error: {e}")
         raise ValueError(f"Failed to generate valid SQL: {str(e)}")
 
+# ---------------------------
+# SQL Template Cache
+# ---------------------------
+sql_template_cache = SQLTemplateCache(max_size=SQL_TEMPLATE_MAX_SIZE, ttl=SQL_TEMPLATE_TTL)
+
+def _sql_from_template(normalized_info):
+    """Bind the normalized filter values into a cached SQL template, if one matches"""
+    if not SQL_TEMPLATE_CACHE:
+        return None
+    with stage("sql_template"):
+        sql = sql_template_cache.lookup(normalized_info)
+    if sql is None:
+        return None
+    try:
+        sql = validate_and_clean_sql(sql)
+    except ValueError as e:
+        print(f"⚠️ Template binding rejected: {e}")
+        return None
+    print(f"\n⚡ SQL template hit:")
+    print(sql)
+    return {"sql": sql, "normalized_info": normalized_info, "template_hit": True}
+
+def _store_sql_template(normalized_info, sql, generation_ms):
+    if SQL_TEMPLATE_CACHE:
+        sql_template_cache.store(normalized_info, sql, generation_ms)
+
+def template_stats():
+    """Return SQL template hit rates and LLM time avoided"""
+    return {"enabled": SQL_TEMPLATE_CACHE, **sql_template_cache.stats()}
+
+# ---------------------------
+# Fused Generation (single LLM call)
+# ---------------------------
+fused_sql_prompt = PromptTemplate.from_template(
+    """You are an expert MySQL query generator for a training institute database.
+Analyze the user's question and write the SQL for it in one step.
+
+Schema Information:
+{schema}
+
+User Question: {question}
+
+Intents: count_records, list_records, find_specific, aggregate_data, compare_data, trend_analysis
+
+SQL RULES:
+1. Read-only: the query must start with SELECT
+2. Text search: WHERE LOWER(column) LIKE LOWER('%text%')
+3. Status: WHERE status = 1 or is_active = 1
+4. Use proper foreign keys and table aliases for joins
+5. Always include GROUP BY for non-aggregated columns
+6. Add LIMIT 100 for large result sets (unless COUNT)
+
+Respond with a single JSON object and nothing else:
+{{"intent": "<intent>", "tables": ["<table>", ...], "entities": "<key entities>", "filters": "<conditions>", "aggregation": "<aggregation or None>", "normalized_question": "<clear rewritten question>", "sql": "<MySQL query>"}}
+"""
+)
+
+FUSED_REQUIRED_KEYS = ("intent", "tables", "normalized_question", "sql")
+
+def parse_fused_output(raw):
+    """Parse and validate the structured output of the fused prompt"""
+    text_out = raw.strip().removeprefix("```json").removeprefix("```").removesuffix("```").strip()
+    start, end = text_out.find("{"), text_out.rfind("}")
+    if start == -1 or end == -1:
+        raise ValueError("Fused output is not a JSON object")
+    
+    payload = json.loads(text_out[start:end + 1])
+    missing = [key for key in FUSED_REQUIRED_KEYS if not payload.get(key)]
+    if missing:
+        raise ValueError(f"Fused output missing fields: {', '.join(missing)}")
+    
+    tables = payload["tables"]
+    if isinstance(tables, str):
+        tables = [t.strip() for t in tables.split(",") if t.strip()]
+    if not isinstance(tables, list) or not tables:
+        raise ValueError("Fused output has no tables")
+    
+    sql = validate_and_clean_sql(clean_llm_sql(str(payload["sql"])))
+    if not any(re.search(rf'\b{re.escape(str(t))}\b', sql, re.IGNORECASE) for t in tables):
+        raise ValueError("Fused SQL does not reference any of the declared tables")
+    
+    normalized_info = "\n".join([
+        f"Intent: {payload['intent']}",
+        f"Tables: {', '.join(str(t) for t in tables)}",
+        f"Entities: {payload.get('entities') or 'None'}",
+        f"Filters: {payload.get('filters') or 'None'}",
+        f"Aggregation: {payload.get('aggregation') or 'None'}",
+        f"Normalized Question: {payload['normalized_question']}",
+    ])
+    return {"sql": sql, "normalized_info": normalized_info}
+
+def generate_sql_fused(question):
+    """Generate intent, tables and SQL with a single structured LLM call"""
+    schema = select_schema(question)
+    with stage("sql_generation"):
+        raw = fused_chain.invoke({"schema": schema, "question": question})
+    plan = parse_fused_output(raw)
+    print(f"\n🔍 Fused Query Analysis:")
+    print(plan["normalized_info"])
+    print(f"\n📝 Generated SQL:")
+    print(plan["sql"])
+    return plan
+
 def validate_and_clean_sql(sql):
     """Comprehensive SQL validation and cleaning"""
-    
+    with stage("validation"):
+        return _check_sql(sql)
+
+def _check_sql(sql):
     # 1. Remove comments
     sql = re.sub(r'--.*', '', sql)
     sql = re.sub(r'/\*.*?\*/', '', sql, flags=re.S)
@@ -645,29 +923,468 @@ def validate_and_clean_sql(sql):
     
     return sql
 
+# ---------------------------
+# Follow-Up Refinement
+# ---------------------------
+# A follow-up in a session edits the previous SQL instead of rerunning
+# normalization; the prompt carries only the tables that SQL uses.
+refine_sql_prompt = PromptTemplate.from_template(
+    """You are editing a MySQL query so it answers a follow-up question.
+
+{schema}
+
+Previous question: {previous_question}
+Previous SQL:
+{previous_sql}
+Previous result: {row_count} rows with columns {columns}
+
+Follow-up question: {question}
+
+Rewrite the previous SQL to answer the follow-up. Keep every part the follow-up
+does not change. Use only tables and columns shown above. Return only the SQL query:"""
+)
+
+def _refine_schema(question, previous):
+    """Schema for the previous SQL's tables, plus any other table the follow-up names"""
+    tables = [t for t in previous["tables"] if t in schema_retriever.chunks]
+    lowered = question.lower()
+    tables += [
+        t for t in schema_retriever.chunks
+        if t not in tables and (t.lower() in lowered or t.lower().rstrip("s") in lowered)
+    ]
+    if not tables:
+        return select_schema(f"{previous['question']}\n{question}")
+    return schema_retriever.render(tables)
+
+def _refine_inputs(question, previous):
+    return {
+        "schema": _refine_schema(question, previous),
+        "previous_question": previous["question"],
+        "previous_sql": previous["sql"],
+        "row_count": previous["row_count"],
+        "columns": ", ".join(previous["columns"]) or "none",
+        "question": question,
+    }
+
+def _refine_plan(question, previous, raw_sql):
+    sql = validate_and_clean_sql(clean_llm_sql(raw_sql))
+    print(f"\n📝 Refined SQL:")
+    print(sql)
+    normalized_info = f"{previous.get('normalized_info') or previous['question']}\nFollow-up: {question}"
+    return {
+        "sql": sql,
+        "normalized_info": normalized_info,
+        "pipeline_mode": "refine",
+        "fallback": False,
+        "template_hit": False
+    }
+
+def refine_query(question, previous):
+    """Edit the previous turn's SQL for a follow-up question"""
+    try:
+        inputs = _refine_inputs(question, previous)
+        with stage("sql_generation"):
+            raw_sql = refine_chain.invoke(inputs)
+        return _refine_plan(question, previous, raw_sql)
+    except Exception as e:
+        print(f"❌ SQL Refinement Error: {e}")
+        raise ValueError(f"Failed to refine the previous query: {str(e)}")
+
 # ---------------------------
 # Query Execution with Limits
 # ---------------------------
+def apply_row_limit(query: str, limit: int = 100):
+    """Bound every SELECT (including GROUP BY/aggregates) to at most `limit` rows"""
+    if "SELECT" in query.upper():
+        query = bound_limit(query, limit)
+    return query
+
+def _row_size(row):
+    """Approximate in-memory size of a row in bytes"""
+    return sum(len(str(value)) for value in row if value is not None) + len(row)
+
+class BoundedReader:
+    """Accumulates streamed batches until the row or byte cap is reached"""
+    
+    def __init__(self, max_rows: int = None, max_bytes: int = None):
+        self.max_rows = max_rows or MAX_RESULT_ROWS
+        self.max_bytes = max_bytes or MAX_RESULT_BYTES
+        self.rows = []
+        self.size = 0
+        self.truncated = False
+    
+    def add(self, batch):
+        """Add a batch; returns False once no more rows should be read"""
+        if not batch:
+            return False
+        for row in batch:
+            if len(self.rows) >= self.max_rows:
+                self.truncated = True
+                return False
+            self.size += _row_size(row)
+            if self.size > self.max_bytes and self.rows:
+                self.truncated = True
+                return False
+            self.rows.append(row)
+        return True
+
+def truncate_result(result: str):
+    """Truncate very long results"""
+    if len(result) > 6000:
+        result = result[:6000] + "\n... (truncated for readability. Use more specific filters.)"
+    return result
+
+# ---------------------------
+# Executed-SQL Log
+# ---------------------------
+sql_log = SQLLog(SQL_LOG_PATH, max_bytes=SQL_LOG_MAX_BYTES)
+
+def sql_log_stats():
+    """Return how many executed statements were written to the SQL log"""
+    return sql_log.stats()
+
+# ---------------------------
+# Deadlines & Cancellation
+# ---------------------------
+_request_deadline = contextvars.ContextVar("request_deadline", default=None)
+
+def start_deadline(seconds: float = REQUEST_TIMEOUT_SECONDS):
+    """Start the current request's time budget (inherited by tasks it spawns)"""
+    _request_deadline.set(time.monotonic() + seconds)
+
+def remaining_budget():
+    """Seconds left in the current request's budget (None outside a request)"""
+    deadline = _request_deadline.get()
+    return None if deadline is None else max(deadline - time.monotonic(), 0.0)
+
+async def _within_budget(awaitable):
+    """Await within the request budget; asyncio.TimeoutError cancels the work when it runs out"""
+    remaining = remaining_budget()
+    if remaining is None:
+        return await awaitable
+    return await asyncio.wait_for(awaitable, max(remaining, 0.001))
+
+def _with_deadline(query: str) -> str:
+    """Bound server-side execution to QUERY_TIMEOUT_SECONDS or the request budget left, if shorter"""
+    timeout = QUERY_TIMEOUT_SECONDS
+    remaining = remaining_budget()
+    if remaining is not None:
+        timeout = min(timeout, remaining)
+    return with_execution_time_hint(query, timeout * 1000)
+
+def _is_query_timeout(error) -> bool:
+    """MySQL error 3024: the query hit its MAX_EXECUTION_TIME"""
+    message = str(error)
+    return "3024" in message or "maximum statement execution time exceeded" in message.lower()
+
+def _timeout_response(question):
+    return _error_response(
+        question,
+        "The query ran out of time. Try narrowing the question, e.g. to a date range, branch or city.",
+        "timeout"
+    )
+
+async def _kill_query(server, connection_id):
+    """Stop a running statement on the server (its client task was cancelled)"""
+    try:
+        async with server.connect() as conn:
+            await conn.execute(text(f"KILL QUERY {int(connection_id)}"))
+        print(f"🛑 Killed query on MySQL connection {connection_id}")
+    except Exception as e:
+        print(f"⚠️ Could not kill query on MySQL connection {connection_id}: {e}")
+
+async def _stream_into(reader, query: str, target, params: dict = None, source: str = "generated"):
+    """
+    Stream a query into a BoundedReader on `target` (a _read_target())
+    under the execution deadline and return its columns. If the caller is
+    cancelled (client gone, budget spent) the statement is killed on the
+    server too.
+    """
+    logged_sql = inline_params(query, params) if params else query
+    record_read(target)
+    server = async_engine_for(target)
+    started = time.perf_counter()
+    async with server.connect() as conn:
+        connection_id = (await conn.execute(text("SELECT CONNECTION_ID()"))).scalar()
+        try:
+            result = await conn.stream(
+                text(_with_deadline(query)), params, execution_options={"max_row_buffer": FETCH_BATCH_SIZE}
+            )
+            columns = list(result.keys())
+            while reader.add(await result.fetchmany(FETCH_BATCH_SIZE)):
+                pass
+            await result.close()
+        except asyncio.CancelledError:
+            sql_log.record(logged_sql, _elapsed_ms(started), source, error="cancelled")
+            await asyncio.shield(_kill_query(server, connection_id))
+            raise
+        except Exception as e:
+            sql_log.record(logged_sql, _elapsed_ms(started), source, error=str(e)[:200])
+            raise
+    sql_log.record(logged_sql, _elapsed_ms(started), source, rows=len(reader.rows))
+    return columns
+
+# ---------------------------
+# Read Routing (replicas vs primary)
+# ---------------------------
+_read_primary = contextvars.ContextVar("read_primary", default=False)
+_FRESHNESS_CUE = re.compile(
+    r"\b(?:right now|just now|currently|real[- ]?time|live|latest|most recent|today|this (?:hour|morning)|"
+    r"(?:last|past) (?:few )?(?:minutes?|hours?)|just (?:added|created|registered|made|booked))\b",
+    re.IGNORECASE,
+)
+
+def set_read_preference(question: str, fresh: bool = False):
+    """
+    Send this request's generated SQL to the primary when the caller asks
+    for fresh data or the question is about very recent activity; replica
+    lag could otherwise hide it.
+    """
+    primary = fresh or (FRESHNESS_ROUTING and bool(_FRESHNESS_CUE.search(question or "")))
+    _read_primary.set(primary)
+    return primary
+
+def _read_target():
+    """Server for this request's next query: a replica, or None for the primary"""
+    return pick_replica(fresh=_read_primary.get())
+
+def _target_name(target):
+    return target.name if target is not None else "primary"
+
+def _read_engine():
+    """Read engine for side statements (EXPLAIN); not counted as a routed query"""
+    return get_read_engine(fresh=_read_primary.get(), count=False)
+
+def _read_async_engine():
+    """Async variant of _read_engine"""
+    return get_read_async_engine(fresh=_read_primary.get(), count=False)
+
+def _check_replicas():
+    """Warm-up step: first health and lag check of each read replica"""
+    for replica in replicas:
+        try:
+            replica.check()
+            print(f"✅ Replica {replica.name}: lag {replica.lag_seconds}s")
+        except Exception as e:
+            print(f"⚠️ Replica {replica.name} unavailable: {e}")
+
+def read_routing_stats():
+    """Return replica health, lag and load, and how many reads went to the primary"""
+    return {"freshness_routing": FRESHNESS_ROUTING, **replica_stats()}
+
+# ---------------------------
+# Query Result Cache
+# ---------------------------
+result_cache = QueryResultCache(
+    max_size=RESULT_CACHE_MAX_SIZE,
+    ttl=RESULT_CACHE_TTL,
+    version_interval=RESULT_CACHE_VERSION_INTERVAL,
+)
+
+def _cached_result(query: str, target):
+    """
+    Look a bounded query up in the result cache of the server it is routed
+    to, first refreshing the data versions of its tables on that server if
+    they are due.
+
+    Returns:
+        tuple: (ticket for result_cache.store(), cached result or None)
+    """
+    if not RESULT_CACHE:
+        return None, None
+    source = _target_name(target)
+    with stage("result_cache"):
+        tables = referenced_tables(query)
+        due = result_cache.due_for_probe(tables, source)
+        if due:
+            started = time.perf_counter()
+            try:
+                with engine_for(target).connect() as conn:
+                    versions = probe_versions(conn, due)
+            except Exception as e:
+                print(f"⚠️ Data version probe failed, bypassing result cache: {e}")
+                return None, None
+            result_cache.update_versions(due, versions, (time.perf_counter() - started) * 1000, source)
+        return result_cache.lookup(query, tables, source)
+
+async def _cached_result_async(query: str, target):
+    """Async variant of _cached_result"""
+    if not RESULT_CACHE:
+        return None, None
+    source = _target_name(target)
+    with stage("result_cache"):
+        tables = referenced_tables(query)
+        due = result_cache.due_for_probe(tables, source)
+        if due:
+            started = time.perf_counter()
+            try:
+                async with async_engine_for(target).connect() as conn:
+                    versions = await probe_versions_async(conn, due)
+            except Exception as e:
+                print(f"⚠️ Data version probe failed, bypassing result cache: {e}")
+                return None, None
+            result_cache.update_versions(due, versions, (time.perf_counter() - started) * 1000, source)
+        return result_cache.lookup(query, tables, source)
+
+def result_cache_stats():
+    """Return hit ratio, stale drops and database time saved by the query result cache"""
+    return {"enabled": RESULT_CACHE, **result_cache.stats()}
+
 class LimitedQueryTool(QuerySQLDatabaseTool):
     """Enhanced query tool with automatic limits and truncation"""
     
     def _run(self, query: str):
-        # Add LIMIT if missing (and not using aggregation)
-        if ("SELECT" in query.upper() and 
-            "LIMIT" not in query.upper() and 
-            not any(agg in query.upper() for agg in ["COUNT(", "SUM(", "AVG(", "MAX(", "MIN(", "GROUP BY"])):
-            query = query.rstrip(";") + " LIMIT 100"
+        query = apply_row_limit(query)
         
         # Execute query
         result = super()._run(query)
         
-        # Truncate very long results
-        if len(result) > 6000:
-            result = result[:6000] + "\n... (truncated for readability. Use more specific filters.)"
+        return truncate_result(result)
+    
+    def fetch(self, query: str):
+        """
+        Execute with a server-side cursor and return a structured result
+        (columns, typed rows, row_count, truncated).
         
-        return result
+        The server is asked for one row past MAX_RESULT_ROWS, and reading
+        stops at the row or MAX_RESULT_BYTES cap, so memory stays flat no
+        matter what the generated SQL returns. Repeated queries are served
+        from the result cache while their tables are unchanged.
+        """
+        query = apply_row_limit(query, MAX_RESULT_ROWS + 1)
+        target = _read_target()
+        ticket, cached = _cached_result(query, target)
+        if cached is not None:
+            return cached
+        started = time.perf_counter()
+        with stage("execution"):
+            data = self._fetch(query, target)
+        result_cache.store(ticket, data, (time.perf_counter() - started) * 1000)
+        return data
+    
+    def _fetch(self, query: str, target):
+        reader = BoundedReader()
+        started = time.perf_counter()
+        record_read(target)
+        try:
+            with engine_for(target).connect().execution_options(
+                stream_results=True, max_row_buffer=FETCH_BATCH_SIZE
+            ) as conn:
+                result = conn.execute(text(_with_deadline(query)))
+                if not result.returns_rows:
+                    return make_result([], [])
+                columns = list(result.keys())
+                while reader.add(result.fetchmany(FETCH_BATCH_SIZE)):
+                    pass
+                result.close()
+        except Exception as e:
+            sql_log.record(query, _elapsed_ms(started), "generated", error=str(e)[:200])
+            raise
+        sql_log.record(query, _elapsed_ms(started), "generated", rows=len(reader.rows))
+        return make_result(columns, reader.rows, truncated=reader.truncated)
+
+# Created by _reflect_database() during warm-up
+execute_query = None
+
+# ---------------------------
+# Cost Guard (EXPLAIN before execution)
+# ---------------------------
+cost_guard = CostGuard(
+    max_rows_examined=COST_GUARD_MAX_ROWS,
+    max_scan_rows=COST_GUARD_MAX_SCAN_ROWS,
+    rewrite_limit=COST_GUARD_REWRITE_LIMIT,
+    date_range_days=COST_GUARD_DATE_RANGE_DAYS,
+    active_hours=parse_active_hours(COST_GUARD_ACTIVE_HOURS),
+)
+_DATE_NAME = re.compile(r"created|date|_at$|_on$|time", re.IGNORECASE)
+
+# Filled by _load_date_columns() during warm-up
+date_columns = {}
+
+def _load_date_columns():
+    """Warm-up step: most likely event-date column per table (reflected Date/DateTime columns)"""
+    global date_columns
+    if not COST_GUARD:
+        return
+    found = {}
+    for (_, table), columns in inspect(engine).get_multi_columns().items():
+        dated = [c["name"] for c in columns if isinstance(c["type"], (Date, DateTime))]
+        named = [c for c in dated if _DATE_NAME.search(c)]
+        if dated:
+            found[table] = (named or dated)[0]
+    date_columns = found
+    print(f"✅ Date columns found for {len(found)} tables")
+
+def _date_column(summary, sql):
+    """Event-date column of a single-table plan's table, resolving EXPLAIN aliases"""
+    aliases = table_aliases(sql)
+    tables = {aliases.get(t["table"], t["table"]) for t in summary["tables"]}
+    return date_columns.get(tables.pop()) if len(tables) == 1 else None
+
+def _explain_summary(result):
+    return summarize_plan(list(result.keys()), result.fetchall())
+
+def _guarded_plan(plan, summary, decision):
+    """Apply a cost guard decision: attach the plan summary, swap in rewritten SQL or reject"""
+    query_plan = {**summary, "action": decision["action"], "reason": decision["reason"], "note": decision["note"]}
+    if decision["action"] == "reject":
+        print(f"🛑 Cost guard rejected query: {decision['reason']}")
+        raise ValueError(
+            f"Query rejected as too expensive ({decision['reason']}). "
+            "Try narrowing the question, e.g. to a date range, branch or city."
+        )
+    if decision["action"] == "rewrite":
+        print(f"✂️ Cost guard rewrote query: {decision['reason']}")
+        return {**plan, "sql": decision["sql"], "query_plan": query_plan}
+    return {**plan, "query_plan": query_plan}
+
+def guard_plan(plan):
+    """
+    EXPLAIN the plan's SQL before it runs and estimate rows examined and
+    join types; queries over the thresholds are rewritten or rejected
+    (ValueError). A failed EXPLAIN lets the query through unguarded.
+    """
+    if not COST_GUARD:
+        return plan
+    with stage("cost_guard"):
+        sql = apply_row_limit(plan["sql"], MAX_RESULT_ROWS + 1)
+        try:
+            with _read_engine().connect() as conn:
+                summary = _explain_summary(conn.execute(text(f"EXPLAIN {sql}")))
+                decision = cost_guard.review(sql, summary, _date_column(summary, sql))
+                if decision["recheck"]:
+                    summary = _explain_summary(conn.execute(text(f"EXPLAIN {decision['sql']}")))
+                    final = cost_guard.review(decision["sql"], summary, rechecked=True)
+                    decision = {**decision, "recheck": False} if final["action"] == "run" else final
+        except Exception as e:
+            cost_guard.record_failure()
+            print(f"⚠️ EXPLAIN failed, running query unguarded: {e}")
+            return plan
+    return _guarded_plan(plan, summary, decision)
+
+async def guard_plan_async(plan):
+    """Async variant of guard_plan"""
+    if not COST_GUARD:
+        return plan
+    with stage("cost_guard"):
+        sql = apply_row_limit(plan["sql"], MAX_RESULT_ROWS + 1)
+        try:
+            async with _read_async_engine().connect() as conn:
+                summary = _explain_summary(await conn.execute(text(f"EXPLAIN {sql}")))
+                decision = cost_guard.review(sql, summary, _date_column(summary, sql))
+                if decision["recheck"]:
+                    summary = _explain_summary(await conn.execute(text(f"EXPLAIN {decision['sql']}")))
+                    final = cost_guard.review(decision["sql"], summary, rechecked=True)
+                    decision = {**decision, "recheck": False} if final["action"] == "run" else final
+        except Exception as e:
+            cost_guard.record_failure()
+            print(f"⚠️ EXPLAIN failed, running query unguarded: {e}")
+            return plan
+    return _guarded_plan(plan, summary, decision)
 
-execute_query = LimitedQueryTool(db=db)
+def cost_guard_stats():
+    """Return how many queries the cost guard passed, rewrote and rejected, and its thresholds"""
+    return {"enabled": COST_GUARD, **cost_guard.stats()}
 
 # ---------------------------
 # Answer Generation
@@ -691,25 +1408,414 @@ Guidelines:
 Answer:"""
 )
 
-answer_chain = answer_generation_prompt | llm | StrOutputParser()
+# ---------------------------
+# LLM Chains
+# ---------------------------
+normalize_chain = None
+sql_chain = None
+fused_chain = None
+refine_chain = None
+answer_chain = None
+
+def _build_llm():
+    """Warm-up step: LLM client and every chain bound to it"""
+    global llm, normalize_chain, sql_chain, fused_chain, refine_chain, answer_chain
+    # Calls are admitted, rate-limited and retried by the shared LLM governor
+    llm = GovernedChatOpenAI(
+        temperature=0,
+        model_name="gpt-4o-mini",
+        request_timeout=90
+    )
+    normalize_chain = normalization_prompt | llm | StrOutputParser()
+    sql_chain = enhanced_sql_prompt | llm | StrOutputParser()
+    fused_chain = fused_sql_prompt | llm | StrOutputParser()
+    refine_chain = refine_sql_prompt | llm | StrOutputParser()
+    answer_chain = answer_generation_prompt | llm | StrOutputParser()
+    print("✅ LLM client and chains initialized")
+
+# ---------------------------
+# Answer Cache & Pipeline Statistics
+# ---------------------------
+answer_cache = TTLCache(max_size=ANSWER_CACHE_MAX_SIZE, ttl=ANSWER_CACHE_TTL)
+pipeline_mode_stats = {mode: RollingStats() for mode in PIPELINE_MODES + ("refine",)}
+
+def cache_stats():
+    """Return hit/miss statistics of the answer cache"""
+    return answer_cache.stats()
+
+def pipeline_stats():
+    """Return latency percentiles and success rate per pipeline mode"""
+    return {mode: stats.snapshot() for mode, stats in pipeline_mode_stats.items()}
+
+def _with_timings(response, trace):
+    """Attach the request's stage timings and token counts, and count the response by source"""
+    timings = trace.summary()
+    success = bool(response.get("success"))
+    stage_metrics.record_stage("total", timings["total_ms"], success)
+    stage_metrics.record_response(response.get("source", "unknown"), success)
+    return {**response, "timings": timings}
+
+def prometheus_metrics():
+    """Per-stage latency summaries, token and error counters and cache hit ratios (Prometheus text format)"""
+    hit_ratios = {
+        "answer": answer_cache.stats()["hit_ratio"],
+        "sql_template": sql_template_cache.stats()["hit_ratio"],
+        "fast_path": fast_path_router.stats()["hit_ratio"],
+        "sql_result": result_cache.stats()["hit_ratio"],
+    }
+    pools = pool_stats()
+    servers = {"primary": {"sync": pools["sync"], "async": pools["async"]}, **pools["replicas"]}
+    return render_prometheus(hit_ratios=hit_ratios, pools=servers)
+
+# ---------------------------
+# Response Helpers
+# ---------------------------
+EMPTY_RESULT_ANSWER = "No matching data found in the database for your query. Try adjusting your search criteria."
+
+def _error_response(question, error, source):
+    return {
+        "success": False,
+        "question": question,
+        "sql_query": None,
+        "result": None,
+        "error": error,
+        "source": source
+    }
+
+def _plan_note(plan):
+    """Answer suffix explaining a cost guard rewrite that changed what the result covers"""
+    note = (plan.get("query_plan") or {}).get("note")
+    return f"\n\nNote: {note}" if note else ""
+
+def _answer_response(question, plan, data, answer, answer_mode="llm"):
+    if answer is not None:
+        answer += _plan_note(plan)
+    return {
+        "success": True,
+        "question": question,
+        "sql_query": plan["sql"],
+        "result": truncate_result(_format_rows(data["rows"])) if data["rows"] else [],
+        "data": data,
+        "result_id": register_result(plan["sql"]) if data["rows"] else None,
+        "normalized_info": plan.get("normalized_info"),
+        "answer": answer,
+        "source": "ai_agent",
+        "pipeline_mode": plan["pipeline_mode"],
+        "fallback": plan["fallback"],
+        "template_hit": plan.get("template_hit", False),
+        "query_plan": plan.get("query_plan"),
+        "answer_mode": answer_mode
+    }
+
+def resolve_answer_mode(answer_mode: str = None):
+    """Validate the requested answer mode, defaulting to ANSWER_MODE"""
+    answer_mode = answer_mode or DEFAULT_ANSWER_MODE
+    if answer_mode not in ANSWER_MODES:
+        raise ValueError(f"Unknown answer mode '{answer_mode}'. Use one of: {', '.join(ANSWER_MODES)}")
+    return answer_mode
+
+def _local_answer(data, answer_mode):
+    """
+    Render the answer without the LLM where the mode allows it.
+    
+    Returns:
+        tuple: (answer, effective mode); answer is None with mode "llm"
+        when the LLM has to write it
+    """
+    if answer_mode == "llm":
+        return None, "llm"
+    if answer_mode == "none":
+        return None, "none"
+    answer = format_answer(data["columns"], data["rows"], max_rows=TEMPLATE_MAX_ROWS, types=data.get("types"))
+    if answer is None:
+        return None, "llm"
+    return answer, "template"
+
+def _answer_inputs(question, plan, data):
+    """Answer prompt variables with the result rendered within the token budget"""
+    return {
+        "question": question,
+        "sql_query": plan["sql"],
+        "result": render_for_prompt(data, ANSWER_PROMPT_TOKENS)
+    }
+
+def _prepare_question(question, context):
+    """Validate input and merge the optional context into the question"""
+    if not question or len(question.strip()) < 3:
+        return None
+    
+    print(f"\n{'='*70}")
+    print(f"❓ Question: {question}")
+    if context:
+        print(f"📝 Context: {context}")
+    print(f"{'='*70}")
+    
+    if context:
+        return f"{question}\nContext: {context}"
+    return question
+
+def _answer_cache_key(question, context, answer_mode):
+    return f"{canonical_question_key(question, context)}||{answer_mode}"
+
+def _lookup_cached_answer(question, context, answer_mode="llm"):
+    if _read_primary.get():
+        return None  # fresh reads skip cached answers
+    with stage("cache_lookup"):
+        cached = answer_cache.get(_answer_cache_key(question, context, answer_mode))
+    if cached is not None:
+        print(f"⚡ Answer cache hit: {question}")
+        return {**cached, "question": question, "cached": True}
+    return None
+
+def _finish_request(question, context, mode, answer_mode, response, started, cache=True):
+    """Record latency statistics and cache successful answers"""
+    latency_ms = _elapsed_ms(started)
+    pipeline_mode_stats[mode].record(latency_ms, response.get("success", False))
+    
+    if cache and response.get("success"):
+        answer_cache.set(_answer_cache_key(question, context, answer_mode), response)
+    return {**response, "requested_mode": mode, "latency_ms": latency_ms, "cached": False}
+
+# ---------------------------
+# Deterministic Fast Path
+# ---------------------------
+fast_path_router = FastPathRouter.from_config(FAST_PATH_CATALOGUE)
+
+def _fast_path_match(question, context):
+    """Match catalogued question forms (questions with extra context always use the LLM)"""
+    if not FAST_PATH or context:
+        return None
+    match = fast_path_router.match(question)
+    if match is None:
+        return None
+    route, params = match
+    bind_names = set(re.findall(r":(\w+)", route["sql"]))
+    return route, params, {k: v for k, v in params.items() if k in bind_names}
+
+def _fast_path_response(question, route, params, binds, columns, rows):
+    print(f"⚡ Fast path: {route['name']}")
+    return {
+        "success": True,
+        "question": question,
+        "sql_query": inline_params(route["sql"], binds),
+        "result": _format_rows(rows) if rows else [],
+        "data": make_result(columns, rows),
+        "result_id": register_result(route["sql"], binds) if rows else None,
+        "answer": fast_path_router.render_answer(route, params, rows),
+        "source": "fast_path",
+        "pipeline_mode": "fast_path",
+        "fallback": False
+    }
+
+def try_fast_path(question, context=None):
+    """Answer a catalogued question with precompiled SQL, or None to use the full pipeline"""
+    match = _fast_path_match(question, context)
+    if match is None:
+        return None
+    route, params, binds = match
+    started = time.perf_counter()
+    try:
+        with stage("fast_path"), engine.connect() as conn:
+            result = conn.execute(text(route["sql"]), binds)
+            columns, rows = list(result.keys()), result.fetchall()
+        sql_log.record(inline_params(route["sql"], binds), _elapsed_ms(started), "fast_path", rows=len(rows))
+    except Exception as e:
+        print(f"⚠️ Fast path '{route['name']}' failed, using full pipeline: {e}")
+        return None
+    if fast_path_router.falls_through(route, rows):
+        print(f"⚠️ Fast path '{route['name']}' found nothing, using full pipeline")
+        return None
+    return _fast_path_response(question, route, params, binds, columns, rows)
+
+async def try_fast_path_async(question, context=None):
+    """Async variant of try_fast_path"""
+    match = _fast_path_match(question, context)
+    if match is None:
+        return None
+    route, params, binds = match
+    started = time.perf_counter()
+    try:
+        with stage("fast_path"):
+            async with async_engine.connect() as conn:
+                result = await conn.execute(text(route["sql"]), binds)
+                columns, rows = list(result.keys()), result.fetchall()
+        sql_log.record(inline_params(route["sql"], binds), _elapsed_ms(started), "fast_path", rows=len(rows))
+    except Exception as e:
+        print(f"⚠️ Fast path '{route['name']}' failed, using full pipeline: {e}")
+        return None
+    if fast_path_router.falls_through(route, rows):
+        print(f"⚠️ Fast path '{route['name']}' found nothing, using full pipeline")
+        return None
+    return _fast_path_response(question, route, params, binds, columns, rows)
+
+def _load_fast_path_vocabularies():
+    """Warm-up step: known parameter values (e.g. city names) that fast-path routes may bind"""
+    if not FAST_PATH:
+        return
+    for kind, sql in fast_path_router.vocabulary_sql.items():
+        try:
+            with engine.connect() as conn:
+                values = [row[0] for row in conn.execute(text(sql))]
+        except Exception as e:
+            print(f"⚠️ Fast-path vocabulary '{kind}' unavailable, its routes will use the full pipeline: {e}")
+            continue
+        fast_path_router.load_vocabulary(kind, values)
+        print(f"✅ Fast-path vocabulary '{kind}' loaded ({len(values)} values)")
+
+def fast_path_stats():
+    """Return fast-path hit counts per catalogued route"""
+    return {"enabled": FAST_PATH, **fast_path_router.stats()}
+
+def _elapsed_ms(started):
+    return round((time.perf_counter() - started) * 1000, 1)
+
+# ---------------------------
+# Single-Flight Coalescing
+# ---------------------------
+# Concurrent identical questions (same canonical question, context and modes)
+# share one in-flight pipeline execution.
+in_flight = SingleFlight()
+in_flight_async = AsyncSingleFlight()
+
+def _flight_key(question, context, mode, answer_mode):
+    return f"{_answer_cache_key(question, context, answer_mode)}||{mode}||{_read_primary.get()}"
+
+def coalescing_stats():
+    """Return how many requests shared another request's pipeline run"""
+    return {"sync": in_flight.stats(), "async": in_flight_async.stats()}
+
+# ---------------------------
+# Summary Statistics
+# ---------------------------
+# Direct aggregate queries, refreshed on a schedule; /stats/summary serves the
+# last snapshot instead of running the pipeline per request.
+stats_service = StatsService(
+    lambda: async_engine,
+    load_metric_catalogue(STATS_METRICS_FILE, validate=validate_and_clean_sql),
+    interval=STATS_REFRESH_SECONDS,
+)
+
+# ---------------------------
+# Conversation Sessions
+# ---------------------------
+session_store = SessionStore(max_sessions=SESSION_MAX, max_turns=SESSION_MAX_TURNS, max_bytes=SESSION_MAX_BYTES)
+
+def _previous_turn(session_id, question):
+    """The session's last turn when `question` looks like a follow-up to it"""
+    if not session_id:
+        return None
+    history = session_store.history(session_id)
+    if not is_follow_up(question, history, db.get_usable_table_names() if db else ()):
+        return None
+    print(f"🔁 Follow-up in session {session_id}")
+    return history[-1]
+
+def _record_turn(session_id, question, response, previous=None):
+    """Remember the turn's SQL and result shape, and tag the response with the session"""
+    if not session_id:
+        return response
+    sql = response.get("sql_query")
+    if response.get("success") and sql:
+        data = response.get("data") or {}
+        session_store.record(session_id, {
+            "question": question,
+            "normalized_info": response.get("normalized_info"),
+            "sql": sql,
+            "tables": referenced_tables(sql),
+            "columns": data.get("columns", []),
+            "row_count": data.get("row_count", 0),
+        })
+    return {**response, "session_id": session_id, "follow_up": previous is not None}
+
+def session_stats():
+    """Return session count, memory use and evictions"""
+    return session_store.stats()
 
 # ---------------------------
 # Main Query Function (FastAPI Compatible)
 # ---------------------------
-def ask_question(question: str, context: str = None):
+def ask_question(question: str, context: str = None, mode: str = None, answer_mode: str = None, session_id: str = None, fresh: bool = False):
     """
     Process natural language questions with advanced normalization and validation.
     
+    Successful answers are cached under a canonical key (case, whitespace,
+    punctuation and context folded), so repeated questions skip the LLM
+    and MySQL round-trips until the entry expires. Concurrent identical
+    questions share a single in-flight pipeline run.
+    
+    With a session id, follow-ups ("now only the active ones") edit the
+    session's previous SQL instead of restarting the pipeline.
+    
     Args:
         question (str): Natural language question
         context (str, optional): Additional context
+        mode (str, optional): SQL generation pipeline, "two_step" or "fused"
+        answer_mode (str, optional): "llm", "template" or "none"
+        session_id (str, optional): Conversation session for follow-ups
+        fresh (bool, optional): Read from the primary instead of a replica
         
     Returns:
         dict: Response with answer and metadata
     """
+    trace = start_trace()
+    start_deadline()
+    set_read_preference(question, fresh)
+    try:
+        mode = resolve_pipeline_mode(mode)
+        answer_mode = resolve_answer_mode(answer_mode)
+    except ValueError as ve:
+        return _with_timings(_error_response(question, str(ve), "validation_error"), trace)
+    
+    previous = _previous_turn(session_id, question)
+    if previous is not None:
+        response = _answer_follow_up(question, context, answer_mode, previous)
+    else:
+        response = _answer_shared(question, context, mode, answer_mode)
+    return _with_timings(_record_turn(session_id, question, response, previous), trace)
+
+def _answer_shared(question, context, mode, answer_mode):
+    """Answer cache, then one coalesced pipeline run per distinct question"""
+    cached = _lookup_cached_answer(question, context, answer_mode)
+    if cached is not None:
+        return cached
+    
     try:
-        # Input validation
-        if not question or len(question.strip()) < 3:
+        ensure_ready()
+    except Exception as e:
+        return _error_response(question, f"Service is not ready: {e}", "unavailable")
+    
+    response, shared = in_flight.do(
+        _flight_key(question, context, mode, answer_mode),
+        lambda: _answer_uncached(question, context, mode, answer_mode)
+    )
+    return {**response, "question": question, "coalesced": shared}
+
+def _answer_follow_up(question, context, answer_mode, previous):
+    """Refine the previous SQL; session-dependent, so no answer cache, fast path or coalescing"""
+    try:
+        ensure_ready()
+    except Exception as e:
+        return _error_response(question, f"Service is not ready: {e}", "unavailable")
+    
+    started = time.perf_counter()
+    response = _run_pipeline(question, context, answer_mode=answer_mode, previous=previous)
+    return _finish_request(question, context, "refine", answer_mode, response, started, cache=False)
+
+def _answer_uncached(question, context, mode, answer_mode):
+    """Fast path, then the full pipeline; records stats and fills the cache"""
+    started = time.perf_counter()
+    fast = try_fast_path(question, context)
+    if fast is not None:
+        return {**fast, "latency_ms": _elapsed_ms(started), "cached": False}
+    
+    response = _run_pipeline(question, context, mode, answer_mode)
+    return _finish_request(question, context, mode, answer_mode, response, started)
+
+def _run_pipeline(question: str, context: str = None, mode: str = None, answer_mode: str = "llm", previous: dict = None):
+    """Run normalization (or follow-up refinement), SQL generation, execution and answer generation"""
+    try:
+        enhanced_question = _prepare_question(question, context)
+        if enhanced_question is None:
             return {
                 "success": False,
                 "question": question,
@@ -717,106 +1823,598 @@ def ask_question(question: str, context: str = None):
                 "source": "validation"
             }
         
-        # Enhance question with context
-        if context:
-            enhanced_question = f"{question}\nContext: {context}"
+        # Generate SQL (edit the previous SQL for follow-ups)
+        if previous is not None:
+            plan = refine_query(enhanced_question, previous)
         else:
-            enhanced_question = question
+            plan = plan_query(enhanced_question, mode)
         
-        print(f"\n{'='*70}")
-        print(f"❓ Question: {question}")
-        if context:
-            print(f"📝 Context: {context}")
-        print(f"{'='*70}")
+        # Check the plan's cost before it reaches MySQL
+        plan = guard_plan(plan)
         
-        # Generate and execute SQL
-        sql = generate_sql(enhanced_question)
-        result = execute_query.invoke(sql)
+        # Execute SQL (structured, typed rows)
+        data = execute_query.fetch(plan["sql"])
         
         # Handle empty results
-        if not result or result.strip() in ["[]", "", "()"]:
+        if not data["rows"]:
+            return _answer_response(question, plan, data, EMPTY_RESULT_ANSWER, answer_mode)
+        
+        with stage("answer"):
+            # Render locally where the answer mode allows it
+            answer, effective_mode = _local_answer(data, answer_mode)
+            
+            # Generate natural language answer
+            if effective_mode == "llm":
+                answer = answer_chain.invoke(_answer_inputs(question, plan, data)).strip()
+        
+        return _answer_response(question, plan, data, answer, effective_mode)
+        
+    except ValueError as ve:
+        print(f"❌ Validation Error: {ve}")
+        return _error_response(question, str(ve), "validation_error")
+        
+    except Exception as e:
+        if _is_query_timeout(e):
+            return _timeout_response(question)
+        print(f"❌ Error: {e}")
+        return _error_response(
+            question,
+            f"I encountered an error processing your question: {str(e)}. Please try rephrasing it.",
+            "processing_error"
+        )
+
+# ---------------------------
+# Async Query Pipeline (non-blocking for FastAPI)
+# ---------------------------
+async def normalize_query_async(question):
+    """Async variant of normalize_query"""
+    try:
+        with stage("normalize"):
+            normalized = await normalize_chain.ainvoke({"question": question})
+        print(f"\n🔍 Normalized Query Analysis:")
+        print(normalized)
+        return normalized
+    except Exception as e:
+        print(f"⚠️ Normalization warning: {e}")
+        return f"Intent: general_query\nNormalized Question: {question}"
+
+async def generate_sql_two_step_async(question):
+    """Async variant of generate_sql_two_step"""
+    normalized_info = await normalize_query_async(question)
+    return await sql_from_normalized_async(normalized_info)
+
+async def sql_from_normalized_async(normalized_info):
+    """Async variant of sql_from_normalized"""
+    try:
+        templated = _sql_from_template(normalized_info)
+        if templated is not None:
+            return templated
+        
+        schema = select_schema(normalized_info)
+        started = time.perf_counter()
+        with stage("sql_generation"):
+            raw_sql = await sql_chain.ainvoke({"schema": schema, "normalized_info": normalized_info})
+        generation_ms = (time.perf_counter() - started) * 1000
+        
+        sql = validate_and_clean_sql(clean_llm_sql(raw_sql))
+        _store_sql_template(normalized_info, sql, generation_ms)
+        
+        print(f"\n📝 Generated SQL:")
+        print(sql)
+        return {"sql": sql, "normalized_info": normalized_info, "template_hit": False}
+        
+    except Exception as e:
+        print(f"❌ SQL Generation Error: {e}")
+        raise ValueError(f"Failed to generate valid SQL: {str(e)}")
+
+async def generate_sql_fused_async(question):
+    """Async variant of generate_sql_fused"""
+    schema = select_schema(question)
+    with stage("sql_generation"):
+        raw = await fused_chain.ainvoke({"schema": schema, "question": question})
+    plan = parse_fused_output(raw)
+    print(f"\n🔍 Fused Query Analysis:")
+    print(plan["normalized_info"])
+    print(f"\n📝 Generated SQL:")
+    print(plan["sql"])
+    return plan
+
+async def plan_query_async(question, mode: str = None):
+    """Async variant of plan_query"""
+    mode = resolve_pipeline_mode(mode)
+    
+    if mode == "fused":
+        try:
+            plan = await generate_sql_fused_async(question)
+            return {**plan, "pipeline_mode": "fused", "fallback": False}
+        except Exception as e:
+            print(f"⚠️ Fused generation failed, falling back to two-step: {e}")
+            plan = await generate_sql_two_step_async(question)
+            return {**plan, "pipeline_mode": "two_step", "fallback": True}
+    
+    plan = await generate_sql_two_step_async(question)
+    return {**plan, "pipeline_mode": "two_step", "fallback": False}
+
+async def refine_query_async(question, previous):
+    """Async variant of refine_query"""
+    try:
+        inputs = _refine_inputs(question, previous)
+        with stage("sql_generation"):
+            raw_sql = await refine_chain.ainvoke(inputs)
+        return _refine_plan(question, previous, raw_sql)
+    except Exception as e:
+        print(f"❌ SQL Refinement Error: {e}")
+        raise ValueError(f"Failed to refine the previous query: {str(e)}")
+
+def _format_rows(rows):
+    """Render rows like SQLDatabase.run (long strings shortened)"""
+    def shorten(value):
+        if isinstance(value, str) and len(value) > MAX_STRING_LENGTH:
+            return value[:MAX_STRING_LENGTH] + "..."
+        return value
+    return str([tuple(shorten(value) for value in row) for row in rows])
+
+async def fetch_result_async(sql: str):
+    """Async variant of LimitedQueryTool.fetch (server-side cursor, row and byte caps)"""
+    query = apply_row_limit(sql, MAX_RESULT_ROWS + 1)
+    target = _read_target()
+    ticket, cached = await _cached_result_async(query, target)
+    if cached is not None:
+        return cached
+    reader = BoundedReader()
+    started = time.perf_counter()
+    with stage("execution"):
+        columns = await _stream_into(reader, query, target)
+    data = make_result(columns, reader.rows, truncated=reader.truncated)
+    result_cache.store(ticket, data, (time.perf_counter() - started) * 1000)
+    return data
+
+async def ask_question_async(question: str, context: str = None, mode: str = None, answer_mode: str = None, session_id: str = None, fresh: bool = False):
+    """
+    Async variant of ask_question.
+    
+    Uses the chains' ainvoke and the aiomysql engine, so a slow LLM or
+    MySQL call does not block the event loop.
+    """
+    trace = start_trace()
+    start_deadline()
+    set_read_preference(question, fresh)
+    try:
+        mode = resolve_pipeline_mode(mode)
+        answer_mode = resolve_answer_mode(answer_mode)
+    except ValueError as ve:
+        return _with_timings(_error_response(question, str(ve), "validation_error"), trace)
+    
+    previous = _previous_turn(session_id, question)
+    try:
+        # Past the budget the pipeline is cancelled, including its running MySQL query
+        if previous is not None:
+            response = await _within_budget(_answer_follow_up_async(question, context, answer_mode, previous))
+        else:
+            response = await _within_budget(_answer_shared_async(question, context, mode, answer_mode))
+    except asyncio.TimeoutError:
+        print(f"⏱️ Request budget of {REQUEST_TIMEOUT_SECONDS}s exhausted: {question}")
+        response = _timeout_response(question)
+    return _with_timings(_record_turn(session_id, question, response, previous), trace)
+
+async def _answer_shared_async(question, context, mode, answer_mode):
+    """Async variant of _answer_shared"""
+    cached = _lookup_cached_answer(question, context, answer_mode)
+    if cached is not None:
+        return cached
+    
+    try:
+        await ensure_ready_async()
+    except Exception as e:
+        return _error_response(question, f"Service is not ready: {e}", "unavailable")
+    
+    response, shared = await in_flight_async.do(
+        _flight_key(question, context, mode, answer_mode),
+        lambda: _answer_uncached_async(question, context, mode, answer_mode)
+    )
+    return {**response, "question": question, "coalesced": shared}
+
+async def _answer_follow_up_async(question, context, answer_mode, previous):
+    """Async variant of _answer_follow_up"""
+    try:
+        await ensure_ready_async()
+    except Exception as e:
+        return _error_response(question, f"Service is not ready: {e}", "unavailable")
+    
+    started = time.perf_counter()
+    response = await _run_pipeline_async(question, context, answer_mode=answer_mode, previous=previous)
+    return _finish_request(question, context, "refine", answer_mode, response, started, cache=False)
+
+async def _answer_uncached_async(question, context, mode, answer_mode):
+    """Async variant of _answer_uncached"""
+    started = time.perf_counter()
+    fast = await try_fast_path_async(question, context)
+    if fast is not None:
+        return {**fast, "latency_ms": _elapsed_ms(started), "cached": False}
+    
+    response = await _run_pipeline_async(question, context, mode, answer_mode)
+    return _finish_request(question, context, mode, answer_mode, response, started)
+
+async def _run_pipeline_async(question: str, context: str = None, mode: str = None, answer_mode: str = "llm", previous: dict = None):
+    """Async variant of _run_pipeline"""
+    try:
+        enhanced_question = _prepare_question(question, context)
+        if enhanced_question is None:
             return {
-                "success": True,
+                "success": False,
                 "question": question,
-                "sql_query": sql,
-                "result": [],
-                "answer": "No matching data found in the database for your query. Try adjusting your search criteria.",
-                "source": "ai_agent"
+                "error": "Please provide a valid question (minimum 3 characters)",
+                "source": "validation"
             }
         
-        # Generate natural language answer
-        answer = answer_chain.invoke({
-            "question": question,
-            "sql_query": sql,
-            "result": result[:2500]
-        })
+        if previous is not None:
+            plan = await refine_query_async(enhanced_question, previous)
+        else:
+            plan = await plan_query_async(enhanced_question, mode)
+        plan = await guard_plan_async(plan)
+        data = await fetch_result_async(plan["sql"])
         
-        return {
-            "success": True,
-            "question": question,
-            "sql_query": sql,
-            "result": result,
-            "answer": answer.strip(),
-            "source": "ai_agent"
-        }
+        if not data["rows"]:
+            return _answer_response(question, plan, data, EMPTY_RESULT_ANSWER, answer_mode)
+        
+        with stage("answer"):
+            answer, effective_mode = _local_answer(data, answer_mode)
+            if effective_mode == "llm":
+                answer = (await answer_chain.ainvoke(_answer_inputs(question, plan, data))).strip()
+        
+        return _answer_response(question, plan, data, answer, effective_mode)
         
     except ValueError as ve:
         print(f"❌ Validation Error: {ve}")
-        return {
-            "success": False,
-            "question": question,
-            "sql_query": None,
-            "result": None,
-            "error": str(ve),
-            "source": "validation_error"
-        }
+        return _error_response(question, str(ve), "validation_error")
         
     except Exception as e:
+        if _is_query_timeout(e):
+            return _timeout_response(question)
         print(f"❌ Error: {e}")
-        return {
-            "success": False,
-            "question": question,
-            "sql_query": None,
-            "result": None,
-            "error": f"I encountered an error processing your question: {str(e)}. Please try rephrasing it.",
-            "source": "processing_error"
-        }
+        return _error_response(
+            question,
+            f"I encountered an error processing your question: {str(e)}. Please try rephrasing it.",
+            "processing_error"
+        )
 
 # ---------------------------
-# Health Check Function
+# Paginated Results
 # ---------------------------
-def health_check():
+# Each answer's validated SQL is kept under a result id so /results/{id} can
+# page through the full result by re-running it with LIMIT offset, size,
+# without another LLM round-trip.
+result_store = TTLCache(max_size=RESULT_STORE_MAX_SIZE, ttl=RESULT_STORE_TTL)
+
+def register_result(sql: str, binds: dict = None):
     """
-    Check if database and AI services are healthy
+    Store SQL for pagination and return its result id.
+    
+    A trailing LIMIT below MAX_RESULT_ROWS is kept as the total row cap (the
+    question asked for "top N"); the default LIMIT added for the first answer
+    is dropped so pages reach the full result.
     """
-    health = {
-        "database": False,
-        "openai": False,
-        "agent": False
+    binds = binds or {}
+    base, limit, start = strip_limit(sql)
+    cap = limit if limit is not None and limit < MAX_RESULT_ROWS else None
+    key = json.dumps([base, sorted(binds.items()), cap, start], default=str)
+    result_id = hashlib.sha1(key.encode()).hexdigest()[:16]
+    result_store.set(result_id, {"sql": base, "binds": binds, "cap": cap, "start": start})
+    return result_id
+
+def has_result(result_id: str) -> bool:
+    """True if the result id is stored and not expired (no database access)"""
+    return result_store.get(result_id) is not None
+
+async def fetch_page_async(result_id: str, offset: int = 0, page_size: int = None):
+    """
+    Fetch one page of a stored result.
+    
+    Returns:
+        dict or None: columns, rows, offset, page_size, has_more and
+        next_offset; None when the result id is unknown or expired
+    """
+    entry = result_store.get(result_id)
+    if entry is None:
+        return None
+    page_size = max(1, min(page_size or RESULT_PAGE_SIZE, RESULT_MAX_PAGE_SIZE))
+    offset = max(0, offset)
+    
+    size = page_size
+    if entry["cap"] is not None:
+        size = max(0, min(page_size, entry["cap"] - offset))
+    
+    columns, rows, more = [], [], False
+    if size:
+        # One extra row tells whether another page exists
+        query = f"{entry['sql']} LIMIT {entry['start'] + offset}, {size + 1}"
+        reader = BoundedReader(max_rows=size)
+        columns = await _stream_into(reader, query, _read_target(), entry["binds"], source="page")
+        rows, more = reader.rows, reader.truncated
+    
+    page = make_result(columns, rows)
+    return {
+        "result_id": result_id,
+        "columns": page["columns"],
+        "types": page["types"],
+        "rows": page["rows"],
+        "row_count": page["row_count"],
+        "offset": offset,
+        "page_size": page_size,
+        "has_more": more,
+        "next_offset": offset + page["row_count"] if more else None,
     }
+
+# ---------------------------
+# Batch Questions
+# ---------------------------
+async def ask_batch(questions, context: str = None, mode: str = None, answer_mode: str = None, concurrency: int = None):
+    """
+    Answer a list of questions with at most `concurrency` pipelines in flight.
+    
+    Identical questions (same canonical text) run once. Yields
+    (indexes, response) as each distinct question finishes, where indexes
+    are the positions in `questions` that share the response.
+    """
+    mode = resolve_pipeline_mode(mode)
+    answer_mode = resolve_answer_mode(answer_mode)
+    concurrency = max(1, min(concurrency or BATCH_CONCURRENCY, BATCH_MAX_CONCURRENCY))
+    
+    groups = {}
+    for index, question in enumerate(questions):
+        groups.setdefault(_flight_key(question, context, mode, answer_mode), []).append(index)
+    
+    semaphore = asyncio.Semaphore(concurrency)
     
-    # Check database
+    async def run(indexes):
+        question = questions[indexes[0]]
+        async with semaphore:
+            try:
+                return indexes, await ask_question_async(question, context, mode, answer_mode)
+            except Exception as e:
+                print(f"❌ Batch question failed: {e}")
+                return indexes, _error_response(question, str(e), "processing_error")
+    
+    tasks = [asyncio.ensure_future(run(indexes)) for indexes in groups.values()]
+    print(f"📦 Batch of {len(questions)} questions ({len(tasks)} distinct, concurrency {concurrency})")
     try:
-        with engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
-        health["database"] = True
-        print("✅ Database health check passed")
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        for task in tasks:
+            task.cancel()
+
+# ---------------------------
+# Streaming Pipeline (Server-Sent Events)
+# ---------------------------
+async def stream_question(question: str, context: str = None, mode: str = None, answer_mode: str = None, session_id: str = None, fresh: bool = False):
+    """
+    Run the async pipeline and yield events as each stage completes.
+    
+    Yields (event, data) tuples: "normalized", "sql", "rows", one "token"
+    per streamed answer chunk, then "done" with the full response (or
+    "error").
+    """
+    trace = start_trace()
+    start_deadline()
+    set_read_preference(question, fresh)
+    try:
+        mode = resolve_pipeline_mode(mode)
+        answer_mode = resolve_answer_mode(answer_mode)
+    except ValueError as ve:
+        yield "error", _with_timings(_error_response(question, str(ve), "validation_error"), trace)
+        return
+    
+    previous = _previous_turn(session_id, question)
+    if previous is None:
+        cached = _lookup_cached_answer(question, context, answer_mode)
+        if cached is not None:
+            yield "done", _with_timings(_record_turn(session_id, question, cached), trace)
+            return
+    
+    try:
+        await ensure_ready_async()
     except Exception as e:
-        print(f"❌ Database health check failed: {e}")
+        yield "error", _with_timings(_error_response(question, f"Service is not ready: {e}", "unavailable"), trace)
+        return
+    
+    started = time.perf_counter()
+    fast = await try_fast_path_async(question, context) if previous is None else None
+    if fast is not None:
+        yield "sql", {"sql": fast["sql_query"], "pipeline_mode": "fast_path"}
+        yield "done", _with_timings(_record_turn(session_id, question, {**fast, "latency_ms": _elapsed_ms(started), "cached": False}), trace)
+        return
     
-    # Check OpenAI
     try:
-        test_response = llm.invoke("test")
-        health["openai"] = True
-        print("✅ OpenAI health check passed")
+        enhanced_question = _prepare_question(question, context)
+        if enhanced_question is None:
+            yield "error", _with_timings(_error_response(
+                question, "Please provide a valid question (minimum 3 characters)", "validation"
+            ), trace)
+            return
+        
+        # Each stage runs within what is left of the request budget
+        if previous is not None:
+            plan = await _within_budget(refine_query_async(enhanced_question, previous))
+        elif mode == "two_step":
+            normalized_info = await _within_budget(normalize_query_async(enhanced_question))
+            yield "normalized", {"normalized_info": normalized_info}
+            plan = await _within_budget(sql_from_normalized_async(normalized_info))
+            plan = {**plan, "pipeline_mode": "two_step", "fallback": False}
+        else:
+            plan = await _within_budget(plan_query_async(enhanced_question, mode))
+            yield "normalized", {"normalized_info": plan["normalized_info"]}
+        plan = await _within_budget(guard_plan_async(plan))
+        yield "sql", {"sql": plan["sql"], "pipeline_mode": plan["pipeline_mode"], "query_plan": plan.get("query_plan")}
+        
+        data = await _within_budget(fetch_result_async(plan["sql"]))
+        yield "rows", {"row_count": data["row_count"], "truncated": data["truncated"]}
+        
+        answer, effective_mode = _local_answer(data, answer_mode)
+        if not data["rows"]:
+            response = _answer_response(question, plan, data, EMPTY_RESULT_ANSWER, answer_mode)
+        elif effective_mode != "llm":
+            response = _answer_response(question, plan, data, answer, effective_mode)
+        else:
+            chunks = []
+            with stage("answer"):
+                async for chunk in answer_chain.astream(_answer_inputs(question, plan, data)):
+                    if remaining_budget() == 0:
+                        raise asyncio.TimeoutError()
+                    chunks.append(chunk)
+                    yield "token", {"text": chunk}
+            if _plan_note(plan):
+                yield "token", {"text": _plan_note(plan)}
+            response = _answer_response(question, plan, data, "".join(chunks).strip())
+        
+    except asyncio.TimeoutError:
+        print(f"⏱️ Request budget of {REQUEST_TIMEOUT_SECONDS}s exhausted: {question}")
+        response = _timeout_response(question)
+        
+    except ValueError as ve:
+        print(f"❌ Validation Error: {ve}")
+        response = _error_response(question, str(ve), "validation_error")
+        
     except Exception as e:
-        print(f"❌ OpenAI health check failed: {e}")
+        if _is_query_timeout(e):
+            response = _timeout_response(question)
+        else:
+            print(f"❌ Error: {e}")
+            response = _error_response(
+                question,
+                f"I encountered an error processing your question: {str(e)}. Please try rephrasing it.",
+                "processing_error"
+            )
     
+    if previous is not None:
+        response = _finish_request(question, context, "refine", answer_mode, response, started, cache=False)
+    else:
+        response = _finish_request(question, context, mode, answer_mode, response, started)
+    response = _with_timings(_record_turn(session_id, question, response, previous), trace)
+    yield ("done" if response.get("success") else "error"), response
+
+# ---------------------------
+# Health Check Function
+# ---------------------------
+probe_llm = None
+
+def _build_probe_llm():
+    """Warm-up step: one-token completion without retries, a cheap liveness check"""
+    global probe_llm
+    probe_llm = ChatOpenAI(
+        temperature=0,
+        model_name="gpt-4o-mini",
+        max_tokens=1,
+        request_timeout=HEALTH_PROBE_TIMEOUT,
+        max_retries=0
+    )
+
+def _probe_database():
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+def _probe_llm():
+    probe_llm.invoke("ping")
+
+health_prober = HealthProber()
+health_prober.add_probe("database", _probe_database, interval=HEALTH_DB_INTERVAL)
+health_prober.add_probe("openai", _probe_llm, interval=HEALTH_LLM_INTERVAL)
+for _replica in replicas:
+    health_prober.add_probe(f"replica:{_replica.name}", _replica.check, interval=REPLICA_HEALTH_INTERVAL)
+
+def health_check(deep: bool = False):
+    """
+    Check if database and AI services are healthy.
+
+    Returns the status cached by the background prober; `deep=True` (or no
+    probe having run yet) runs the probes live first. Until warm-up has
+    finished, reports "warming" without probing.
+    """
+    if not is_ready():
+        return {"database": False, "openai": False, "agent": False, "warming": True, "checks": None}
+    
+    checks = health_prober.snapshot()
+    if deep or any(check is None for check in checks.values()):
+        health_prober.probe_all()
+        checks = health_prober.snapshot()
+
+    health = {
+        "database": checks["database"]["healthy"],
+        "openai": checks["openai"]["healthy"],
+    }
     # Check agent (overall health)
     health["agent"] = health["database"] and health["openai"]
-    
+    health["checks"] = checks
+    health["warming"] = False
     return health
 
+# ---------------------------
+# Lazy Warm-Up
+# ---------------------------
+# Connections, table reflection, schema index and LLM clients are built here
+# instead of at import, so API workers bind immediately and warm up in the
+# background (see the FastAPI lifespan). Each step is timed.
+WARM_UP_STEPS = (
+    ("database", _connect_database),
+    ("sql_database", _reflect_database),
+    ("async_engine", _create_async_engine),
+    ("replicas", _check_replicas),
+    ("schema", _build_schema),
+    ("cost_guard", _load_date_columns),
+    ("fast_path", _load_fast_path_vocabularies),
+    ("llm", _build_llm),
+    ("health_probe_llm", _build_probe_llm),
+)
+
+warm_up_state = {"status": "cold", "steps_ms": {}, "total_ms": None, "error": None}
+_warm_up_lock = threading.Lock()
+_ready = threading.Event()
+
+def warm_up():
+    """
+    Run every warm-up step once, recording how long each took.
+    
+    Concurrent callers wait for the running warm-up; after a failure the
+    next call starts over.
+    """
+    with _warm_up_lock:
+        if _ready.is_set():
+            return warm_up_state
+        
+        print("=" * 70)
+        print("🤖 JETKING ENHANCED AI AGENT (WITH QUERY NORMALIZATION)")
+        print("=" * 70)
+        warm_up_state.update(status="warming", steps_ms={}, total_ms=None, error=None)
+        started = time.perf_counter()
+        for name, step in WARM_UP_STEPS:
+            step_started = time.perf_counter()
+            try:
+                step()
+            except Exception as e:
+                warm_up_state.update(status="failed", error=f"{name}: {e}")
+                print(f"❌ Warm-up step '{name}' failed: {e}")
+                raise
+            warm_up_state["steps_ms"][name] = _elapsed_ms(step_started)
+            print(f"⏱️ Warm-up step '{name}' took {warm_up_state['steps_ms'][name]} ms")
+        
+        warm_up_state.update(status="ready", total_ms=_elapsed_ms(started))
+        _ready.set()
+        print(f"✅ Warm-up completed in {warm_up_state['total_ms']} ms")
+        return warm_up_state
+
+def is_ready():
+    return _ready.is_set()
+
+def ensure_ready():
+    """Warm up now unless that has already happened (blocks while another warm-up runs)"""
+    if not _ready.is_set():
+        warm_up()
+
+async def ensure_ready_async():
+    """Async variant of ensure_ready; the blocking steps run in a worker thread"""
+    if not _ready.is_set():
+        await asyncio.to_thread(warm_up)
+
 # ---------------------------
 # Testing Mode
 # ---------------------------
@@ -825,6 +2423,8 @@ if __name__ == "__main__":
     print("🧪 Testing Enhanced AI Agent")
     print("="*70)
     
+    warm_up()
+    
     # Run health check
     print("\n🏥 Running Health Check...")
     health_status = health_check()
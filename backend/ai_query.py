@@ -446,34 +446,26 @@
     
 import os
 import re
+import sys
 from dotenv import load_dotenv
-from urllib.parse import quote_plus
-from langchain_community.utilities import SQLDatabase
-from langchain_openai import ChatOpenAI
 from langchain_community.tools import QuerySQLDatabaseTool
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from llm_governor import GovernedChatOpenAI
+from db import get_sql_database, mysql_database as database
+
 # Load environment variables
 load_dotenv()
 
-# --- MySQL credentials ---
-host = os.getenv("MYSQL_HOST", "localhost")
-port = os.getenv("MYSQL_PORT", "3306")
-user = quote_plus(os.getenv("MYSQL_USER", "root"))
-password = quote_plus(os.getenv("MYSQL_PASSWORD", ""))
-database = os.getenv("MYSQL_DATABASE", "your_database_name")
-
-mysql_uri = f"mysql+pymysql://{user}:{password}@{host}:{port}/{database}"
-
 print("=" * 70)
 print("🤖 JETKING DATA CHATBOT (FASTAPI MODE)")
 print("=" * 70)
 print("🔗 Connecting to MySQL...")
 
-# --- MySQL Connection ---
-db = SQLDatabase.from_uri(
-    mysql_uri,
+# --- MySQL Connection (shared pool from db.py) ---
+db = get_sql_database(
     view_support=True,
     sample_rows_in_table_info=2,  # Include sample rows for better context
     max_string_length=100,
@@ -547,7 +539,7 @@ ENHANCED_SCHEMA = build_enhanced_schema()
 print("\n📋 Enhanced schema loaded successfully.")
 
 # --- LLM ---
-llm = ChatOpenAI(temperature=0, model_name="gpt-4o-mini")
+llm = GovernedChatOpenAI(temperature=0, model_name="gpt-4o-mini")  # shared rate governor
 
 # -------------------------------------------------------------------
 # ✅ Query Normalization Layer
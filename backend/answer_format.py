@@ -0,0 +1,78 @@
+import re
+from datetime import date, datetime
+from decimal import Decimal
+
+# ---------------------------
+# Value & Label Formatting
+# ---------------------------
+def format_label(column: str) -> str:
+    """Turn a column name or expression into a readable label"""
+    name = column.split(".")[-1].strip("`")
+    aggregate = re.match(r"^(count|sum|avg|min|max)\s*\(", name, re.IGNORECASE)
+    if aggregate:
+        return {"count": "Count", "sum": "Total", "avg": "Average", "min": "Minimum", "max": "Maximum"}[aggregate.group(1).lower()]
+    return name.replace("_", " ").strip().title() or "Value"
+
+def format_value(value, kind: str = None) -> str:
+    """
+    Format a single result value with thousands separators. `kind` is the
+    column type from a typed result (results.make_result); exact decimals
+    arrive there as strings and are only reformatted for "decimal" columns.
+    """
+    if value is None:
+        return "-"
+    if isinstance(value, bool):
+        return "Yes" if value else "No"
+    if isinstance(value, int):
+        return f"{value:,}"
+    if isinstance(value, Decimal):
+        if value == value.to_integral_value():
+            return f"{int(value):,}"
+        return f"{value:,.2f}"
+    if isinstance(value, float):
+        return f"{value:,.0f}" if value.is_integer() else f"{value:,.2f}"
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    if isinstance(value, str) and kind == "decimal":
+        return f"{Decimal(value):,}"
+    return str(value)
+
+# ---------------------------
+# Template Answers
+# ---------------------------
+def format_answer(columns, rows, max_rows: int = 20, types=None):
+    """
+    Format scalar, single-row and small-table results without the LLM.
+    `types` are the result's column types (see format_value).
+
+    Returns:
+        str or None: the answer, or None when the result is too large to
+        render locally
+    """
+    if not rows:
+        return None
+    labels = [format_label(c) for c in columns]
+    types = types or [None] * len(columns)
+
+    if len(rows) == 1 and len(columns) == 1:
+        return f"{labels[0]}: {format_value(rows[0][0], types[0])}"
+
+    if len(rows) == 1:
+        return "; ".join(f"{label}: {format_value(value, kind)}" for label, value, kind in zip(labels, rows[0], types))
+
+    if len(rows) > max_rows:
+        return None
+
+    lines = [
+        f"Found {len(rows):,} results:",
+        "",
+        "| " + " | ".join(labels) + " |",
+        "|" + "|".join("---" for _ in labels) + "|",
+    ]
+    for row in rows:
+        lines.append("| " + " | ".join(format_value(v, kind).replace("|", "/") for v, kind in zip(row, types)) + " |")
+    return "\n".join(lines)
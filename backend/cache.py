@@ -0,0 +1,94 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# ---------------------------
+# Bounded TTL Cache
+# ---------------------------
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after `ttl` seconds"""
+
+    def __init__(self, max_size: int = 512, ttl: float = 300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.evictions += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: float = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """Return hit/miss counters for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+# ---------------------------
+# Canonical Question Keys
+# ---------------------------
+# Comparison operators, "%", decimal points, signs and hyphens change what a
+# question asks, so only the remaining punctuation is folded away
+_THOUSANDS_SEPARATOR = re.compile(r"(?<=\d),(?=\d{3}(?!\d))")
+_PUNCTUATION = re.compile(r"(?!(?<=\d)\.(?=\d)|(?<=\w)-(?=\w)|-(?=\d)|!=)[^\w\s<>=%]")
+_OPERATOR = re.compile(r"\s*(!=|<=|>=|<|>|=)\s*")
+_WHITESPACE = re.compile(r"\s+")
+
+def canonicalize_text(text: str) -> str:
+    """Fold case, punctuation and whitespace so equivalent phrasings share a key"""
+    if not text:
+        return ""
+    text = _THOUSANDS_SEPARATOR.sub("", text.lower())
+    text = _OPERATOR.sub(r" \1 ", _PUNCTUATION.sub(" ", text))
+    return _WHITESPACE.sub(" ", text).strip()
+
+def canonical_question_key(question: str, context: str = None) -> str:
+    """Build the cache key for a question and its optional context"""
+    return f"{canonicalize_text(question)}||{canonicalize_text(context)}"
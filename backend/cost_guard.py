@@ -0,0 +1,190 @@
+import re
+import threading
+from datetime import datetime
+
+from sql_utils import bound_limit
+
+# ---------------------------
+# EXPLAIN Summaries
+# ---------------------------
+# Join types that read every row of the table or of one of its indexes
+# (e.g. LOWER(name) LIKE '%x%' over a covering index on name)
+FULL_SCAN_TYPES = ("ALL", "index")
+
+def summarize_plan(columns, rows):
+    """
+    Summarize traditional EXPLAIN output.
+
+    Rows examined are estimated per SELECT as a nested-loop join: each
+    table's `rows` is read once per row surviving the tables before it
+    (`rows * filtered%`).
+
+    Returns:
+        dict: tables (table, join type, key, rows, filtered), rows_examined,
+        full_scans (tables read in full: type ALL, or index for a full index scan)
+    """
+    tables = []
+    examined = {}
+    fanout = {}
+    for row in rows:
+        entry = dict(zip([c.lower() for c in columns], row))
+        if entry.get("table") is None:
+            continue
+        select_id = entry.get("id")
+        estimate = int(entry.get("rows") or 1)
+        filtered = float(entry.get("filtered") or 100.0)
+        prefix = fanout.get(select_id, 1.0)
+        examined[select_id] = examined.get(select_id, 0.0) + prefix * estimate
+        fanout[select_id] = prefix * max(estimate * filtered / 100.0, 1.0)
+        tables.append({
+            "table": entry["table"],
+            "type": entry.get("type"),
+            "key": entry.get("key"),
+            "rows": estimate,
+            "filtered": filtered,
+        })
+    return {
+        "tables": tables,
+        "rows_examined": int(sum(examined.values())),
+        "full_scans": [t["table"] for t in tables if t["type"] in FULL_SCAN_TYPES],
+    }
+
+# ---------------------------
+# Rewrites
+# ---------------------------
+_ORDERED_OR_AGGREGATED = re.compile(
+    r"\b(?:ORDER\s+BY|GROUP\s+BY|DISTINCT|HAVING|COUNT|SUM|AVG|MIN|MAX)\b", re.IGNORECASE
+)
+_CLAUSE_AFTER_WHERE = re.compile(r"\b(?:GROUP\s+BY|HAVING|ORDER\s+BY|LIMIT)\b", re.IGNORECASE)
+
+def _is_simple_select(sql: str) -> bool:
+    """One SELECT over one FROM, so clauses can be edited with regexes"""
+    return (
+        len(re.findall(r"\bSELECT\b", sql, re.IGNORECASE)) == 1
+        and not re.search(r"\b(?:UNION|JOIN)\b", sql, re.IGNORECASE)
+    )
+
+def _filters_on(sql: str, column: str) -> bool:
+    where = re.search(r"\bWHERE\b(.*)", sql, re.IGNORECASE | re.DOTALL)
+    return bool(where and re.search(rf"\b{re.escape(column)}\b", where.group(1), re.IGNORECASE))
+
+def inject_date_range(sql: str, column: str, days: int) -> str:
+    """AND a `column >= CURDATE() - INTERVAL days DAY` condition into a single-table query"""
+    condition = f"`{column}` >= CURDATE() - INTERVAL {int(days)} DAY"
+    where = re.search(r"\bWHERE\b", sql, re.IGNORECASE)
+    if where:
+        tail = _CLAUSE_AFTER_WHERE.search(sql, where.end())
+        end = tail.start() if tail else len(sql)
+        return f"{sql[:where.start()]}WHERE {condition} AND ({sql[where.end():end].strip()}) {sql[end:]}".strip()
+    tail = _CLAUSE_AFTER_WHERE.search(sql)
+    end = tail.start() if tail else len(sql)
+    return f"{sql[:end].rstrip()} WHERE {condition} {sql[end:]}".strip()
+
+# ---------------------------
+# Cost Guard
+# ---------------------------
+def parse_active_hours(value: str):
+    """"9-19" -> (9, 19); empty means always active"""
+    if not value:
+        return None
+    start, end = (int(part) for part in value.split("-"))
+    return start, end
+
+class CostGuard:
+    """
+    Checks EXPLAIN estimates of generated SQL against thresholds and
+    decides to run, rewrite or reject it.
+
+    Over-budget single-table queries are rewritten: unordered scans get a
+    tighter LIMIT (MySQL stops reading once it has enough rows), others get
+    a date range on the table's date column and are re-checked. Rewrites
+    carry a note for the answer, since they change what the result covers.
+    Anything else over budget is rejected.
+    """
+
+    def __init__(self, max_rows_examined: int = 1_000_000, max_scan_rows: int = 20_000,
+                 rewrite_limit: int = 20, date_range_days: int = 90, active_hours=None):
+        self.max_rows_examined = max_rows_examined
+        self.max_scan_rows = max_scan_rows
+        self.rewrite_limit = rewrite_limit
+        self.date_range_days = date_range_days
+        self.active_hours = active_hours
+        self._lock = threading.Lock()
+        self.counts = {"checked": 0, "passed": 0, "rewritten": 0, "rejected": 0, "warned": 0, "failed": 0}
+
+    def _count(self, outcome):
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def violations(self, summary):
+        """Threshold breaches of a plan summary, as readable strings"""
+        found = []
+        if summary["rows_examined"] > self.max_rows_examined:
+            found.append(f"~{summary['rows_examined']:,} rows examined (limit {self.max_rows_examined:,})")
+        for table in summary["tables"]:
+            if table["type"] in FULL_SCAN_TYPES and table["rows"] > self.max_scan_rows:
+                found.append(f"full scan of {table['table']} (~{table['rows']:,} rows, limit {self.max_scan_rows:,})")
+        return found
+
+    def is_active(self, now=None):
+        if self.active_hours is None:
+            return True
+        start, end = self.active_hours
+        hour = (now or datetime.now()).hour
+        return start <= hour < end if start <= end else hour >= start or hour < end
+
+    def review(self, sql: str, summary, date_column: str = None, rechecked: bool = False):
+        """
+        Decide what to do with a query given its plan summary.
+
+        Returns:
+            dict: action ("run", "rewrite", "reject"), sql to run, reason,
+            note (what a rewrite changed, for the answer) and recheck (True
+            when the rewritten SQL must be explained again)
+        """
+        if not rechecked:
+            self._count("checked")
+        found = self.violations(summary)
+        if not found:
+            self._count("rewritten" if rechecked else "passed")
+            return {"action": "run", "sql": sql, "reason": None, "note": None, "recheck": False}
+        reason = "; ".join(found)
+        if not self.is_active():
+            self._count("warned")
+            return {"action": "run", "sql": sql, "reason": f"outside active hours: {reason}", "note": None, "recheck": False}
+
+        single_table = len({t["table"] for t in summary["tables"]}) == 1 and _is_simple_select(sql)
+        if single_table and not rechecked:
+            if not _ORDERED_OR_AGGREGATED.search(sql):
+                self._count("rewritten")
+                return {
+                    "action": "rewrite",
+                    "sql": bound_limit(sql, self.rewrite_limit),
+                    "reason": f"{reason}; limited to {self.rewrite_limit} rows",
+                    "note": f"Only the first {self.rewrite_limit} matching rows were read to keep the query within cost limits.",
+                    "recheck": False,
+                }
+            if date_column and not _filters_on(sql, date_column):
+                return {
+                    "action": "rewrite",
+                    "sql": inject_date_range(sql, date_column, self.date_range_days),
+                    "reason": f"{reason}; restricted to the last {self.date_range_days} days of {date_column}",
+                    "note": f"Results cover only the last {self.date_range_days} days of {date_column} "
+                            "to keep the query within cost limits.",
+                    "recheck": True,
+                }
+        self._count("rejected")
+        return {"action": "reject", "sql": sql, "reason": reason, "note": None, "recheck": False}
+
+    def record_failure(self):
+        self._count("failed")
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+        return {
+            **counts,
+            "max_rows_examined": self.max_rows_examined,
+            "max_scan_rows": self.max_scan_rows,
+            "active_hours": "-".join(map(str, self.active_hours)) if self.active_hours else None,
+        }
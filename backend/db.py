@@ -48,24 +48,320 @@
 
 
 import os
+import sys
+import threading
+import time
 from dotenv import load_dotenv
 from urllib.parse import quote_plus
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from langchain_community.utilities import SQLDatabase
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from metrics import RollingStats
+
 load_dotenv()
 
 # --- MySQL Credentials ---
-mysql_user = quote_plus(os.getenv("MYSQL_USER"))
-mysql_password = quote_plus(os.getenv("MYSQL_PASSWORD"))
+mysql_user = quote_plus(os.getenv("MYSQL_USER", "root"))
+mysql_password = quote_plus(os.getenv("MYSQL_PASSWORD", ""))
 mysql_host = os.getenv("MYSQL_HOST", "localhost")
 mysql_port = os.getenv("MYSQL_PORT", "3306")
-mysql_database = os.getenv("MYSQL_DATABASE")
+mysql_database = os.getenv("MYSQL_DATABASE", "your_database_name")
 
 # --- Build MySQL URI ---
-# Using PyMySQL driver
+# Using PyMySQL driver (aiomysql for the async engine)
 mysql_uri = f"mysql+pymysql://{mysql_user}:{mysql_password}@{mysql_host}:{mysql_port}/{mysql_database}"
+async_mysql_uri = f"mysql+aiomysql://{mysql_user}:{mysql_password}@{mysql_host}:{mysql_port}/{mysql_database}"
+
+# --- Pool Configuration ---
+MYSQL_POOL_SIZE = int(os.getenv("MYSQL_POOL_SIZE", "10"))
+MYSQL_MAX_OVERFLOW = int(os.getenv("MYSQL_MAX_OVERFLOW", "20"))
+MYSQL_POOL_TIMEOUT = float(os.getenv("MYSQL_POOL_TIMEOUT", "30"))
+MYSQL_POOL_RECYCLE = int(os.getenv("MYSQL_POOL_RECYCLE", "3600"))
+
+# --- Pool Metrics ---
+class PoolMetrics:
+    """Checkout wait times and timeouts for one connection pool"""
+
+    def __init__(self):
+        self.wait = RollingStats()
+        self.timeouts = 0
+
+    def record(self, wait_ms, timed_out=False):
+        self.wait.record(wait_ms, success=not timed_out)
+        if timed_out:
+            self.timeouts += 1
+
+class _TimedPoolMixin:
+    """Times every checkout, including the wait for a free connection"""
+
+    metrics = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.record((time.perf_counter() - started) * 1000, timed_out=True)
+            raise
+        self.metrics.record((time.perf_counter() - started) * 1000)
+        return conn
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    metrics = PoolMetrics()
+
+class TimedAsyncPool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    metrics = PoolMetrics()
+
+def _timed_pool_class(base):
+    """Subclass of a timed pool with its own metrics (pools are recreated by class on dispose)"""
+    return type(base.__name__, (base,), {"metrics": PoolMetrics()})
+
+def _pool_options():
+    return {
+        "pool_size": MYSQL_POOL_SIZE,
+        "max_overflow": MYSQL_MAX_OVERFLOW,
+        "pool_timeout": MYSQL_POOL_TIMEOUT,
+        "pool_recycle": MYSQL_POOL_RECYCLE,
+        "pool_pre_ping": True,
+        "echo": False,
+    }
+
+# --- Shared Engines ---
+_engine = None
+_async_engine = None
+_sql_databases = {}
+_lock = threading.Lock()
+
+def get_engine():
+    """The process-wide MySQL engine (created on first use)"""
+    global _engine
+    with _lock:
+        if _engine is None:
+            _engine = create_engine(mysql_uri, poolclass=TimedQueuePool, **_pool_options())
+        return _engine
+
+def get_async_engine():
+    """The process-wide aiomysql engine (created on first use)"""
+    global _async_engine
+    with _lock:
+        if _async_engine is None:
+            _async_engine = create_async_engine(async_mysql_uri, poolclass=TimedAsyncPool, **_pool_options())
+        return _async_engine
+
+def get_sql_database(**kwargs):
+    """A LangChain SQLDatabase over the shared engine (one per distinct set of options)"""
+    key = tuple(sorted(kwargs.items()))
+    with _lock:
+        sql_database = _sql_databases.get(key)
+    if sql_database is None:
+        sql_database = SQLDatabase(get_engine(), **kwargs)
+        with _lock:
+            sql_database = _sql_databases.setdefault(key, sql_database)
+    return sql_database
+
+def _pool_snapshot(pool, metrics):
+    capacity = MYSQL_POOL_SIZE + MYSQL_MAX_OVERFLOW
+    checked_out = pool.checkedout() if pool is not None else 0
+    return {
+        "pool_size": MYSQL_POOL_SIZE,
+        "max_overflow": MYSQL_MAX_OVERFLOW,
+        "checked_out": checked_out,
+        "idle": pool.checkedin() if pool is not None else 0,
+        "utilization": round(checked_out / capacity, 4) if capacity else None,
+        "checkout_wait": metrics.wait.snapshot(),
+        "checkout_timeouts": metrics.timeouts,
+    }
+
+def _server_pools(engine, async_engine, sync_metrics, async_metrics):
+    return {
+        "sync": _pool_snapshot(engine.pool if engine is not None else None, sync_metrics),
+        "async": _pool_snapshot(async_engine.sync_engine.pool if async_engine is not None else None, async_metrics),
+    }
+
+def pool_stats():
+    """Checkout wait percentiles, timeouts and utilization of the primary's pools, and each replica's"""
+    return {
+        **_server_pools(_engine, _async_engine, TimedQueuePool.metrics, TimedAsyncPool.metrics),
+        "replicas": {replica.name: replica.pool_stats() for replica in replicas},
+    }
+
+# --- Read Replicas ---
+# Comma-separated replica DSNs: full SQLAlchemy URIs, or host[:port] reusing the primary's credentials
+MYSQL_REPLICA_URIS = [entry.strip() for entry in os.getenv("MYSQL_REPLICA_URIS", "").split(",") if entry.strip()]
+MYSQL_REPLICA_MAX_LAG = float(os.getenv("MYSQL_REPLICA_MAX_LAG", "30"))
+
+_REPLICA_STATUS_QUERIES = ("SHOW REPLICA STATUS", "SHOW SLAVE STATUS")  # MySQL 8.0.22+ / older
+
+class Replica:
+    """One read replica: lazily created engines plus the health and lag found by its last check"""
+
+    def __init__(self, entry: str):
+        if "://" in entry:
+            self.uri = entry
+            self.name = entry.rsplit("@", 1)[-1].split("/", 1)[0]
+        else:
+            host, _, port = entry.partition(":")
+            self.uri = f"mysql+pymysql://{mysql_user}:{mysql_password}@{host}:{port or mysql_port}/{mysql_database}"
+            self.name = entry
+        self.async_uri = self.uri.replace("mysql+pymysql://", "mysql+aiomysql://", 1)
+        self.healthy = False  # not routable until its first successful check
+        self.replicating = None
+        self.lag_seconds = None
+        self.error = None
+        self.picks = 0
+        self._engine = None
+        self._async_engine = None
+        self._pool_class = _timed_pool_class(TimedQueuePool)
+        self._async_pool_class = _timed_pool_class(TimedAsyncPool)
+
+    def engine(self):
+        with _lock:
+            if self._engine is None:
+                self._engine = create_engine(self.uri, poolclass=self._pool_class, **_pool_options())
+            return self._engine
+
+    def async_engine(self):
+        with _lock:
+            if self._async_engine is None:
+                self._async_engine = create_async_engine(self.async_uri, poolclass=self._async_pool_class, **_pool_options())
+            return self._async_engine
+
+    def pool_stats(self):
+        return _server_pools(self._engine, self._async_engine, self._pool_class.metrics, self._async_pool_class.metrics)
+
+    def check(self):
+        """Probe liveness and replication lag (raises when the replica is unreachable)"""
+        try:
+            with self.engine().connect() as conn:
+                status = None
+                for query in _REPLICA_STATUS_QUERIES:
+                    try:
+                        status = conn.execute(text(query)).mappings().first()
+                        break
+                    except Exception:
+                        continue
+        except Exception as e:
+            self.healthy, self.error = False, str(e)
+            raise
+        self.healthy, self.error = True, None
+        if status is None:
+            # Not a classic replica (e.g. a managed reader endpoint); lag is unknown
+            self.replicating, self.lag_seconds = None, None
+            return
+        lag = status.get("Seconds_Behind_Source", status.get("Seconds_Behind_Master"))
+        self.replicating = lag is not None  # NULL while the replication threads are stopped
+        self.lag_seconds = float(lag) if lag is not None else None
+
+    def routable(self):
+        if not self.healthy or self.replicating is False:
+            return False
+        return self.lag_seconds is None or self.lag_seconds <= MYSQL_REPLICA_MAX_LAG
+
+    def load(self):
+        """Connections currently checked out from this replica's pools"""
+        pools = [e.pool for e in (self._engine,) if e is not None]
+        pools += [e.sync_engine.pool for e in (self._async_engine,) if e is not None]
+        return sum(pool.checkedout() for pool in pools)
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "healthy": self.healthy,
+            "routable": self.routable(),
+            "replicating": self.replicating,
+            "lag_seconds": self.lag_seconds,
+            "in_use": self.load(),
+            "picks": self.picks,
+            "error": self.error,
+        }
+
+replicas = [Replica(entry) for entry in MYSQL_REPLICA_URIS]
+_primary_reads = 0
+
+def pick_replica(fresh: bool = False):
+    """
+    Least-loaded routable replica (fewest picks breaks ties), or None for
+    the primary. Not counted: call record_read() once a query runs there.
+    """
+    candidates = [] if fresh else [r for r in replicas if r.routable()]
+    with _lock:
+        return min(candidates, key=lambda r: (r.load(), r.picks), default=None)
+
+def record_read(replica):
+    """Count a query routed to `replica` (None for the primary)"""
+    global _primary_reads
+    with _lock:
+        if replica is None:
+            _primary_reads += 1
+        else:
+            replica.picks += 1
+
+def engine_for(replica):
+    """Engine of a pick_replica() result (the primary's for None)"""
+    return replica.engine() if replica is not None else get_engine()
+
+def async_engine_for(replica):
+    """Async variant of engine_for"""
+    return replica.async_engine() if replica is not None else get_async_engine()
+
+def get_read_engine(fresh: bool = False, count: bool = True):
+    """
+    Engine for a read-only query: a healthy, lag-bounded replica if any,
+    else the primary. Pass count=False for side statements (EXPLAIN,
+    version probes) so routing counts reflect real queries only.
+    """
+    replica = pick_replica(fresh)
+    if count:
+        record_read(replica)
+    return engine_for(replica)
+
+def get_read_async_engine(fresh: bool = False, count: bool = True):
+    """Async variant of get_read_engine"""
+    replica = pick_replica(fresh)
+    if count:
+        record_read(replica)
+    return async_engine_for(replica)
+
+def replica_stats():
+    """Health, lag, load and routing counts of the read replicas"""
+    return {
+        "max_lag_seconds": MYSQL_REPLICA_MAX_LAG,
+        "primary_reads": _primary_reads,
+        "replicas": [replica.stats() for replica in replicas],
+    }
+
+# --- Snowflake (crud.py / test.py pipelines) ---
+# Statements running longer than this are cancelled by Snowflake itself
+SNOWFLAKE_STATEMENT_TIMEOUT = int(os.getenv("SNOWFLAKE_STATEMENT_TIMEOUT", "120"))
+_snowflake_db = None
 
-# --- Connect to MySQL ---
-mysql_db = SQLDatabase.from_uri(mysql_uri, view_support=True)
+def get_snowflake_database():
+    """LangChain SQLDatabase over Snowflake with a per-statement timeout (created on first use)"""
+    global _snowflake_db
+    with _lock:
+        if _snowflake_db is None:
+            snowflake_uri = (
+                f"snowflake://{quote_plus(os.getenv('SNOWFLAKE_USER', ''))}:{quote_plus(os.getenv('SNOWFLAKE_PASSWORD', ''))}"
+                f"@{os.getenv('SNOWFLAKE_ACCOUNT')}/{os.getenv('SNOWFLAKE_DATABASE')}"
+                f"/{os.getenv('SNOWFLAKE_SCHEMA')}?warehouse={os.getenv('SNOWFLAKE_WAREHOUSE')}&role={os.getenv('SNOWFLAKE_ROLE')}"
+            )
+            snowflake_engine = create_engine(
+                snowflake_uri,
+                connect_args={"session_parameters": {"STATEMENT_TIMEOUT_IN_SECONDS": SNOWFLAKE_STATEMENT_TIMEOUT}},
+                pool_pre_ping=True,
+            )
+            _snowflake_db = SQLDatabase(snowflake_engine, view_support=True)
+        return _snowflake_db
 
-print("✅ Connected to MySQL successfully!")
+def __getattr__(name):
+    # `mysql_db` used to be built at import; it is now created lazily on the shared engine
+    if name == "mysql_db":
+        return get_sql_database(view_support=True)
+    # `db` is the Snowflake database crud.py and test.py import
+    if name == "db":
+        return get_snowflake_database()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
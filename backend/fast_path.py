@@ -0,0 +1,227 @@
+import json
+import re
+import threading
+from datetime import date
+
+from cache import canonicalize_text
+
+# ---------------------------
+# Default Question Catalogue
+# ---------------------------
+# Patterns are matched against the canonical question (lowercase, no punctuation).
+# "answer" is formatted with {value} (first column of the first row), {count}
+# (row count), {items} (first column of every row) and the extracted parameters.
+# Routes with "empty_falls_through" hand zero or empty results to the full pipeline.
+DEFAULT_CATALOGUE = [
+    {
+        "name": "active_branches_in_city",
+        "patterns": [r"(?:how many|count|number of) active branch(?:es)?(?: are there)? in (?P<city>.+)"],
+        "sql": "SELECT COUNT(*) AS branch_count FROM branch b JOIN cities c ON b.city_id = c.id "
+               "WHERE b.status = 1 AND c.name = :city",
+        "answer": "There are {value:,} active branches in {city}.",
+        "params": {"city": "city"},
+        "empty_falls_through": True,
+    },
+    {
+        "name": "branches_in_city",
+        "patterns": [r"(?:how many|count|number of) branch(?:es)?(?: are there)? in (?P<city>.+)"],
+        "sql": "SELECT COUNT(*) AS branch_count FROM branch b JOIN cities c ON b.city_id = c.id "
+               "WHERE c.name = :city",
+        "answer": "There are {value:,} branches in {city}.",
+        "params": {"city": "city"},
+        "empty_falls_through": True,
+    },
+    {
+        "name": "list_active_branches_in_city",
+        "patterns": [r"(?:list|show)(?: me)?(?: all)? active branch(?:es)? in (?P<city>.+)"],
+        "sql": "SELECT b.name FROM branch b JOIN cities c ON b.city_id = c.id "
+               "WHERE b.status = 1 AND c.name = :city ORDER BY b.name LIMIT 100",
+        "answer": "Found {count:,} active branches in {city}: {items}.",
+        "params": {"city": "city"},
+        "empty_falls_through": True,
+    },
+    {
+        "name": "active_branch_count",
+        "patterns": [r"(?:how many|count|number of|total) active branch(?:es)?(?: are there)?"],
+        "sql": "SELECT COUNT(*) AS branch_count FROM branch WHERE status = 1",
+        "answer": "There are {value:,} active branches.",
+    },
+    {
+        "name": "branch_count",
+        "patterns": [
+            r"(?:how many|count|number of|total) branch(?:es)?(?: are there)?(?: in (?:the )?database)?",
+            r"total number of branch(?:es)?",
+        ],
+        "sql": "SELECT COUNT(*) AS branch_count FROM branch",
+        "answer": "There are {value:,} branches in total.",
+    },
+    {
+        "name": "active_campaign_count",
+        "patterns": [r"(?:how many|count|number of|total) active campaigns?(?: are there)?"],
+        "sql": "SELECT COUNT(*) AS campaign_count FROM campaigns WHERE status = 1",
+        "answer": "There are {value:,} active campaigns.",
+    },
+    {
+        "name": "campaign_count",
+        "patterns": [r"(?:how many|count|number of|total|total number of) campaigns?(?: are there)?"],
+        "sql": "SELECT COUNT(*) AS campaign_count FROM campaigns",
+        "answer": "There are {value:,} campaigns in total.",
+    },
+    {
+        "name": "campaigns_budget_over",
+        "patterns": [r"(?:show|list)(?: me)?(?: all)? campaigns? with (?:a )?budget (?:over|above|greater than|more than) (?P<amount>\d+)"],
+        "sql": "SELECT name FROM campaigns WHERE budget > :amount ORDER BY budget DESC LIMIT 100",
+        "answer": "Found {count:,} campaigns with a budget over {amount:,}: {items}.",
+        "empty_answer": "No campaigns have a budget over {amount:,}.",
+        "params": {"amount": "int"},
+    },
+    {
+        "name": "calls_this_year",
+        "patterns": [r"(?:(?:total|how many|number of)(?: number of)? )?calls(?: made)? this year"],
+        "sql": "SELECT COUNT(*) AS total_calls FROM callcenter_calls "
+               "WHERE start_time >= MAKEDATE(YEAR(CURDATE()), 1)",
+        "answer": "{value:,} calls have been made this year.",
+    },
+    {
+        "name": "calls_in_year",
+        "patterns": [r"(?:(?:total|how many|number of)(?: number of)? )?calls(?: made)? in (?P<year>\d{4})"],
+        "sql": "SELECT COUNT(*) AS total_calls FROM callcenter_calls "
+               "WHERE start_time >= :year_start AND start_time < :year_end",
+        "answer": "{value:,} calls were made in {year}.",
+        "params": {"year": "year_range"},
+    },
+    {
+        "name": "total_calls",
+        "patterns": [r"(?:total|how many|number of|total number of) calls?(?: made)?(?: are there)?"],
+        "sql": "SELECT COUNT(*) AS total_calls FROM callcenter_calls",
+        "answer": "{value:,} calls have been recorded in total.",
+    },
+    {
+        "name": "city_count",
+        "patterns": [r"(?:how many|count|number of|total|total number of) cities(?: are there)?(?: in (?:the )?database)?"],
+        "sql": "SELECT COUNT(*) AS city_count FROM cities",
+        "answer": "There are {value:,} cities in the database.",
+    },
+]
+
+# Parameter kinds that only bind to values present in the database, spelled as stored
+DEFAULT_VOCABULARIES = {
+    "city": "SELECT name FROM cities",
+}
+
+# Leading phrases that do not change the meaning of a question
+_FILLER = re.compile(r"^(?:please |can you |could you |tell me |what is |what s |what are |give me )+")
+_TRAILING_FILLER = re.compile(r"(?: please| thanks| thank you)+$")
+
+# ---------------------------
+# Parameter Converters
+# ---------------------------
+def _convert_param(kind: str, name: str, raw: str):
+    raw = raw.strip()
+    if kind == "title":
+        return {name: raw.title()}
+    if kind == "int":
+        return {name: int(raw)}
+    if kind == "year_range":
+        year = int(raw)
+        return {name: year, f"{name}_start": date(year, 1, 1), f"{name}_end": date(year + 1, 1, 1)}
+    return {name: raw}
+
+# ---------------------------
+# Fast-Path Router
+# ---------------------------
+class FastPathRouter:
+    """Maps common question forms to precompiled, parameterized SQL"""
+
+    def __init__(self, catalogue):
+        self.routes = []
+        for entry in catalogue:
+            patterns = [re.compile(p) for p in entry["patterns"]]
+            self.routes.append({**entry, "compiled": patterns})
+        self.vocabulary_sql = dict(DEFAULT_VOCABULARIES)
+        self.vocabularies = {}
+        self._lock = threading.Lock()
+        self.hits = {}
+        self.misses = 0
+        self.fall_throughs = 0
+
+    @classmethod
+    def from_config(cls, path: str = None):
+        """Default catalogue, extended (or overridden by name) with entries from a JSON file"""
+        catalogue = {entry["name"]: entry for entry in DEFAULT_CATALOGUE}
+        if path:
+            with open(path, encoding="utf-8") as f:
+                for entry in json.load(f):
+                    catalogue[entry["name"]] = entry
+        return cls(list(catalogue.values()))
+
+    def load_vocabulary(self, kind: str, values):
+        """Restrict a parameter kind to known values (e.g. city names from the cities table)"""
+        vocabulary = {canonicalize_text(str(value)): value for value in values if value}
+        with self._lock:
+            self.vocabularies[kind] = vocabulary
+
+    def _bind(self, route, found):
+        """Convert a match's groups to bind params, or None if a value is unknown"""
+        params = {}
+        for name, raw in found.groupdict().items():
+            if raw is None:
+                continue
+            kind = route.get("params", {}).get(name, "str")
+            if kind in self.vocabulary_sql:
+                value = self.vocabularies.get(kind, {}).get(canonicalize_text(raw))
+                if value is None:
+                    return None
+                params[name] = value
+            else:
+                params.update(_convert_param(kind, name, raw))
+        return params
+
+    def match(self, question: str):
+        """Return (route, bind params) for a known question form, else None"""
+        canonical = _TRAILING_FILLER.sub("", _FILLER.sub("", canonicalize_text(question)))
+        for route in self.routes:
+            for pattern in route["compiled"]:
+                found = pattern.fullmatch(canonical)
+                params = self._bind(route, found) if found else None
+                if params is None:
+                    continue
+                with self._lock:
+                    self.hits[route["name"]] = self.hits.get(route["name"], 0) + 1
+                return route, params
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def falls_through(self, route, rows):
+        """True when a route's empty or zero result should go to the full pipeline instead"""
+        if not route.get("empty_falls_through") or (rows and rows[0][0]):
+            return False
+        with self._lock:
+            self.fall_throughs += 1
+        return True
+
+    def render_answer(self, route, params, rows):
+        """Format the answer for a route from its result rows"""
+        if not rows and route.get("empty_answer"):
+            return route["empty_answer"].format(**params)
+        value = rows[0][0] if rows else 0
+        items = ", ".join(str(row[0]) for row in rows)
+        return route["answer"].format(value=value if value is not None else 0, count=len(rows), items=items, **params)
+
+    def stats(self):
+        with self._lock:
+            hits = dict(self.hits)
+            misses = self.misses
+            fall_throughs = self.fall_throughs
+        total_hits = sum(hits.values())
+        lookups = total_hits + misses
+        return {
+            "routes": len(self.routes),
+            "hits": total_hits,
+            "misses": misses,
+            "hit_ratio": round(total_hits / lookups, 4) if lookups else 0.0,
+            "fall_throughs": fall_throughs,
+            "hits_by_route": hits,
+            "vocabularies": {kind: len(values) for kind, values in self.vocabularies.items()},
+        }
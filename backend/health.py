@@ -0,0 +1,84 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timezone
+
+from metrics import RollingStats
+
+# ---------------------------
+# Background Health Probing
+# ---------------------------
+class HealthProber:
+    """
+    Runs cheap dependency probes on their own intervals and caches the
+    latest status with rolling latency percentiles per probe.
+    """
+
+    def __init__(self, window: int = 200):
+        self._probes = {}
+        self._status = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._tasks = []
+        self.window = window
+
+    def add_probe(self, name: str, fn, interval: float):
+        """Register a blocking probe; fn() raising means unhealthy"""
+        self._probes[name] = {"fn": fn, "interval": interval}
+        self._stats[name] = RollingStats(window=self.window)
+
+    def probe(self, name: str):
+        """Run one probe now and record its result"""
+        started = time.perf_counter()
+        error = None
+        try:
+            self._probes[name]["fn"]()
+        except Exception as e:
+            error = str(e)
+        latency_ms = round((time.perf_counter() - started) * 1000, 1)
+        self._stats[name].record(latency_ms, success=error is None)
+        status = {
+            "healthy": error is None,
+            "latency_ms": latency_ms,
+            "checked_at": datetime.now(timezone.utc).isoformat(),
+            "error": error,
+        }
+        with self._lock:
+            self._status[name] = status
+        if error:
+            print(f"❌ {name} health probe failed: {error}")
+        return status
+
+    def probe_all(self):
+        """Run every probe now (deep check)"""
+        return {name: self.probe(name) for name in self._probes}
+
+    async def _loop(self, name):
+        interval = self._probes[name]["interval"]
+        while True:
+            await asyncio.to_thread(self.probe, name)
+            await asyncio.sleep(interval)
+
+    def start(self):
+        """Start one background loop per probe on the running event loop"""
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._loop(name)) for name in self._probes]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def snapshot(self):
+        """
+        Return the cached status per probe (None for probes not yet run),
+        each with rolling latency percentiles.
+        """
+        with self._lock:
+            status = dict(self._status)
+        return {
+            name: ({**status[name], "latency": self._stats[name].snapshot()} if name in status else None)
+            for name in self._probes
+        }
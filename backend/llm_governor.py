@@ -0,0 +1,400 @@
+import asyncio
+import itertools
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Optional
+
+from langchain_openai import ChatOpenAI
+from pydantic import Field
+
+from metrics import RollingStats, record_tokens
+from schema_retriever import count_tokens
+
+# ---------------------------
+# Governor Configuration
+# ---------------------------
+LLM_RPM = float(os.getenv("LLM_RPM", "500"))
+LLM_TPM = float(os.getenv("LLM_TPM", "200000"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_MIN_CONCURRENCY = int(os.getenv("LLM_MIN_CONCURRENCY", "1"))
+LLM_TARGET_LATENCY_MS = float(os.getenv("LLM_TARGET_LATENCY_MS", "8000"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "20"))
+LLM_EXPECTED_COMPLETION_TOKENS = int(os.getenv("LLM_EXPECTED_COMPLETION_TOKENS", "256"))
+
+# ---------------------------
+# Token Estimation
+# ---------------------------
+def estimate_tokens(messages, max_tokens: int = None) -> int:
+    """Prompt tokens (tiktoken) plus per-message overhead plus the expected completion"""
+    prompt = sum(count_tokens(str(m.content)) + 4 for m in messages)
+    return prompt + (max_tokens or LLM_EXPECTED_COMPLETION_TOKENS)
+
+def is_rate_limit_error(error) -> bool:
+    """True for provider 429 responses"""
+    return (
+        type(error).__name__ == "RateLimitError"
+        or getattr(error, "status_code", None) == 429
+        or getattr(getattr(error, "response", None), "status_code", None) == 429
+    )
+
+def _retry_after(error) -> Optional[float]:
+    """Seconds from the error's Retry-After (or OpenAI's retry-after-ms) header, if any"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    for name, scale in (("retry-after-ms", 1000.0), ("retry-after", 1.0)):
+        try:
+            return float(headers.get(name)) / scale
+        except (TypeError, ValueError):
+            continue
+    return None
+
+# ---------------------------
+# LLM Governor
+# ---------------------------
+class LLMGovernor:
+    """
+    Shared admission control for LLM calls.
+
+    - Token buckets enforce requests-per-minute and tokens-per-minute budgets
+      (tokens estimated with tiktoken before the call, reconciled with the
+      reported usage after it).
+    - Callers are admitted strictly in arrival order (FIFO tickets).
+    - The concurrency limit adapts AIMD-style: it halves on a 429 and grows
+      by roughly one per window of fast successes; slow responses shrink it.
+    - Retries happen here instead of inside each client, so a throttled
+      provider sees less traffic rather than more: a 429 pauses admission
+      for every caller, other transient errors back off exponentially with
+      jitter; both honour Retry-After.
+    """
+
+    def __init__(self, rpm: float = LLM_RPM, tpm: float = LLM_TPM,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY, min_concurrency: int = LLM_MIN_CONCURRENCY,
+                 target_latency_ms: float = LLM_TARGET_LATENCY_MS, max_retries: int = LLM_MAX_RETRIES,
+                 retry_base: float = LLM_RETRY_BASE_SECONDS, retry_max: float = LLM_RETRY_MAX_SECONDS):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.target_latency_ms = target_latency_ms
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._request_tokens = rpm
+        self._token_tokens = tpm
+        self._refilled_at = time.monotonic()
+        self._limit = float(max_concurrency)
+        self._in_flight = 0
+        self._queue = deque()
+        self._tickets = itertools.count()
+        self._paused_until = 0.0
+        self._backoff = 1.0
+
+        self.latency = RollingStats()
+        self.calls = 0
+        self.throttled = 0
+        self.retries = 0
+        self.estimated_tokens = 0
+        self.actual_tokens = 0
+
+    # Admission -------------------------------------------------------
+
+    def _refill(self, now):
+        elapsed = now - self._refilled_at
+        self._refilled_at = now
+        self._request_tokens = min(self.rpm, self._request_tokens + elapsed * self.rpm / 60)
+        self._token_tokens = min(self.tpm, self._token_tokens + elapsed * self.tpm / 60)
+
+    def _try_admit(self, ticket, tokens):
+        """Admit `ticket` if it is first in line and budgets allow; else return seconds to wait"""
+        now = time.monotonic()
+        self._refill(now)
+        if self._queue[0] != ticket:
+            return 0.05
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self._in_flight >= int(self._limit):
+            return 0.05
+        tokens = min(tokens, self.tpm)  # an oversized call still runs once the bucket is full
+        if self._request_tokens < 1:
+            return (1 - self._request_tokens) * 60 / self.rpm
+        if self._token_tokens < tokens:
+            return (tokens - self._token_tokens) * 60 / self.tpm
+        self._request_tokens -= 1
+        self._token_tokens -= tokens
+        self._in_flight += 1
+        self._queue.popleft()
+        self._changed.notify_all()
+        return 0
+
+    def acquire(self, tokens):
+        """Block until this call is admitted"""
+        with self._lock:
+            ticket = next(self._tickets)
+            self._queue.append(ticket)
+            try:
+                while True:
+                    wait = self._try_admit(ticket, tokens)
+                    if wait == 0:
+                        return
+                    self._changed.wait(timeout=min(wait, 1.0))
+            except BaseException:
+                self._abandon(ticket)
+                raise
+
+    async def acquire_async(self, tokens):
+        """Async variant of acquire; waits without blocking the event loop"""
+        with self._lock:
+            ticket = next(self._tickets)
+            self._queue.append(ticket)
+        try:
+            while True:
+                with self._lock:
+                    wait = self._try_admit(ticket, tokens)
+                if wait == 0:
+                    return
+                await asyncio.sleep(min(wait, 0.05))
+        except BaseException:
+            with self._lock:
+                self._abandon(ticket)
+            raise
+
+    def _abandon(self, ticket):
+        if ticket in self._queue:
+            self._queue.remove(ticket)
+            self._changed.notify_all()
+
+    # Feedback --------------------------------------------------------
+
+    def release(self, estimated, actual=None, latency_ms=None, error=None):
+        """Record the outcome of an admitted call and adapt the concurrency limit"""
+        with self._lock:
+            self._in_flight -= 1
+            self.calls += 1
+            self.estimated_tokens += estimated
+            if actual is not None:
+                self.actual_tokens += actual
+                self._token_tokens = min(self.tpm, self._token_tokens + estimated - actual)
+
+            if error is not None and is_rate_limit_error(error):
+                self.throttled += 1
+                self._limit = max(self.min_concurrency, self._limit / 2)
+                pause = _retry_after(error) or self._backoff * (1 + random.random())
+                self._paused_until = max(self._paused_until, time.monotonic() + pause)
+                self._backoff = min(self._backoff * 2, 60.0)
+            elif error is None and latency_ms is not None:
+                self._backoff = 1.0
+                if latency_ms > self.target_latency_ms:
+                    self._limit = max(self.min_concurrency, self._limit * 0.9)
+                else:
+                    self._limit = min(self.max_concurrency, self._limit + 1 / self._limit)
+            self._changed.notify_all()
+
+        if latency_ms is not None:
+            self.latency.record(latency_ms, success=error is None)
+
+    def _should_retry(self, error, attempt):
+        if attempt >= self.max_retries:
+            return False
+        if is_rate_limit_error(error):
+            return True
+        return type(error).__name__ in ("APITimeoutError", "APIConnectionError", "InternalServerError")
+
+    def retry_delay(self, error, attempt):
+        """
+        Seconds this caller waits before retrying. A 429 already paused
+        admission in release(); other errors wait for Retry-After, else
+        base * 2^attempt (capped) with the upper half jittered.
+        """
+        if is_rate_limit_error(error):
+            return 0.0
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, self.retry_max)
+        ceiling = min(self.retry_max, self.retry_base * 2 ** attempt)
+        return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+    # Calls -----------------------------------------------------------
+
+    def call(self, fn, estimated, usage=None):
+        """Run fn() under the governor, retrying throttled or transient failures"""
+        for attempt in itertools.count():
+            self.acquire(estimated)
+            started = time.perf_counter()
+            try:
+                result = fn()
+            except Exception as e:
+                self.release(estimated, latency_ms=(time.perf_counter() - started) * 1000, error=e)
+                if not self._should_retry(e, attempt):
+                    raise
+                self.retries += 1
+                time.sleep(self.retry_delay(e, attempt))
+                continue
+            except BaseException:
+                self.release(estimated)
+                raise
+            self.release(estimated, usage(result) if usage else None, (time.perf_counter() - started) * 1000)
+            return result
+
+    async def acall(self, factory, estimated, usage=None):
+        """Async variant of call; factory() returns a new awaitable per attempt"""
+        for attempt in itertools.count():
+            await self.acquire_async(estimated)
+            started = time.perf_counter()
+            try:
+                result = await factory()
+            except Exception as e:
+                self.release(estimated, latency_ms=(time.perf_counter() - started) * 1000, error=e)
+                if not self._should_retry(e, attempt):
+                    raise
+                self.retries += 1
+                await asyncio.sleep(self.retry_delay(e, attempt))
+                continue
+            except BaseException:
+                self.release(estimated)
+                raise
+            self.release(estimated, usage(result) if usage else None, (time.perf_counter() - started) * 1000)
+            return result
+
+    def stats(self):
+        with self._lock:
+            state = {
+                "concurrency_limit": round(self._limit, 2),
+                "in_flight": self._in_flight,
+                "queued": len(self._queue),
+                "paused_for_s": round(max(0.0, self._paused_until - time.monotonic()), 2),
+                "rpm_budget": self.rpm,
+                "tpm_budget": self.tpm,
+            }
+        return {
+            **state,
+            "calls": self.calls,
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "estimated_tokens": self.estimated_tokens,
+            "actual_tokens": self.actual_tokens,
+            "latency": self.latency.snapshot(),
+        }
+
+_shared_governor = None
+_shared_lock = threading.Lock()
+
+def shared_governor():
+    """The process-wide governor used by every chain (configured from LLM_* env vars)"""
+    global _shared_governor
+    with _shared_lock:
+        if _shared_governor is None:
+            _shared_governor = LLMGovernor()
+        return _shared_governor
+
+# ---------------------------
+# Governed Chat Model
+# ---------------------------
+def _usage(result):
+    usage = (result.llm_output or {}).get("token_usage") or {}
+    return usage.get("total_tokens")
+
+def _record_usage(result, estimated, expected_completion):
+    """Report prompt/completion tokens to the request trace (estimates when usage is missing)"""
+    usage = (result.llm_output or {}).get("token_usage") or {}
+    record_tokens(
+        usage.get("prompt_tokens") or estimated - expected_completion,
+        usage.get("completion_tokens") or 0,
+    )
+
+class GovernedChatOpenAI(ChatOpenAI):
+    """ChatOpenAI whose calls are admitted, rate-limited and retried by an LLMGovernor"""
+
+    governor: Any = Field(default=None, exclude=True)
+    max_retries: int = 0  # the governor retries; the client must not multiply traffic
+
+    def _governor(self):
+        return self.governor or shared_governor()
+
+    def _estimate(self, messages):
+        return estimate_tokens(messages, getattr(self, "max_tokens", None))
+
+    def _expected_completion(self):
+        return getattr(self, "max_tokens", None) or LLM_EXPECTED_COMPLETION_TOKENS
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        parent = super(GovernedChatOpenAI, self)._generate
+        estimated = self._estimate(messages)
+        result = self._governor().call(
+            lambda: parent(messages, stop=stop, run_manager=run_manager, **kwargs),
+            estimated,
+            usage=_usage,
+        )
+        _record_usage(result, estimated, self._expected_completion())
+        return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        parent = super(GovernedChatOpenAI, self)._agenerate
+        estimated = self._estimate(messages)
+        result = await self._governor().acall(
+            lambda: parent(messages, stop=stop, run_manager=run_manager, **kwargs),
+            estimated,
+            usage=_usage,
+        )
+        _record_usage(result, estimated, self._expected_completion())
+        return result
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        governor = self._governor()
+        estimated = self._estimate(messages)
+        for attempt in itertools.count():
+            governor.acquire(estimated)
+            started = time.perf_counter()
+            streamed = False
+            chunks = 0
+            try:
+                for chunk in super()._stream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                    streamed = True
+                    chunks += 1  # roughly one token per streamed chunk
+                    yield chunk
+            except Exception as e:
+                governor.release(estimated, latency_ms=(time.perf_counter() - started) * 1000, error=e)
+                if streamed or not governor._should_retry(e, attempt):
+                    raise
+                governor.retries += 1
+                time.sleep(governor.retry_delay(e, attempt))
+                continue
+            except BaseException:
+                governor.release(estimated)
+                raise
+            governor.release(estimated, latency_ms=(time.perf_counter() - started) * 1000)
+            record_tokens(estimated - self._expected_completion(), chunks)
+            return
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        governor = self._governor()
+        estimated = self._estimate(messages)
+        for attempt in itertools.count():
+            await governor.acquire_async(estimated)
+            started = time.perf_counter()
+            streamed = False
+            chunks = 0
+            try:
+                async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                    streamed = True
+                    chunks += 1  # roughly one token per streamed chunk
+                    yield chunk
+            except Exception as e:
+                governor.release(estimated, latency_ms=(time.perf_counter() - started) * 1000, error=e)
+                if streamed or not governor._should_retry(e, attempt):
+                    raise
+                governor.retries += 1
+                await asyncio.sleep(governor.retry_delay(e, attempt))
+                continue
+            except BaseException:
+                governor.release(estimated)
+                raise
+            governor.release(estimated, latency_ms=(time.perf_counter() - started) * 1000)
+            record_tokens(estimated - self._expected_completion(), chunks)
+            return
@@ -45,24 +45,60 @@ import sys, os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, ORJSONResponse, PlainTextResponse
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional, Literal
+from contextlib import asynccontextmanager
+import asyncio
 import logging
+import orjson
 
 # Import your modules
-from ai_agent import ask_question, health_check
+from ai_agent import ask_question_async, stream_question, health_check, cache_stats, pipeline_stats, schema_stats, template_stats, fast_path_stats, coalescing_stats, stats_service, health_prober, ask_batch, BATCH_MAX_CONCURRENCY, warm_up, warm_up_state, ensure_ready_async, llm_stats, has_result, fetch_page_async, RESULT_PAGE_SIZE, RESULT_MAX_PAGE_SIZE, session_store, session_stats, prometheus_metrics, db_pool_stats, result_cache_stats, cost_guard_stats, read_routing_stats, sql_log_stats
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# =====================================
+# Lifespan (startup/shutdown)
+# =====================================
+WARM_UP_RETRY_SECONDS = float(os.getenv("WARM_UP_RETRY_SECONDS", "10"))
+DISCONNECT_POLL_SECONDS = float(os.getenv("DISCONNECT_POLL_SECONDS", "1"))
+
+async def _warm_up_in_background():
+    """Warm up the agent off the event loop, then start the background services"""
+    while True:
+        try:
+            await asyncio.to_thread(warm_up)
+            break
+        except Exception as e:
+            logger.error(f"Warm-up failed, retrying in {WARM_UP_RETRY_SECONDS}s: {e}")
+            await asyncio.sleep(WARM_UP_RETRY_SECONDS)
+    stats_service.start()
+    health_prober.start()
+    logger.info(f"✅ API is ready to receive requests (warm-up steps: {warm_up_state['steps_ms']})")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Bind immediately; connections, schema and LLM clients warm up in the background"""
+    logger.info("🚀 Starting Jetking Chatbot API...")
+    warm_up_task = asyncio.create_task(_warm_up_in_background())
+    yield
+    logger.info("🛑 Shutting down Jetking Chatbot API...")
+    warm_up_task.cancel()
+    await stats_service.stop()
+    await health_prober.stop()
+
 # Initialize FastAPI
 app = FastAPI(
     title="Jetking Training Institute Chatbot API",
     description="AI-powered chatbot for querying training institute data",
-    version="2.0.0"
+    version="2.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # CORS Middleware
@@ -81,12 +117,32 @@ app.add_middleware(
 class QuestionRequest(BaseModel):
     question: str = Field(..., min_length=3, max_length=500, description="Natural language question")
     context: Optional[str] = Field(None, max_length=1000, description="Additional context for the question")
+    mode: Optional[Literal["two_step", "fused"]] = Field(None, description="SQL generation pipeline (defaults to PIPELINE_MODE)")
+    answer_mode: Optional[Literal["llm", "template", "none"]] = Field(None, description="How the answer is rendered (defaults to ANSWER_MODE)")
+    session_id: Optional[str] = Field(None, max_length=100, description="Conversation session; follow-ups refine the previous SQL")
+    fresh: bool = Field(False, description="Read from the primary database instead of a (possibly lagging) replica")
 
     class Config:
         json_schema_extra = {
             "example": {
                 "question": "How many branches are there in Mumbai?",
-                "context": "Focus on active branches only"
+                "context": "Focus on active branches only",
+                "mode": "fused"
+            }
+        }
+
+class BatchRequest(BaseModel):
+    questions: List[str] = Field(..., min_length=1, max_length=500, description="Natural language questions")
+    context: Optional[str] = Field(None, max_length=1000, description="Context applied to every question")
+    mode: Optional[Literal["two_step", "fused"]] = Field(None, description="SQL generation pipeline (defaults to PIPELINE_MODE)")
+    answer_mode: Optional[Literal["llm", "template", "none"]] = Field(None, description="How answers are rendered (defaults to ANSWER_MODE)")
+    concurrency: Optional[int] = Field(None, ge=1, le=BATCH_MAX_CONCURRENCY, description="Questions answered in parallel (defaults to BATCH_CONCURRENCY)")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "questions": ["How many branches are there?", "Total calls made this year"],
+                "concurrency": 4
             }
         }
 
@@ -97,6 +153,19 @@ class QuestionResponse(BaseModel):
     error: Optional[str] = None
     source: str
     sql_used: Optional[str] = None
+    data: Optional[dict] = Field(None, description="Structured result: columns, typed rows, row_count, truncated")
+    result_id: Optional[str] = Field(None, description="Id for paging through the full result at /results/{result_id}")
+    session_id: Optional[str] = None
+    follow_up: bool = False
+    timings: Optional[dict] = Field(None, description="Per-stage latency (ms) and LLM token counts for this request")
+    cached: bool = False
+    coalesced: bool = False
+    pipeline_mode: Optional[str] = None
+    fallback: Optional[bool] = None
+    template_hit: bool = False
+    query_plan: Optional[dict] = Field(None, description="EXPLAIN summary: rows examined, join types, cost guard action")
+    answer_mode: Optional[str] = None
+    latency_ms: Optional[float] = None
 
 class HealthResponse(BaseModel):
     status: str
@@ -104,6 +173,8 @@ class HealthResponse(BaseModel):
     openai: bool
     agent: bool
     message: str
+    checks: Optional[dict] = Field(None, description="Per-dependency status, last check time and latency percentiles")
+    warm_up: Optional[dict] = Field(None, description="Warm-up status and time spent in each step")
 
 # =====================================
 # API Endpoints
@@ -119,32 +190,69 @@ def root():
             "health": "/health",
             "ask_question": "/ask/ (POST)",
             "quick_query": "/quick/ (GET)",
+            "ask_stream": "/ask/stream (GET/POST, Server-Sent Events)",
+            "ask_batch": "/ask/batch (POST, NDJSON)",
+            "result_pages": "/results/{result_id}?offset=0&page_size=50",
+            "cache_stats": "/cache/stats",
+            "pipeline_stats": "/stats/pipeline",
+            "schema_stats": "/stats/schema",
+            "template_stats": "/stats/templates",
+            "fast_path_stats": "/stats/fast-path",
+            "llm_stats": "/stats/llm",
+            "pool_stats": "/stats/pool",
+            "replica_stats": "/stats/replicas",
+            "cost_guard_stats": "/stats/cost-guard",
+            "metrics": "/metrics (Prometheus)",
             "docs": "/docs"
         }
     }
 
 @app.get("/health", response_model=HealthResponse, tags=["Health"])
-def health():
+async def health(deep: bool = Query(False, description="Probe dependencies live instead of returning the cached status")):
     """
     Check API and service health
     """
     try:
-        health_status = health_check()
-        all_healthy = all(health_status.values())
+        health_status = await asyncio.to_thread(health_check, deep)
+        all_healthy = health_status["agent"]
+        
+        if health_status["warming"]:
+            status, message = "warming", "Warming up: connecting to MySQL and the LLM"
+        elif all_healthy:
+            status, message = "healthy", "All systems operational"
+        else:
+            status, message = "degraded", "Some services are down"
         
         return {
-            "status": "healthy" if all_healthy else "degraded",
+            "status": status,
             "database": health_status["database"],
             "openai": health_status["openai"],
             "agent": health_status["agent"],
-            "message": "All systems operational" if all_healthy else "Some services are down"
+            "message": message,
+            "checks": health_status["checks"],
+            "warm_up": warm_up_state
         }
     except Exception as e:
         logger.error(f"Health check error: {e}")
         raise HTTPException(status_code=500, detail="Health check failed")
 
+async def _unless_disconnected(request: Request, awaitable):
+    """
+    Await a pipeline run, cancelling it (and its running MySQL query) if the
+    client disconnects first. Streaming routes get this from Starlette.
+    """
+    task = asyncio.ensure_future(awaitable)
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+        if done:
+            return task.result()
+        if await request.is_disconnected():
+            task.cancel()
+            logger.info("Client disconnected, cancelled its question")
+            raise HTTPException(status_code=499, detail="Client closed request")
+
 @app.post("/ask/", response_model=QuestionResponse, tags=["Query"])
-async def ask_route(payload: QuestionRequest):
+async def ask_route(payload: QuestionRequest, request: Request):
     """
     Ask a question using natural language
     
@@ -155,7 +263,10 @@ async def ask_route(payload: QuestionRequest):
         logger.info(f"Received question: {payload.question}")
         
         # Process the question
-        result = ask_question(payload.question, payload.context)
+        result = await _unless_disconnected(
+            request,
+            ask_question_async(payload.question, payload.context, payload.mode, payload.answer_mode, payload.session_id, payload.fresh)
+        )
         
         if not result:
             raise HTTPException(status_code=500, detail="Failed to process question")
@@ -166,16 +277,120 @@ async def ask_route(payload: QuestionRequest):
             answer=result.get("answer"),
             error=result.get("error"),
             source=result.get("source", "unknown"),
-            sql_used=result.get("sql_used")
+            sql_used=result.get("sql_used"),
+            data=result.get("data"),
+            result_id=result.get("result_id"),
+            session_id=result.get("session_id"),
+            follow_up=result.get("follow_up", False),
+            timings=result.get("timings"),
+            cached=result.get("cached", False),
+            coalesced=result.get("coalesced", False),
+            pipeline_mode=result.get("pipeline_mode"),
+            fallback=result.get("fallback"),
+            template_hit=result.get("template_hit", False),
+            query_plan=result.get("query_plan"),
+            answer_mode=result.get("answer_mode"),
+            latency_ms=result.get("latency_ms")
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in ask_route: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _sse_events(question: str, context: Optional[str], mode: Optional[str], answer_mode: Optional[str], session_id: Optional[str], fresh: bool):
+    """Format pipeline events as Server-Sent Events"""
+    async for event, data in stream_question(question, context, mode, answer_mode, session_id, fresh):
+        yield f"event: {event}\ndata: {orjson.dumps(data, default=str).decode()}\n\n"
+
+def _sse_response(question: str, context: Optional[str], mode: Optional[str], answer_mode: Optional[str] = None, session_id: Optional[str] = None, fresh: bool = False):
+    return StreamingResponse(
+        _sse_events(question, context, mode, answer_mode, session_id, fresh),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/ask/stream", tags=["Query"])
+async def ask_stream(payload: QuestionRequest):
+    """
+    Ask a question and receive pipeline events as Server-Sent Events
+    
+    Events: normalized, sql, rows, token (answer chunks), done / error
+    """
+    logger.info(f"Streaming question: {payload.question}")
+    return _sse_response(payload.question, payload.context, payload.mode, payload.answer_mode, payload.session_id, payload.fresh)
+
+@app.get("/ask/stream", tags=["Query"])
+async def ask_stream_get(
+    q: str = Query(..., min_length=3, max_length=500, description="Your question"),
+    context: Optional[str] = Query(None, max_length=1000, description="Additional context"),
+    mode: Optional[Literal["two_step", "fused"]] = Query(None, description="SQL generation pipeline"),
+    answer_mode: Optional[Literal["llm", "template", "none"]] = Query(None, description="How the answer is rendered"),
+    session_id: Optional[str] = Query(None, max_length=100, description="Conversation session"),
+    fresh: bool = Query(False, description="Read from the primary instead of a replica")
+):
+    """
+    EventSource-friendly variant of POST /ask/stream
+    
+    Example: /ask/stream?q=How many branches are there?
+    """
+    logger.info(f"Streaming question: {q}")
+    return _sse_response(q, context, mode, answer_mode, session_id, fresh)
+
+async def _batch_lines(payload: BatchRequest):
+    """Format batch results as NDJSON, one line per question, in completion order"""
+    async for indexes, response in ask_batch(
+        payload.questions, payload.context, payload.mode, payload.answer_mode, payload.concurrency
+    ):
+        for index in indexes:
+            line = {**response, "index": index, "question": payload.questions[index]}
+            yield orjson.dumps(line, default=str) + b"\n"
+
+@app.post("/ask/batch", tags=["Query"])
+async def ask_batch_route(payload: BatchRequest):
+    """
+    Ask many questions at once; answers stream back as NDJSON as each finishes
+    
+    Identical questions are answered once. Each line carries the question's
+    `index` in the request list.
+    """
+    logger.info(f"Batch of {len(payload.questions)} questions")
+    return StreamingResponse(_batch_lines(payload), media_type="application/x-ndjson")
+
+@app.get("/results/{result_id}", tags=["Query"])
+async def get_result_page(
+    result_id: str,
+    offset: int = Query(0, ge=0, description="Rows to skip"),
+    page_size: int = Query(RESULT_PAGE_SIZE, ge=1, le=RESULT_MAX_PAGE_SIZE, description="Rows per page")
+):
+    """
+    Page through the full result of an earlier answer
+    
+    Re-runs the answer's stored SQL for the requested page; no LLM call.
+    Follow `next_offset` until `has_more` is false.
+    """
+    if not has_result(result_id):
+        raise HTTPException(status_code=404, detail="Result not found or expired; ask the question again")
+    try:
+        await ensure_ready_async()
+        page = await fetch_page_async(result_id, offset, page_size)
+    except Exception as e:
+        logger.error(f"Error in get_result_page: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if page is None:
+        raise HTTPException(status_code=404, detail="Result not found or expired; ask the question again")
+    return {"success": True, **page}
+
 @app.get("/quick/", tags=["Query"])
 async def quick_query(
-    q: str = Query(..., min_length=3, max_length=500, description="Your question")
+    request: Request,
+    q: str = Query(..., min_length=3, max_length=500, description="Your question"),
+    mode: Optional[Literal["two_step", "fused"]] = Query(None, description="SQL generation pipeline"),
+    answer_mode: Optional[Literal["llm", "template", "none"]] = Query(None, description="How the answer is rendered"),
+    session_id: Optional[str] = Query(None, max_length=100, description="Conversation session"),
+    fresh: bool = Query(False, description="Read from the primary instead of a replica")
 ):
     """
     Quick query endpoint using GET method
@@ -184,13 +399,17 @@ async def quick_query(
     """
     try:
         logger.info(f"Quick query: {q}")
-        result = ask_question(q)
+        result = await _unless_disconnected(
+            request, ask_question_async(q, mode=mode, answer_mode=answer_mode, session_id=session_id, fresh=fresh)
+        )
         
         if not result:
             raise HTTPException(status_code=500, detail="Failed to process question")
         
         return result
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in quick_query: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -202,30 +421,140 @@ async def quick_query(
 @app.get("/stats/summary", tags=["Statistics"])
 async def get_summary_stats():
     """
-    Get summary statistics about the database
+    Get summary statistics about the database from the latest background snapshot
+    
+    `statistics` keeps its {question: answer} form; typed values and the
+    snapshot's age are under `snapshot`.
     """
     try:
-        questions = [
-            "How many branches are there?",
-            "How many active campaigns?",
-            "Total number of calls?",
-            "Total cities in database?"
-        ]
-        
-        results = {}
-        for q in questions:
-            result = ask_question(q)
-            if result.get("success"):
-                results[q] = result.get("answer")
-        
+        snapshot = stats_service.snapshot()
+        if snapshot is None:
+            await ensure_ready_async()
+            await stats_service.refresh()
+            snapshot = stats_service.snapshot()
+
         return {
             "success": True,
-            "statistics": results
+            "statistics": stats_service.answers(snapshot),
+            "snapshot": {
+                "metrics": snapshot["metrics"],
+                "refreshed_at": snapshot["refreshed_at"],
+                "age_seconds": snapshot["age_seconds"],
+            },
         }
     except Exception as e:
         logger.error(f"Error in get_summary_stats: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/cache/stats", tags=["Statistics"])
+def get_cache_stats():
+    """
+    Get hit/miss counters of the answer and query result caches and request coalescing
+    """
+    return {
+        "success": True,
+        "answer_cache": cache_stats(),
+        "result_cache": result_cache_stats(),
+        "coalescing": coalescing_stats(),
+        "sessions": session_stats()
+    }
+
+@app.delete("/sessions/{session_id}", tags=["Query"])
+def clear_session(session_id: str):
+    """
+    Forget a conversation session so the next question starts fresh
+    """
+    session_store.clear(session_id)
+    return {"success": True, "session_id": session_id}
+
+@app.get("/stats/pipeline", tags=["Statistics"])
+def get_pipeline_stats():
+    """
+    Compare p50/p95 latency and success rate of the SQL generation modes
+    """
+    return {
+        "success": True,
+        "modes": pipeline_stats(),
+        "sql_log": sql_log_stats()
+    }
+
+@app.get("/stats/schema", tags=["Statistics"])
+def get_schema_stats():
+    """
+    Get prompt token savings from relevance-based schema pruning
+    """
+    return {
+        "success": True,
+        "schema_pruning": schema_stats()
+    }
+
+@app.get("/stats/templates", tags=["Statistics"])
+def get_template_stats():
+    """
+    Get SQL template cache hit rates and the LLM time they avoided
+    """
+    return {
+        "success": True,
+        "sql_templates": template_stats()
+    }
+
+@app.get("/metrics", tags=["Statistics"], response_class=PlainTextResponse)
+def metrics():
+    """
+    Prometheus metrics: per-stage latency p50/p95/p99, LLM tokens, errors by source, cache hit ratios, DB pool gauges
+    """
+    return PlainTextResponse(prometheus_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/stats/cost-guard", tags=["Statistics"])
+def get_cost_guard_stats():
+    """
+    Get how many generated queries the EXPLAIN cost guard passed, rewrote and rejected
+    """
+    return {
+        "success": True,
+        "cost_guard": cost_guard_stats()
+    }
+
+@app.get("/stats/pool", tags=["Statistics"])
+def get_pool_stats():
+    """
+    Get shared MySQL pool state: checkout wait percentiles, timeouts and utilization
+    """
+    return {
+        "success": True,
+        "pool": db_pool_stats()
+    }
+
+@app.get("/stats/replicas", tags=["Statistics"])
+def get_replica_stats():
+    """
+    Get read replica health, lag and load, and how many reads went to the primary
+    """
+    return {
+        "success": True,
+        "replicas": read_routing_stats()
+    }
+
+@app.get("/stats/llm", tags=["Statistics"])
+def get_llm_stats():
+    """
+    Get LLM governor state: rate budgets, adaptive concurrency limit, queue and 429 counts
+    """
+    return {
+        "success": True,
+        "llm": llm_stats()
+    }
+
+@app.get("/stats/fast-path", tags=["Statistics"])
+def get_fast_path_stats():
+    """
+    Get how many questions were answered by the deterministic fast path
+    """
+    return {
+        "success": True,
+        "fast_path": fast_path_stats()
+    }
+
 # =====================================
 # Error Handlers
 # =====================================
@@ -233,36 +562,21 @@ async def get_summary_stats():
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
     """Custom HTTP exception handler"""
-    return {
+    return ORJSONResponse(status_code=exc.status_code, content={
         "success": False,
         "error": exc.detail,
         "status_code": exc.status_code
-    }
+    })
 
 @app.exception_handler(Exception)
 async def general_exception_handler(request, exc):
     """General exception handler"""
     logger.error(f"Unhandled exception: {exc}")
-    return {
+    return ORJSONResponse(status_code=500, content={
         "success": False,
         "error": "An unexpected error occurred",
         "status_code": 500
-    }
-
-# =====================================
-# Startup/Shutdown Events
-# =====================================
-
-@app.on_event("startup")
-async def startup_event():
-    """Actions to perform on startup"""
-    logger.info("🚀 Starting Jetking Chatbot API...")
-    logger.info("✅ API is ready to receive requests")
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Actions to perform on shutdown"""
-    logger.info("🛑 Shutting down Jetking Chatbot API...")
+    })
 
 # =====================================
 # Run the application
@@ -0,0 +1,232 @@
+import contextvars
+import math
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+# ---------------------------
+# Rolling Latency Statistics
+# ---------------------------
+def percentile(values, pct):
+    """Nearest-rank percentile of an iterable of numbers"""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+class RollingStats:
+    """Keeps the last `window` latencies plus success/failure counters"""
+
+    def __init__(self, window: int = 1000):
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.successes = 0
+        self.failures = 0
+
+    def record(self, latency_ms: float, success: bool = True):
+        with self._lock:
+            self._latencies.append(latency_ms)
+            if success:
+                self.successes += 1
+            else:
+                self.failures += 1
+
+    def snapshot(self):
+        with self._lock:
+            latencies = list(self._latencies)
+            successes, failures = self.successes, self.failures
+        total = successes + failures
+        return {
+            "count": total,
+            "success_rate": round(successes / total, 4) if total else None,
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+        }
+
+# ---------------------------
+# Per-Stage Request Tracing
+# ---------------------------
+class StageMetrics:
+    """Process-wide per-stage latencies, LLM token counts and error counts by source"""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._stages = {}
+        self._sums = Counter()
+        self._lock = threading.Lock()
+        self.tokens = Counter()
+        self.responses = Counter()
+
+    def record_stage(self, stage: str, latency_ms: float, success: bool = True):
+        with self._lock:
+            stats = self._stages.get(stage)
+            if stats is None:
+                stats = self._stages[stage] = RollingStats(window=self.window)
+            self._sums[stage] += latency_ms
+        stats.record(latency_ms, success)
+
+    def record_tokens(self, stage: str, prompt: int, completion: int):
+        with self._lock:
+            self.tokens[(stage, "prompt")] += prompt
+            self.tokens[(stage, "completion")] += completion
+
+    def record_response(self, source: str, success: bool):
+        with self._lock:
+            self.responses[(source, success)] += 1
+
+    def snapshot(self):
+        with self._lock:
+            stages = dict(self._stages)
+            sums = dict(self._sums)
+            tokens = dict(self.tokens)
+            responses = dict(self.responses)
+        return {
+            "stages": {name: {**stats.snapshot(), "sum_ms": round(sums[name], 1)} for name, stats in stages.items()},
+            "tokens": tokens,
+            "responses": responses,
+        }
+
+stage_metrics = StageMetrics()
+
+class RequestTrace:
+    """Stage timings and LLM token counts for one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.tokens = {}
+
+    def add(self, stage: str, latency_ms: float):
+        self.stages[stage] = round(self.stages.get(stage, 0.0) + latency_ms, 1)
+
+    def add_tokens(self, stage: str, prompt: int, completion: int):
+        counts = self.tokens.setdefault(stage, {"prompt": 0, "completion": 0})
+        counts["prompt"] += prompt
+        counts["completion"] += completion
+
+    def summary(self):
+        return {
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "stages_ms": dict(self.stages),
+            "tokens": {stage: dict(counts) for stage, counts in self.tokens.items()},
+        }
+
+_current_trace = contextvars.ContextVar("request_trace", default=None)
+_current_stage = contextvars.ContextVar("request_stage", default=None)
+
+def start_trace():
+    """Begin tracing the current request (context-local, so safe across threads and tasks)"""
+    trace = RequestTrace()
+    _current_trace.set(trace)
+    return trace
+
+@contextmanager
+def stage(name: str):
+    """Time a pipeline stage with a monotonic clock, for the request trace and the stage metrics"""
+    token = _current_stage.set(name)
+    started = time.perf_counter()
+    success = False
+    try:
+        yield
+        success = True
+    finally:
+        latency_ms = (time.perf_counter() - started) * 1000
+        try:
+            _current_stage.reset(token)
+        except ValueError:
+            pass  # an async generator finalized from another context
+        stage_metrics.record_stage(name, latency_ms, success)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(name, latency_ms)
+
+def record_tokens(prompt: int, completion: int):
+    """Attribute LLM token usage to the current stage"""
+    name = _current_stage.get() or "unattributed"
+    stage_metrics.record_tokens(name, prompt, completion)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_tokens(name, prompt, completion)
+
+# ---------------------------
+# Prometheus Exposition
+# ---------------------------
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in labels.items()) + "}"
+
+def render_prometheus(prefix: str = "nlsql", hit_ratios: dict = None, pools: dict = None):
+    """
+    Render stage latency summaries (p50/p95/p99), token counters, response
+    counts by source, cache hit ratios and connection pool gauges in
+    Prometheus text format. `pools` maps a server ("primary" or a replica
+    name) to its pool snapshots by pool name ("sync", "async").
+    """
+    snapshot = stage_metrics.snapshot()
+    lines = [
+        f"# HELP {prefix}_stage_latency_ms Pipeline stage latency over the rolling window",
+        f"# TYPE {prefix}_stage_latency_ms summary",
+    ]
+    for name, stats in sorted(snapshot["stages"].items()):
+        for quantile, key in (("0.5", "p50_ms"), ("0.95", "p95_ms"), ("0.99", "p99_ms")):
+            if stats[key] is not None:
+                lines.append(f"{prefix}_stage_latency_ms{_labels(stage=name, quantile=quantile)} {stats[key]:.3f}")
+        lines.append(f"{prefix}_stage_latency_ms_sum{_labels(stage=name)} {stats['sum_ms']}")
+        lines.append(f"{prefix}_stage_latency_ms_count{_labels(stage=name)} {stats['count']}")
+
+    lines += [
+        f"# HELP {prefix}_llm_tokens_total LLM tokens by pipeline stage",
+        f"# TYPE {prefix}_llm_tokens_total counter",
+    ]
+    for (name, kind), count in sorted(snapshot["tokens"].items()):
+        lines.append(f"{prefix}_llm_tokens_total{_labels(stage=name, kind=kind)} {count}")
+
+    lines += [
+        f"# HELP {prefix}_responses_total Responses by source",
+        f"# TYPE {prefix}_responses_total counter",
+    ]
+    for (source, success), count in sorted(snapshot["responses"].items()):
+        lines.append(f"{prefix}_responses_total{_labels(source=source, success=str(success).lower())} {count}")
+
+    lines += [
+        f"# HELP {prefix}_errors_total Error responses by source",
+        f"# TYPE {prefix}_errors_total counter",
+    ]
+    for (source, success), count in sorted(snapshot["responses"].items()):
+        if not success:
+            lines.append(f"{prefix}_errors_total{_labels(source=source)} {count}")
+
+    lines += [
+        f"# HELP {prefix}_cache_hit_ratio Hit ratio per cache",
+        f"# TYPE {prefix}_cache_hit_ratio gauge",
+    ]
+    for name, ratio in sorted((hit_ratios or {}).items()):
+        lines.append(f"{prefix}_cache_hit_ratio{_labels(cache=name)} {ratio}")
+
+    if pools:
+        series = [(server, name, pool) for server, named in sorted(pools.items()) for name, pool in sorted(named.items())]
+        lines += [
+            f"# HELP {prefix}_db_pool_utilization Checked-out connections over pool capacity",
+            f"# TYPE {prefix}_db_pool_utilization gauge",
+        ]
+        for server, name, pool in series:
+            lines.append(f"{prefix}_db_pool_utilization{_labels(server=server, pool=name)} {pool['utilization']}")
+        lines += [
+            f"# HELP {prefix}_db_pool_checkout_wait_ms Time spent waiting for a pooled connection",
+            f"# TYPE {prefix}_db_pool_checkout_wait_ms summary",
+        ]
+        for server, name, pool in series:
+            wait = pool["checkout_wait"]
+            for quantile, key in (("0.5", "p50_ms"), ("0.95", "p95_ms"), ("0.99", "p99_ms")):
+                if wait[key] is not None:
+                    lines.append(f"{prefix}_db_pool_checkout_wait_ms{_labels(server=server, pool=name, quantile=quantile)} {wait[key]:.3f}")
+            lines.append(f"{prefix}_db_pool_checkout_wait_ms_count{_labels(server=server, pool=name)} {wait['count']}")
+        lines += [
+            f"# HELP {prefix}_db_pool_checkout_timeouts_total Checkouts that gave up after MYSQL_POOL_TIMEOUT",
+            f"# TYPE {prefix}_db_pool_checkout_timeouts_total counter",
+        ]
+        for server, name, pool in series:
+            lines.append(f"{prefix}_db_pool_checkout_timeouts_total{_labels(server=server, pool=name)} {pool['checkout_timeouts']}")
+    return "\n".join(lines) + "\n"
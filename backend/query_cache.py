@@ -0,0 +1,193 @@
+import re
+import threading
+import time
+
+from sqlalchemy import bindparam, text
+
+from cache import TTLCache
+
+# ---------------------------
+# SQL Fingerprints
+# ---------------------------
+_STRING = re.compile(r"('(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`)")
+_KEYWORD = re.compile(
+    r"\b(?:select|distinct|from|where|and|or|not|in|is|null|like|between|join|inner|left|right|"
+    r"outer|cross|on|using|group|order|by|having|limit|offset|as|asc|desc|case|when|then|else|"
+    r"end|union|all|exists|count|sum|avg|min|max)\b",
+    re.IGNORECASE,
+)
+# Results of these change between calls (time, randomness, session state), so
+# queries using them are never served from the cache. The CURRENT_*/LOCAL*/UTC_*
+# forms are also valid without parentheses.
+_NONDETERMINISTIC = re.compile(
+    r"\b(?:(?:NOW|CURDATE|CURTIME|SYSDATE|RAND|UUID|UUID_SHORT|SLEEP|CONNECTION_ID|LAST_INSERT_ID|"
+    r"FOUND_ROWS|ROW_COUNT|USER|CURRENT_USER|SESSION_USER|SYSTEM_USER)\s*\("
+    r"|UNIX_TIMESTAMP\s*\(\s*\)"
+    r"|(?:CURRENT_DATE|CURRENT_TIME|CURRENT_TIMESTAMP|LOCALTIME|LOCALTIMESTAMP|UTC_DATE|UTC_TIME|UTC_TIMESTAMP)\b)",
+    re.IGNORECASE,
+)
+
+def sql_fingerprint(sql: str) -> str:
+    """
+    Canonical form of a query: whitespace collapsed, keywords upper-cased
+    and the trailing semicolon dropped outside of quoted literals and
+    identifiers (whose case matters to MySQL).
+    """
+    parts = _STRING.split(sql.strip().rstrip(";").strip())
+    for i in range(0, len(parts), 2):
+        parts[i] = _KEYWORD.sub(lambda m: m.group(0).upper(), re.sub(r"\s+", " ", parts[i]))
+    return "".join(parts)
+
+def is_cacheable(sql: str) -> bool:
+    return not _NONDETERMINISTIC.search(sql)
+
+# ---------------------------
+# Table Data Versions
+# ---------------------------
+# UPDATE_TIME moves on every committed write, TABLE_ROWS/AUTO_INCREMENT on inserts
+# and deletes; the tuple is cheap to read compared with MAX(updated_at)/COUNT(*)
+_VERSION_SQL = text(
+    "SELECT TABLE_NAME, UPDATE_TIME, TABLE_ROWS, AUTO_INCREMENT "
+    "FROM information_schema.TABLES "
+    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN :tables"
+).bindparams(bindparam("tables", expanding=True))
+# MySQL 8 caches information_schema table statistics for a day by default. The
+# setting is restored after the probe; left in place it would stay on the pooled
+# connection for every later user.
+_FRESH_STATISTICS_SQL = text("SET SESSION information_schema_stats_expiry = 0")
+_DEFAULT_STATISTICS_SQL = text("SET SESSION information_schema_stats_expiry = DEFAULT")
+
+def _versions_from_rows(rows):
+    return {row[0]: (str(row[1]), row[2], row[3]) for row in rows}
+
+def probe_versions(conn, tables):
+    """Read the data version of each table on a sync connection"""
+    try:
+        conn.execute(_FRESH_STATISTICS_SQL)
+        fresh = True
+    except Exception:
+        fresh = False  # MySQL 5.7 has no statistics cache
+    try:
+        return _versions_from_rows(conn.execute(_VERSION_SQL, {"tables": list(tables)}).fetchall())
+    finally:
+        if fresh:
+            conn.execute(_DEFAULT_STATISTICS_SQL)
+
+async def probe_versions_async(conn, tables):
+    """Async variant of probe_versions"""
+    try:
+        await conn.execute(_FRESH_STATISTICS_SQL)
+        fresh = True
+    except Exception:
+        fresh = False
+    try:
+        result = await conn.execute(_VERSION_SQL, {"tables": list(tables)})
+        return _versions_from_rows(result.fetchall())
+    finally:
+        if fresh:
+            await conn.execute(_DEFAULT_STATISTICS_SQL)
+
+# ---------------------------
+# Query Result Cache
+# ---------------------------
+class QueryResultCache:
+    """
+    Caches query results by SQL fingerprint for `ttl` seconds.
+
+    Each entry remembers the data versions of the tables it read; once a
+    newer version is probed (at most every `version_interval` seconds per
+    table) the entry is dropped instead of served. Views have no version
+    of their own and rely on the TTL.
+
+    Entries and versions are kept per `source` (the server that was read):
+    rows read from a lagging replica are never served to a read routed to
+    the primary, and are only checked against versions probed on that
+    replica.
+    """
+
+    def __init__(self, max_size: int = 500, ttl: float = 300, version_interval: float = 5):
+        self._entries = TTLCache(max_size=max_size, ttl=ttl)
+        self._versions = {}  # (source, table) -> (probed_at, version)
+        self._lock = threading.Lock()
+        self.version_interval = version_interval
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.uncacheable = 0
+        self.probes = 0
+        self.probe_ms = 0.0
+        self.db_ms_saved = 0.0
+
+    def due_for_probe(self, tables, source: str = "primary"):
+        """Tables whose data version on `source` is unknown or older than version_interval"""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                table for table in tables
+                if (source, table) not in self._versions
+                or now - self._versions[(source, table)][0] >= self.version_interval
+            ]
+
+    def update_versions(self, tables, versions: dict, elapsed_ms: float, source: str = "primary"):
+        """Record versions probed on `source` (tables missing from `versions` get None)"""
+        now = time.monotonic()
+        with self._lock:
+            for table in tables:
+                self._versions[(source, table)] = (now, versions.get(table))
+            self.probes += 1
+            self.probe_ms += elapsed_ms
+
+    def _current_versions(self, tables, source):
+        with self._lock:
+            return tuple(self._versions.get((source, table), (None, None))[1] for table in tables)
+
+    def lookup(self, sql: str, tables, source: str = "primary"):
+        """
+        Returns:
+            tuple: (ticket for store(), cached result or None); the ticket
+            is None when the query must not be cached
+        """
+        if not tables or not is_cacheable(sql):
+            self.uncacheable += 1
+            return None, None
+        key = (source, sql_fingerprint(sql))
+        ticket = (key, tuple(tables), self._current_versions(tables, source))
+        entry = self._entries.get(key)
+        if entry is not None and entry["versions"] == ticket[2]:
+            self.hits += 1
+            self.db_ms_saved += entry["db_ms"]
+            return ticket, entry["result"]
+        if entry is not None:
+            self._entries.pop(key)
+            self.stale += 1
+        self.misses += 1
+        return ticket, None
+
+    def store(self, ticket, result, db_ms: float):
+        """Cache a result under the versions seen before it was read"""
+        if ticket is None:
+            return
+        key, _, versions = ticket
+        self._entries.set(key, {"result": result, "versions": versions, "db_ms": db_ms})
+
+    def clear(self):
+        self._entries.clear()
+        with self._lock:
+            self._versions.clear()
+
+    def stats(self):
+        """Hit ratio, stale drops and database time avoided"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "ttl_seconds": self._entries.ttl,
+            "version_interval_seconds": self.version_interval,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stale_dropped": self.stale,
+            "uncacheable": self.uncacheable,
+            "version_probes": self.probes,
+            "version_probe_ms": round(self.probe_ms, 1),
+            "db_ms_saved": round(self.db_ms_saved, 1),
+        }
@@ -0,0 +1,97 @@
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from answer_format import format_value
+from schema_retriever import count_tokens
+
+# ---------------------------
+# Typed Query Results
+# ---------------------------
+def typed_value(value):
+    """
+    Convert a DB value to a JSON-native type (dates stay dates; orjson
+    encodes them). Decimals become their exact decimal string, so a
+    DECIMAL column is all strings and never loses precision.
+    """
+    if value is None or isinstance(value, (bool, int, float, str, date, datetime)):
+        return value
+    if isinstance(value, Decimal):
+        return format(value, "f")
+    if isinstance(value, time):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value).decode("utf-8", errors="replace")
+    return str(value)
+
+_COLUMN_TYPES = (
+    (bool, "boolean"),
+    (int, "integer"),
+    (float, "float"),
+    (Decimal, "decimal"),
+    (datetime, "datetime"),
+    (date, "date"),
+    (time, "time"),
+    (timedelta, "interval"),
+)
+
+def column_type(values):
+    """Type of a result column from the driver's values (e.g. Decimal for DECIMAL columns)"""
+    for value in values:
+        if value is None:
+            continue
+        for python_type, name in _COLUMN_TYPES:
+            if isinstance(value, python_type):
+                return name
+        return "text"
+    return None
+
+def make_result(columns, rows, truncated: bool = False):
+    """
+    Build a structured query result.
+
+    Returns:
+        dict: columns, types (per column, None when every value is NULL),
+        rows (lists of typed values), row_count and whether more rows
+        existed than were returned
+    """
+    typed_rows = [[typed_value(v) for v in row] for row in rows]
+    return {
+        "columns": [str(c) for c in columns],
+        "types": [column_type(values) for values in zip(*rows)] if rows else [None] * len(columns),
+        "rows": typed_rows,
+        "row_count": len(typed_rows),
+        "truncated": truncated,
+    }
+
+# ---------------------------
+# Prompt Rendering
+# ---------------------------
+def render_for_prompt(result, max_tokens: int = 800):
+    """
+    Render a result compactly for the answer prompt, adding whole rows
+    until the token budget is reached.
+    """
+    columns = result["columns"]
+    types = result.get("types") or [None] * len(columns)
+    rows = result["rows"]
+    header = " | ".join(columns)
+    lines = [header]
+    used = count_tokens(header)
+
+    shown = 0
+    for row in rows:
+        line = " | ".join(format_value(v, kind) for v, kind in zip(row, types))
+        cost = count_tokens(line) + 1
+        if used + cost > max_tokens:
+            break
+        lines.append(line)
+        used += cost
+        shown += 1
+
+    if shown < len(rows):
+        lines.append(f"... ({len(rows) - shown} more rows not shown)")
+    if result.get("truncated"):
+        lines.append("(more rows exist in the database than were fetched)")
+    return "\n".join(lines)
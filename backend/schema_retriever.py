@@ -0,0 +1,293 @@
+import math
+import re
+import threading
+from collections import Counter
+
+import tiktoken
+
+# ---------------------------
+# Token Counting
+# ---------------------------
+_encoding = None
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """Count prompt tokens with tiktoken (rough estimate if the encoding is unavailable)"""
+    global _encoding
+    if _encoding is None:
+        try:
+            _encoding = tiktoken.encoding_for_model(model)
+        except Exception:
+            try:
+                _encoding = tiktoken.get_encoding("o200k_base")
+            except Exception:
+                _encoding = False
+    if not _encoding:
+        return max(1, len(text) // 4)
+    return len(_encoding.encode(text))
+
+# ---------------------------
+# Tokenization
+# ---------------------------
+# Domain words users type that do not appear in table/column names
+SYNONYMS = {
+    "student": ["customer", "users"],
+    "students": ["customer", "users"],
+    "center": ["branch", "centre"],
+    "centre": ["branch", "center"],
+    "centers": ["branch", "centre"],
+    "centres": ["branch", "center"],
+    "institute": ["branch"],
+    "call": ["callcenter"],
+    "calls": ["callcenter"],
+    "phone": ["callcenter", "mobile"],
+    "city": ["cities"],
+    "state": ["states"],
+    "country": ["countries"],
+    "marketing": ["campaign"],
+    "ads": ["campaign", "medium"],
+    "enrollment": ["bookings", "course"],
+    "enrollments": ["bookings", "course"],
+    "payment": ["booking", "payment", "slabs"],
+    "payments": ["booking", "payment", "slabs"],
+    "fee": ["booking", "payment"],
+    "fees": ["booking", "payment"],
+    "staff": ["branch", "users"],
+    "employee": ["users"],
+    "employees": ["users"],
+    "converted": ["conversion"],
+    "conversions": ["conversion"],
+}
+
+STOPWORDS = {
+    "the", "a", "an", "of", "in", "on", "for", "to", "and", "or", "with", "by",
+    "is", "are", "was", "were", "be", "how", "many", "much", "what", "which",
+    "show", "me", "list", "all", "give", "get", "find", "there", "this", "that",
+    "count", "total", "number", "intent", "tables", "entities", "filters",
+    "aggregation", "normalized", "question", "none", "records", "id",
+}
+
+def _stem(token: str) -> str:
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+def tokenize(text: str):
+    """Lowercase word tokens, split on underscores, stemmed and synonym-expanded"""
+    tokens = []
+    for word in re.findall(r"[a-z0-9_]+", text.lower()):
+        parts = [word] + ([p for p in word.split("_") if p] if "_" in word else [])
+        for part in parts:
+            if part in STOPWORDS or len(part) < 2:
+                continue
+            tokens.append(_stem(part))
+            for synonym in SYNONYMS.get(part, []):
+                tokens.append(_stem(synonym))
+    return tokens
+
+# ---------------------------
+# Schema Chunking
+# ---------------------------
+_TABLE_HEADER = re.compile(r"^\S+\s+([a-z_]+) - (.+)$")
+_SECTION_HEADER = re.compile(r"^\d+\.\s+(.+)$")
+
+def split_schema(schema: str):
+    """
+    Split the ENHANCED_SCHEMA text into per-table chunks.
+
+    Returns:
+        tuple: (database line, {table: chunk dict}, guidelines text)
+    """
+    lines = schema.strip("\n").splitlines()
+    database_line = next((l for l in lines if l.startswith("DATABASE:")), "")
+
+    guide_index = next((i for i, l in enumerate(lines) if "QUERY WRITING GUIDELINES" in l), len(lines))
+    guidelines = "\n".join(l for l in lines[guide_index + 1:] if not l.startswith("╚")).strip()
+
+    chunks = {}
+    group = ""
+    current = None
+    for line in lines[:guide_index]:
+        stripped = line.strip()
+        section = _SECTION_HEADER.match(stripped)
+        header = _TABLE_HEADER.match(stripped)
+        if section:
+            group = section.group(1).title()
+            current = None
+        elif header:
+            current = {
+                "table": header.group(1),
+                "description": header.group(2).strip(),
+                "group": group,
+                "lines": [f"{header.group(1)} - {header.group(2).strip()}"],
+            }
+            chunks[current["table"]] = current
+        elif current is not None and stripped and not stripped.startswith(("━", "╔", "║", "╚")):
+            current["lines"].append("   " + stripped)
+        elif not stripped:
+            current = None
+
+    for chunk in chunks.values():
+        body = " ".join(chunk["lines"])
+        columns = re.search(r"Columns:\s*(.+?)(?:Purpose:|$)", body)
+        chunk["columns"] = [c.strip() for c in columns.group(1).split(",")] if columns else []
+        chunk["columns"] = [re.sub(r"\s*\(.*\)$", "", c) for c in chunk["columns"] if c]
+        chunk["text"] = "\n".join(chunk["lines"])
+    return database_line, chunks, guidelines
+
+def _singular(table: str) -> str:
+    if table.endswith("ies"):
+        return table[:-3] + "y"
+    if table.endswith("s"):
+        return table[:-1]
+    return table
+
+def infer_join_partners(chunks):
+    """Map each table to the tables its `<name>_id` columns point at"""
+    by_name = {}
+    for table in chunks:
+        by_name[table] = table
+        by_name.setdefault(_singular(table), table)
+
+    partners = {}
+    for table, chunk in chunks.items():
+        targets = []
+        for column in chunk["columns"]:
+            if column.endswith("_id"):
+                target = by_name.get(column[:-3])
+                if target and target != table:
+                    targets.append(target)
+        partners[table] = targets
+    return partners
+
+# ---------------------------
+# BM25 Index
+# ---------------------------
+class BM25Index:
+    """Okapi BM25 over a small set of tokenized documents"""
+
+    def __init__(self, documents: dict, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = {key: Counter(tokens) for key, tokens in documents.items()}
+        self.lengths = {key: len(tokens) for key, tokens in documents.items()}
+        self.avg_length = (sum(self.lengths.values()) / len(self.lengths)) if self.lengths else 0
+        doc_freq = Counter()
+        for freqs in self.term_freqs.values():
+            doc_freq.update(freqs.keys())
+        n = len(documents)
+        self.idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in doc_freq.items()}
+
+    def score(self, query_tokens):
+        scores = {}
+        for key, freqs in self.term_freqs.items():
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[key] / (self.avg_length or 1))
+            total = 0.0
+            for term in set(query_tokens):
+                tf = freqs.get(term)
+                if tf:
+                    total += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            if total > 0:
+                scores[key] = total
+        return scores
+
+# ---------------------------
+# Schema Retriever
+# ---------------------------
+class SchemaRetriever:
+    """Selects the tables relevant to a question instead of sending the whole schema"""
+
+    def __init__(self, schema: str, top_k: int = 4, min_score_ratio: float = 0.35, table_weight: int = 3,
+                 memo_size: int = 256):
+        self.full_schema = schema
+        self.top_k = top_k
+        self.min_score_ratio = min_score_ratio
+        self.database_line, self.chunks, self.guidelines = split_schema(schema)
+        self.join_partners = infer_join_partners(self.chunks)
+
+        documents = {}
+        for table, chunk in self.chunks.items():
+            tokens = tokenize(table) * table_weight
+            tokens += tokenize(" ".join(chunk["columns"]))
+            tokens += tokenize(chunk["description"]) + tokenize(chunk["text"]) + tokenize(chunk["group"])
+            documents[table] = tokens
+        self.index = BM25Index(documents)
+
+        self.full_tokens = count_tokens(schema)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.pruned_requests = 0
+        self.tokens_sent = 0
+        self.tokens_full = 0
+        # Rendered schema and token count per table selection, shared across requests
+        self.memo_size = memo_size
+        self._rendered = {}
+        self.render_hits = 0
+
+    def select_tables(self, query: str):
+        """Top-k tables by BM25 score plus the tables they join to"""
+        scores = self.index.score(tokenize(query))
+        ranked = sorted(scores, key=lambda t: (-scores[t], t))[:self.top_k]
+        if ranked:
+            # Drop weak matches far below the best-scoring table
+            cutoff = scores[ranked[0]] * self.min_score_ratio
+            ranked = [t for t in ranked if scores[t] >= cutoff]
+        selected = list(ranked)
+        for table in ranked:
+            for partner in self.join_partners.get(table, []):
+                if partner not in selected:
+                    selected.append(partner)
+        return selected
+
+    def render(self, tables):
+        """Render a compact schema block for the given tables"""
+        parts = [self.database_line, "", "RELEVANT TABLES:", ""]
+        for table in tables:
+            parts.append(self.chunks[table]["text"])
+            parts.append("")
+        parts.append("QUERY WRITING GUIDELINES:")
+        parts.append(self.guidelines)
+        return "\n".join(parts)
+
+    def schema_for(self, query: str):
+        """Return the pruned schema for a query (the full schema if nothing matches)"""
+        tables = self.select_tables(query)
+        schema, tokens = self._rendered_for(tables) if tables else (self.full_schema, self.full_tokens)
+        with self._lock:
+            self.requests += 1
+            self.pruned_requests += 1 if tables else 0
+            self.tokens_sent += tokens
+            self.tokens_full += self.full_tokens
+        return schema
+
+    def _rendered_for(self, tables):
+        key = tuple(tables)
+        with self._lock:
+            cached = self._rendered.get(key)
+            if cached is not None:
+                self.render_hits += 1
+                return cached
+        schema = self.render(tables)
+        rendered = (schema, count_tokens(schema))
+        with self._lock:
+            if len(self._rendered) >= self.memo_size:
+                self._rendered.pop(next(iter(self._rendered)))
+            self._rendered[key] = rendered
+        return rendered
+
+    def stats(self):
+        """Token savings of schema pruning so far"""
+        with self._lock:
+            saved = self.tokens_full - self.tokens_sent
+            return {
+                "tables_indexed": len(self.chunks),
+                "top_k": self.top_k,
+                "full_schema_tokens": self.full_tokens,
+                "requests": self.requests,
+                "pruned_requests": self.pruned_requests,
+                "avg_tokens_sent": round(self.tokens_sent / self.requests, 1) if self.requests else None,
+                "tokens_saved": saved,
+                "savings_ratio": round(saved / self.tokens_full, 4) if self.tokens_full else 0.0,
+                "render_hits": self.render_hits,
+            }
@@ -0,0 +1,129 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# ---------------------------
+# Follow-Up Detection
+# ---------------------------
+_BACK_REFERENCE_START = re.compile(
+    r"^(?:(?:and |but )?(?:only |just )?(?:those|these|them)|now|same for|the same|what about|how about|"
+    r"(?:which|how many|what|who) (?:of|among) (?:them|those|these))\b",
+    re.IGNORECASE,
+)
+_CONNECTIVE_START = re.compile(
+    r"^(?:and|but|then|also|only|just|instead|except|excluding|"
+    r"including|sort|order|group|filter|limit|show only|only show|narrow)\b",
+    re.IGNORECASE,
+)
+_FILTER_START = re.compile(
+    r"^(?:in|for|from|by|per|with|without|where|during|between|before|after)\b",
+    re.IGNORECASE,
+)
+_FILTER_WORD = re.compile(
+    r"\b(?:in|for|from|by|per|with|without|where|during|between|before|after|above|below|over|under)\b",
+    re.IGNORECASE,
+)
+_QUESTION_WORD = re.compile(
+    r"\b(?:how many|how much|what|which|who|list|show me all|show all|give me all|count|total)\b",
+    re.IGNORECASE,
+)
+
+def _table_word(table: str) -> str:
+    """Pattern for a table as users write it: "cities" -> city/cities, "callcenter_calls" -> call/calls"""
+    word = re.escape(table.lower().rsplit("_", 1)[-1])
+    if word.endswith("ies"):
+        return word[:-3] + "(?:y|ies)"
+    return word[:-1] + "s?" if word.endswith("s") else word + "(?:s|es)?"
+
+def _names_subject_table(text: str, tables) -> bool:
+    """True if the clause before the first filter names a table ("active campaigns in Pune")"""
+    subject = _FILTER_WORD.split(text, maxsplit=1)[0].lower()
+    return any(re.search(rf"\b{_table_word(table)}\b", subject) for table in tables)
+
+def is_follow_up(question: str, history, tables=()) -> bool:
+    """
+    Heuristically decide whether a question refines the previous turn.
+
+    A question that starts by referring back ("those ...", "only them",
+    "now ...", "same for Pune", "which of them ...") is a follow-up. Otherwise
+    a full question (a question word, or a subject naming one of `tables`)
+    stands alone, even if it mentions "previous" or "above". What remains is
+    a follow-up only if it starts with a connective ("sort by name", "what
+    about Delhi") or is a bare filter ("in 2023", "for Pune branches").
+    """
+    if not history:
+        return False
+    text = question.strip()
+    if _BACK_REFERENCE_START.search(text):
+        return True
+    if _QUESTION_WORD.search(text) or _names_subject_table(text, tables):
+        return False
+    return bool(_CONNECTIVE_START.search(text) or _FILTER_START.search(text))
+
+# ---------------------------
+# Session Store
+# ---------------------------
+def _turn_size(turn) -> int:
+    return sum(len(str(v)) for v in turn.values())
+
+class SessionStore:
+    """
+    Per-session history of recent turns (question, normalized analysis, SQL,
+    result shape) with LRU eviction by session count and total size.
+    """
+
+    def __init__(self, max_sessions: int = 1000, max_turns: int = 5, max_bytes: int = 8 * 1024 * 1024):
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+        self.max_bytes = max_bytes
+        self._sessions = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.evictions = 0
+
+    def history(self, session_id: str):
+        """Return the session's turns, oldest first (empty for unknown sessions)"""
+        with self._lock:
+            turns = self._sessions.get(session_id)
+            if turns is None:
+                return []
+            self._sessions.move_to_end(session_id)
+            return list(turns)
+
+    def last_turn(self, session_id: str):
+        turns = self.history(session_id)
+        return turns[-1] if turns else None
+
+    def record(self, session_id: str, turn: dict):
+        """Append a turn, keeping the last `max_turns` and evicting least recently used sessions"""
+        turn = {**turn, "at": time.time()}
+        with self._lock:
+            turns = self._sessions.pop(session_id, [])
+            turns = (turns + [turn])[-self.max_turns:]
+            size = sum(_turn_size(t) for t in turns)
+            self.total_bytes += size - self._sizes.get(session_id, 0)
+            self._sessions[session_id] = turns
+            self._sizes[session_id] = size
+            while self._sessions and (
+                len(self._sessions) > self.max_sessions or self.total_bytes > self.max_bytes
+            ):
+                evicted, _ = self._sessions.popitem(last=False)
+                self.total_bytes -= self._sizes.pop(evicted)
+                self.evictions += 1
+
+    def clear(self, session_id: str):
+        with self._lock:
+            if self._sessions.pop(session_id, None) is not None:
+                self.total_bytes -= self._sizes.pop(session_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,103 @@
+import asyncio
+import threading
+
+# ---------------------------
+# Single-Flight Request Coalescing
+# ---------------------------
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Runs one call per key at a time; concurrent callers with the same key share its result"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        """
+        Run fn() unless an identical call is already in flight.
+
+        Returns:
+            tuple: (result, shared) where shared is True for callers that
+            received another caller's result
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+        return call.result, False
+
+    def stats(self):
+        with self._lock:
+            return {"in_flight": len(self._calls), "leaders": self.leaders, "coalesced": self.coalesced}
+
+class AsyncSingleFlight:
+    """
+    asyncio variant of SingleFlight; the shared task survives cancellation
+    of any one caller and is cancelled once every caller has gone away.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+        self._waiters = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    async def do(self, key, factory):
+        """Await factory() unless an identical coroutine is already in flight"""
+        task = self._tasks.get(key)
+        shared = task is not None
+        if shared:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(factory())
+            self._tasks[key] = task
+            self.leaders += 1
+            task.add_done_callback(lambda t: self._done(key, t))
+
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task), shared
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                if not task.done():
+                    task.cancel()
+                    self.abandoned += 1
+
+    def _done(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved when every caller went away
+
+    def stats(self):
+        return {"in_flight": len(self._tasks), "leaders": self.leaders, "coalesced": self.coalesced, "abandoned": self.abandoned}
@@ -0,0 +1,77 @@
+import json
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+
+# ---------------------------
+# Executed-SQL Log
+# ---------------------------
+class SQLLog:
+    """
+    Appends every executed statement with its latency to a JSONL file
+    (rotated to `<path>.1` past `max_bytes`). Writes happen on a background
+    thread so request paths never wait on disk.
+
+    Read offline by scripts/index_advisor.py.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 50 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+
+    def record(self, sql: str, latency_ms: float, source: str, rows: int = None, error: str = None):
+        """Queue one executed statement for writing"""
+        if not self.path:
+            return
+        self._ensure_writer()
+        self._queue.put({
+            "at": datetime.now(timezone.utc).isoformat(),
+            "source": source,
+            "sql": sql,
+            "latency_ms": round(latency_ms, 1),
+            "rows": rows,
+            "success": error is None,
+            "error": error,
+        })
+
+    def _ensure_writer(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self._thread = threading.Thread(target=self._write_loop, name="sql-log", daemon=True)
+                self._thread.start()
+
+    def _rotate_if_full(self):
+        try:
+            if os.path.getsize(self.path) >= self.max_bytes:
+                os.replace(self.path, self.path + ".1")
+        except OSError:
+            pass
+
+    def _write_loop(self):
+        while True:
+            entries = [self._queue.get()]
+            while len(entries) < 500:
+                try:
+                    entries.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._rotate_if_full()
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.writelines(json.dumps(entry, default=str) + "\n" for entry in entries)
+                self.written += len(entries)
+            except OSError as e:
+                self.dropped += len(entries)
+                print(f"⚠️ Could not write SQL log: {e}")
+
+    def stats(self):
+        return {"path": self.path, "written": self.written, "dropped": self.dropped, "queued": self._queue.qsize()}
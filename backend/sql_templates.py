@@ -0,0 +1,236 @@
+import re
+import threading
+
+from cache import TTLCache
+from sql_utils import find_literals, quote_string
+
+# ---------------------------
+# Normalized Analysis Parsing
+# ---------------------------
+_FIELD = re.compile(
+    r"^\s*\**\s*(Intent|Tables|Entities|Filters|Aggregation|Normalized Question)\s*\**\s*:\s*(.*)$",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+def parse_normalized(normalized_info: str):
+    """Parse the "Field: value" lines produced by normalize_query"""
+    fields = {}
+    for name, value in _FIELD.findall(normalized_info or ""):
+        fields.setdefault(name.lower(), value.strip())
+    return fields
+
+def _mask_literals(text: str):
+    """Replace literals with ? and return (masked text, literal dicts)"""
+    literals = find_literals(text)
+    masked = text
+    for literal in reversed(literals):
+        masked = masked[:literal["start"]] + "?" + masked[literal["end"]:]
+    return re.sub(r"\s+", " ", masked).strip().lower(), literals
+
+_THOUSANDS = re.compile(r"(?<=\d),(?=\d{3}\b)")
+_COUNT = re.compile(r"\b\d+\b")
+
+def _mask_phrase(text: str, values):
+    """
+    Mask a free-text field: filter values become ? and any remaining
+    numbers become # (row counts such as "top 5").
+
+    Returns:
+        tuple: (masked text, count values in order)
+    """
+    masked = _THOUSANDS.sub("", text or "")
+    for value in sorted({v.strip("%") for v in values if v.strip("%")}, key=len, reverse=True):
+        masked = re.sub(rf"(?<!\w){re.escape(_THOUSANDS.sub('', value))}(?!\w)", "?", masked, flags=re.IGNORECASE)
+    counts = _COUNT.findall(masked)
+    masked = _COUNT.sub("#", masked)
+    return re.sub(r"\s+", " ", masked).strip().lower(), counts
+
+def template_shape(normalized_info: str):
+    """
+    Build the template key of an analysis: intent, tables, filter shape,
+    aggregation, and the projection (entities and normalized question)
+    with filter values and row counts masked.
+
+    Returns:
+        tuple: (key, slot values, index of the first row-count value) or
+        (None, None, None) when the analysis has no intent or tables to key on
+    """
+    fields = parse_normalized(normalized_info)
+    intent = fields.get("intent", "").lower()
+    tables = sorted({t.strip().lower() for t in fields.get("tables", "").split(",") if t.strip()})
+    if not intent or not tables or intent == "general_query":
+        return None, None, None
+
+    filters_shape, literals = _mask_literals(fields.get("filters", ""))
+    aggregation_shape, _ = _mask_literals(fields.get("aggregation", ""))
+    values = [literal["value"] for literal in literals]
+    entities_shape, _ = _mask_phrase(fields.get("entities", ""), values)
+    question_shape, counts = _mask_phrase(fields.get("normalized question", ""), values)
+    key = "|".join([intent, ",".join(tables), filters_shape, aggregation_shape, entities_shape, question_shape])
+    return key, values + counts, len(values)
+
+def _same_number(a: str, b: str) -> bool:
+    try:
+        return float(a) == float(b)
+    except ValueError:
+        return False
+
+def _is_number(value: str) -> bool:
+    return re.fullmatch(r"\d+(?:\.\d+)?", value) is not None
+
+def _case_of(text: str) -> str:
+    if text.islower():
+        return "lower"
+    if text.isupper():
+        return "upper"
+    return "keep"
+
+# ---------------------------
+# SQL Template Cache
+# ---------------------------
+class SQLTemplateCache:
+    """
+    Caches validated SQL as templates whose literals are bound to the
+    filter values of the normalized analysis.
+
+    A template is only stored when every literal in the SQL can be traced
+    back to a filter value (or is a 0/1 flag), every LIMIT count to a
+    number in the question (or a default LIMIT when the question has
+    none), and every value is used, so binding new values cannot silently
+    keep an old one.
+    """
+
+    def __init__(self, max_size: int = 500, ttl: float = 3600):
+        self._templates = TTLCache(max_size=max_size, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.uncacheable = 0
+        self.llm_ms_saved = 0.0
+
+    def build_template(self, sql: str, values, counts_from: int = None):
+        """
+        Split SQL into constant text and parameter slots, or None if not
+        templatable. Values from `counts_from` on are row counts and only
+        bind LIMIT literals.
+        """
+        counts_from = len(values) if counts_from is None else counts_from
+        parts = []
+        used = set()
+        position = 0
+        for literal in find_literals(sql):
+            parts.append(sql[position:literal["start"]])
+            position = literal["end"]
+            value = literal["value"]
+
+            if literal["kind"] == "number":
+                slots = range(counts_from, len(values)) if literal["is_limit"] else range(counts_from)
+                index = next((i for i in slots if i not in used and _same_number(values[i], value)), None)
+                if index is None and not literal["is_limit"]:
+                    index = next((i for i in slots if _same_number(values[i], value)), None)
+                if index is not None:
+                    parts.append(("number", index))
+                    used.add(index)
+                elif literal["is_limit"] or value in ("0", "1"):
+                    parts.append(sql[literal["start"]:literal["end"]])
+                else:
+                    return None
+                continue
+
+            core = value.strip("%")
+            prefix = value[:len(value) - len(value.lstrip("%"))]
+            suffix = value[len(value.rstrip("%")):]
+            index = next((i for i, v in enumerate(values[:counts_from]) if core and v.strip("%").lower() == core.lower()), None)
+            if index is not None:
+                parts.append(("string", prefix, index, suffix, _case_of(core), _is_number(values[index])))
+                used.add(index)
+                continue
+
+            # Value embedded in a longer literal, e.g. year 2024 in '2024-01-01'
+            candidates = sorted(
+                ((i, v.strip("%")) for i, v in enumerate(values[:counts_from]) if len(v.strip("%")) >= 3),
+                key=lambda item: -len(item[1]),
+            )
+            for i, candidate in candidates:
+                at = value.lower().find(candidate.lower())
+                if at != -1:
+                    end = at + len(candidate)
+                    parts.append(("string", value[:at], i, value[end:], _case_of(value[at:end]), _is_number(candidate)))
+                    used.add(i)
+                    break
+            else:
+                if core:
+                    return None
+                parts.append(sql[literal["start"]:literal["end"]])
+
+        parts.append(sql[position:])
+        if used != set(range(len(values))):
+            return None
+        return {"parts": parts, "slots": len(values)}
+
+    def render(self, template, values):
+        """Bind new filter values into a template (None if a value does not fit its slot)"""
+        if len(values) != template["slots"]:
+            return None
+        pieces = []
+        for part in template["parts"]:
+            if isinstance(part, str):
+                pieces.append(part)
+            elif part[0] == "number":
+                value = values[part[1]]
+                if not _is_number(value):
+                    return None
+                pieces.append(value)
+            else:
+                _, prefix, index, suffix, case, numeric = part
+                value = values[index].strip("%")
+                if numeric and not _is_number(value):
+                    return None
+                if case == "lower":
+                    value = value.lower()
+                elif case == "upper":
+                    value = value.upper()
+                pieces.append(quote_string(prefix + value + suffix))
+        return "".join(pieces)
+
+    def lookup(self, normalized_info: str):
+        """Return SQL for an analysis whose shape has a cached template, else None"""
+        key, values, _ = template_shape(normalized_info)
+        if key is None:
+            return None
+        entry = self._templates.get(key)
+        sql = self.render(entry["template"], values) if entry is not None else None
+        with self._lock:
+            if sql is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.llm_ms_saved += entry["generation_ms"]
+        return sql
+
+    def store(self, normalized_info: str, sql: str, generation_ms: float = 0.0):
+        """Store validated SQL as a template for its analysis shape"""
+        key, values, counts_from = template_shape(normalized_info)
+        template = self.build_template(sql, values, counts_from) if key is not None else None
+        if template is None:
+            with self._lock:
+                self.uncacheable += 1
+            return False
+        self._templates.set(key, {"template": template, "generation_ms": generation_ms})
+        with self._lock:
+            self.stored += 1
+        return True
+
+    def stats(self):
+        """Template hit rate and LLM time avoided"""
+        lookups = self.hits + self.misses
+        return {
+            "templates": len(self._templates),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stored": self.stored,
+            "uncacheable": self.uncacheable,
+            "llm_ms_saved": round(self.llm_ms_saved, 1),
+        }
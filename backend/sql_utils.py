@@ -0,0 +1,148 @@
+import re
+
+# ---------------------------
+# SQL Literal Scanning
+# ---------------------------
+_TOKEN = re.compile(
+    r"(?P<ident>`[^`]*`)"
+    r"|(?P<string>'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\")"
+    r"|(?P<number>(?<![\w.])\d+(?:\.\d+)?(?![\w.]))"
+)
+_LIMIT_BEFORE = re.compile(r"\b(?:LIMIT|OFFSET)\s+(?:\d+\s*,\s*)?$", re.IGNORECASE)
+
+def find_literals(sql: str):
+    """
+    Find string and numeric literals outside of backtick identifiers.
+
+    Returns:
+        list[dict]: kind ("string"/"number"), value (unquoted), start, end,
+        and whether the literal is a LIMIT/OFFSET count
+    """
+    literals = []
+    for match in _TOKEN.finditer(sql):
+        if match.group("ident"):
+            continue
+        if match.group("string"):
+            raw = match.group("string")
+            quote = raw[0]
+            value = raw[1:-1].replace(quote * 2, quote).replace("\\" + quote, quote)
+            kind = "string"
+        else:
+            value = match.group("number")
+            kind = "number"
+        literals.append({
+            "kind": kind,
+            "value": value,
+            "start": match.start(),
+            "end": match.end(),
+            "is_limit": kind == "number" and bool(_LIMIT_BEFORE.search(sql[:match.start()])),
+        })
+    return literals
+
+def quote_string(value: str) -> str:
+    """Quote a value as a MySQL string literal"""
+    return "'" + str(value).replace("\\", "\\\\").replace("'", "''") + "'"
+
+def inline_params(sql: str, params: dict) -> str:
+    """Substitute :name bind parameters with literals (for display and reuse, not execution)"""
+    def literal(match):
+        name = match.group(1)
+        if name not in params:
+            return match.group(0)
+        value = params[name]
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return str(value)
+        return quote_string(value)
+    return re.sub(r"(?<![:\w]):(\w+)", literal, sql)
+
+# ---------------------------
+# Table References
+# ---------------------------
+_TABLE_REF = re.compile(r"\b(?:FROM|JOIN)\s+(?!\()`?(\w+)`?(?:\s*\.\s*`?(\w+)`?)?", re.IGNORECASE)
+# FROM inside EXTRACT(YEAR FROM col), TRIM(x FROM col), ... names a column, not a table
+_FROM_IN_FUNCTION = re.compile(r"\b(?:EXTRACT|TRIM|SUBSTRING|SUBSTR|POSITION)\s*\([^()]*$", re.IGNORECASE)
+
+def referenced_tables(sql: str):
+    """Tables named after FROM/JOIN, in order of first appearance (database prefixes dropped)"""
+    tables = []
+    for match in _TABLE_REF.finditer(sql):
+        if _FROM_IN_FUNCTION.search(sql[:match.start()]):
+            continue
+        table = match.group(2) or match.group(1)
+        if table not in tables:
+            tables.append(table)
+    return tables
+
+_ALIAS = re.compile(r"\s+(?:AS\s+)?`?(\w+)`?", re.IGNORECASE)
+_NOT_ALIAS = {
+    "WHERE", "JOIN", "INNER", "LEFT", "RIGHT", "OUTER", "CROSS", "NATURAL", "STRAIGHT_JOIN",
+    "ON", "USING", "GROUP", "ORDER", "HAVING", "LIMIT", "UNION", "WINDOW", "FOR", "USE",
+    "FORCE", "IGNORE", "PARTITION", "LOCK",
+}
+
+def table_aliases(sql: str):
+    """Map every alias and table name in FROM/JOIN clauses to its table (EXPLAIN reports aliases)"""
+    aliases = {}
+    for match in _TABLE_REF.finditer(sql):
+        if _FROM_IN_FUNCTION.search(sql[:match.start()]):
+            continue
+        table = match.group(2) or match.group(1)
+        aliases.setdefault(table, table)
+        alias = _ALIAS.match(sql, match.end())
+        if alias and alias.group(1).upper() not in _NOT_ALIAS:
+            aliases[alias.group(1)] = table
+    return aliases
+
+# ---------------------------
+# Row Bounding
+# ---------------------------
+_TRAILING_LIMIT = re.compile(
+    r"\bLIMIT\s+(\d+)(?:\s*,\s*(\d+)|\s+OFFSET\s+(\d+))?\s*$",
+    re.IGNORECASE,
+)
+
+def bound_limit(sql: str, max_rows: int) -> str:
+    """
+    Make the server return at most `max_rows` rows.
+
+    A trailing LIMIT is clamped to `max_rows`; otherwise one is appended.
+    Applies to aggregates and GROUP BY queries too, since a GROUP BY can
+    produce as many rows as the table has keys.
+    """
+    sql = sql.strip().rstrip(";").rstrip()
+    match = _TRAILING_LIMIT.search(sql)
+    if not match:
+        return f"{sql} LIMIT {max_rows}"
+
+    head = sql[:match.start()]
+    if match.group(2) is not None:
+        offset, count = match.group(1), int(match.group(2))
+        return f"{head}LIMIT {offset}, {min(count, max_rows)}"
+    count = min(int(match.group(1)), max_rows)
+    offset = f" OFFSET {match.group(3)}" if match.group(3) is not None else ""
+    return f"{head}LIMIT {count}{offset}"
+
+def strip_limit(sql: str):
+    """
+    Split off a trailing LIMIT clause.
+
+    Returns:
+        tuple: (sql without the LIMIT, row count or None, offset)
+    """
+    sql = sql.strip().rstrip(";").rstrip()
+    match = _TRAILING_LIMIT.search(sql)
+    if not match:
+        return sql, None, 0
+    head = sql[:match.start()].rstrip()
+    if match.group(2) is not None:
+        return head, int(match.group(2)), int(match.group(1))
+    return head, int(match.group(1)), int(match.group(3) or 0)
+
+# ---------------------------
+# Execution Deadlines
+# ---------------------------
+_LEADING_SELECT = re.compile(r"^\s*SELECT\b", re.IGNORECASE)
+
+def with_execution_time_hint(sql: str, timeout_ms: int) -> str:
+    """Add a MAX_EXECUTION_TIME optimizer hint so MySQL aborts the SELECT after `timeout_ms`"""
+    return _LEADING_SELECT.sub(f"SELECT /*+ MAX_EXECUTION_TIME({max(int(timeout_ms), 1)}) */", sql, count=1)
@@ -0,0 +1,142 @@
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+
+from answer_format import format_value
+from results import typed_value
+
+# ---------------------------
+# Metric Catalogue
+# ---------------------------
+# "question" and "answer" keep the /stats/summary "statistics" map in the
+# {question: answer sentence} form it had when each entry was asked of the agent
+DEFAULT_METRICS = {
+    "total_branches": {
+        "label": "Total branches",
+        "sql": "SELECT COUNT(*) FROM branch",
+        "question": "How many branches are there?",
+        "answer": "There are {value} branches in total.",
+    },
+    "active_campaigns": {
+        "label": "Active campaigns",
+        "sql": "SELECT COUNT(*) FROM campaigns WHERE status = 1",
+        "question": "How many active campaigns?",
+        "answer": "There are {value} active campaigns.",
+    },
+    "total_calls": {
+        "label": "Total calls",
+        "sql": "SELECT COUNT(*) FROM callcenter_calls",
+        "question": "Total number of calls?",
+        "answer": "{value} calls have been recorded in total.",
+    },
+    "total_cities": {
+        "label": "Total cities",
+        "sql": "SELECT COUNT(*) FROM cities",
+        "question": "Total cities in database?",
+        "answer": "There are {value} cities in the database.",
+    },
+}
+
+def load_metric_catalogue(path: str = None, validate=None):
+    """
+    Default metrics, extended (or overridden by name) from a JSON file of
+    {"name": {"label": ..., "sql": ..., "question": ..., "answer": ...}}
+    entries (question and answer optional).
+    """
+    metrics = dict(DEFAULT_METRICS)
+    if path:
+        with open(path, encoding="utf-8") as f:
+            metrics.update(json.load(f))
+    if validate:
+        metrics = {name: {**m, "sql": validate(m["sql"])} for name, m in metrics.items()}
+    return metrics
+
+# ---------------------------
+# Background Statistics Service
+# ---------------------------
+class StatsService:
+    """Refreshes aggregate metrics on a schedule and serves the last snapshot"""
+
+    def __init__(self, get_engine, metrics, interval: float = 300):
+        self.get_engine = get_engine  # returns the async engine (created lazily)
+        self.metrics = metrics
+        self.interval = interval
+        self._snapshot = None
+        self._task = None
+        self._refresh_lock = asyncio.Lock()
+
+    async def _run_metric(self, conn, name, metric):
+        try:
+            result = await conn.execute(text(metric["sql"]))
+            row = result.first()
+            raw = row[0] if row else None
+            label = metric.get("label", name)
+            return name, {
+                "label": label,
+                "value": typed_value(raw),
+                "question": metric.get("question", label),
+                "answer": metric.get("answer", "{label}: {value}").format(label=label, value=format_value(raw)),
+            }
+        except Exception as e:
+            print(f"⚠️ Statistic '{name}' failed: {e}")
+            return name, {"label": metric.get("label", name), "value": None, "error": str(e)}
+
+    async def refresh(self):
+        """Run every metric query once and replace the snapshot"""
+        async with self._refresh_lock:
+            started = time.perf_counter()
+            async with self.get_engine().connect() as conn:
+                values = {}
+                for name, metric in self.metrics.items():
+                    key, value = await self._run_metric(conn, name, metric)
+                    values[key] = value
+            self._snapshot = {
+                "metrics": values,
+                "refreshed_at": datetime.now(timezone.utc).isoformat(),
+                "refreshed_monotonic": time.monotonic(),
+                "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+            }
+            return self._snapshot
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"⚠️ Statistics refresh failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Start the background refresh loop on the running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @staticmethod
+    def answers(snapshot):
+        """{question: answer} for every metric that succeeded, as /stats/summary has always returned"""
+        return {m["question"]: m["answer"] for m in snapshot["metrics"].values() if "error" not in m}
+
+    def snapshot(self):
+        """Return the last snapshot (None before the first refresh) with its age"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return None
+        age = time.monotonic() - snapshot["refreshed_monotonic"]
+        return {
+            "metrics": snapshot["metrics"],
+            "refreshed_at": snapshot["refreshed_at"],
+            "age_seconds": round(age, 1),
+            "duration_ms": snapshot["duration_ms"],
+        }
@@ -0,0 +1,328 @@
+# scripts/index_advisor.py
+#
+# Offline index advisor: reads the executed-SQL log written by the chatbot
+# (backend/logs/executed_sql.jsonl), aggregates which columns its queries
+# filter, join, sort and group on, checks them against the existing indexes
+# in information_schema.STATISTICS and prints ranked recommendations with the
+# share of logged query latency each would affect.
+#
+#   python scripts/index_advisor.py                 # log + live index check
+#   python scripts/index_advisor.py --offline       # log only, no database
+#   python scripts/index_advisor.py --log other.jsonl --top 30
+import argparse
+import json
+import os
+import re
+import sys
+from collections import defaultdict
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+sys.path.append(BACKEND_DIR)
+
+DEFAULT_LOG = os.getenv("SQL_LOG_PATH", os.path.join(BACKEND_DIR, "logs", "executed_sql.jsonl"))
+
+# ---------------------------
+# Reading the Log
+# ---------------------------
+def read_log(path):
+    """Log entries (rotated <path>.1 first), skipping lines that are not valid JSON"""
+    entries = []
+    for file_path in (path + ".1", path):
+        if not os.path.exists(file_path):
+            continue
+        with open(file_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get("sql"):
+                    entries.append(entry)
+    return entries
+
+# ---------------------------
+# Parsing Statements
+# ---------------------------
+_KEYWORDS = {
+    "select", "from", "where", "and", "or", "not", "null", "is", "in", "like", "between", "as", "on",
+    "join", "inner", "left", "right", "outer", "cross", "group", "order", "by", "having", "limit",
+    "offset", "asc", "desc", "case", "when", "then", "else", "end", "distinct", "union", "all",
+    "exists", "interval", "day", "month", "year", "true", "false", "using", "natural",
+}
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_HINT = re.compile(r"/\*.*?\*/", re.DOTALL)
+_LEADING_WILDCARD = re.compile(r"(?:(\w+)\.)?(\w+)\s*\)?\s+(?:NOT\s+)?LIKE\s+'%", re.IGNORECASE)
+_TABLE_ALIAS = re.compile(
+    r"\b(?:FROM|JOIN)\s+(?!\()(?:\w+\.)?(\w+)(?:\s+(?:AS\s+)?(?!(?:ON|WHERE|JOIN|LEFT|RIGHT|INNER|OUTER|CROSS|"
+    r"GROUP|ORDER|LIMIT|USING|HAVING|UNION|NATURAL)\b)(\w+))?",
+    re.IGNORECASE,
+)
+_FROM_IN_FUNCTION = re.compile(r"\b(?:EXTRACT|TRIM|SUBSTRING|SUBSTR|POSITION)\s*\([^()]*$", re.IGNORECASE)
+_CLAUSE = re.compile(
+    r"\b(WHERE|ON|ORDER\s+BY|GROUP\s+BY|HAVING|LIMIT|UNION|SELECT|FROM|(?:LEFT|RIGHT|INNER|OUTER|CROSS)?\s*JOIN)\b",
+    re.IGNORECASE,
+)
+_PREDICATE = re.compile(
+    r"(?:(?P<qualifier>\w+)\.)?(?P<column>[A-Za-z_]\w*)\s*(?P<close>\))?\s*"
+    r"(?P<op><=>|>=|<=|<>|!=|=|<|>|\bNOT\s+IN\b|\bIN\b|\bBETWEEN\b|\bNOT\s+LIKE\b|\bLIKE\b|\bIS\b)",
+    re.IGNORECASE,
+)
+_JOIN_PAIR = re.compile(r"(\w+)\.(\w+)\s*=\s*(\w+)\.(\w+)")
+_PLAIN_COLUMN = re.compile(r"^(?:(\w+)\.)?([A-Za-z_]\w*)(?:\s+(?:ASC|DESC))?$", re.IGNORECASE)
+
+_RANGE_OPS = {">", "<", ">=", "<=", "between"}
+
+def _clauses(sql):
+    """Split a statement into (clause keyword, text) segments"""
+    marks = [
+        (m.start(), m.end(), re.sub(r"\s+", " ", m.group(1)).strip().upper())
+        for m in _CLAUSE.finditer(sql)
+        if not (m.group(1).upper() == "FROM" and _FROM_IN_FUNCTION.search(sql[:m.start()]))
+    ]
+    segments = []
+    for i, (_, end, keyword) in enumerate(marks):
+        stop = marks[i + 1][0] if i + 1 < len(marks) else len(sql)
+        segments.append((keyword, sql[end:stop]))
+    return segments
+
+def parse_statement(sql):
+    """
+    Column usage of one statement.
+
+    Returns:
+        dict: tables (alias -> table), uses [(qualifier, column, kind)] with
+        kind one of eq, range, like, join, order, group, function, wildcard
+    """
+    leading_wildcard = {(q, c.lower()) for q, c in _LEADING_WILDCARD.findall(sql)}
+    sql = _STRING.sub("?", _HINT.sub(" ", sql)).replace("`", "")
+
+    tables = {}
+    for match in _TABLE_ALIAS.finditer(sql):
+        if _FROM_IN_FUNCTION.search(sql[:match.start()]):
+            continue
+        table = match.group(1)
+        tables[table] = table
+        if match.group(2):
+            tables[match.group(2)] = table
+
+    uses = []
+    for keyword, text in _clauses(sql):
+        if keyword in ("WHERE", "HAVING"):
+            for m in _PREDICATE.finditer(text):
+                column = m.group("column")
+                if column.lower() in _KEYWORDS:
+                    continue
+                op = re.sub(r"\s+", " ", m.group("op").lower())
+                qualifier = m.group("qualifier")
+                if m.group("close"):  # col) = ...: the column is wrapped in a function
+                    kind = "function"
+                elif op in ("like", "not like"):
+                    kind = "wildcard" if (qualifier or "", column.lower()) in leading_wildcard else "like"
+                elif op in _RANGE_OPS:
+                    kind = "range"
+                else:
+                    kind = "eq"
+                uses.append((qualifier, column, kind))
+        elif keyword == "ON":
+            for left_q, left_c, right_q, right_c in _JOIN_PAIR.findall(text):
+                uses += [(left_q, left_c, "join"), (right_q, right_c, "join")]
+        elif keyword in ("ORDER BY", "GROUP BY"):
+            kind = "order" if keyword == "ORDER BY" else "group"
+            for item in text.split(","):
+                m = _PLAIN_COLUMN.match(item.strip())
+                if m and not m.group(2).isdigit() and m.group(2).lower() not in _KEYWORDS:
+                    uses.append((m.group(1), m.group(2), kind))
+    return {"tables": tables, "uses": uses}
+
+def _resolve(qualifier, column, tables, columns_by_table):
+    """Table owning a column reference, or None when it cannot be told"""
+    if qualifier:
+        return tables.get(qualifier)
+    candidates = sorted(set(tables.values()))
+    if columns_by_table:
+        candidates = [t for t in candidates if column.lower() in columns_by_table.get(t, ())]
+    return candidates[0] if len(candidates) == 1 else None
+
+# ---------------------------
+# Aggregation
+# ---------------------------
+INDEXABLE = ("eq", "range", "like", "join", "order", "group")
+
+def aggregate(entries, columns_by_table=None):
+    """
+    Per-column usage counts and latency, plus composite (equality columns,
+    then one range/sort column) candidates per table.
+    """
+    # statements: those an index on the column could serve; unusable: function/wildcard uses
+    columns = defaultdict(lambda: {"kinds": defaultdict(int), "statements": set(), "unusable": set()})
+    composites = defaultdict(lambda: {"statements": set()})
+    latencies = []
+    unresolved = 0
+    for index, entry in enumerate(entries):
+        latencies.append(float(entry.get("latency_ms") or 0.0))
+        parsed = parse_statement(entry["sql"])
+        per_table = defaultdict(lambda: {"eq": [], "tail": None})
+        for qualifier, column, kind in parsed["uses"]:
+            table = _resolve(qualifier, column, parsed["tables"], columns_by_table)
+            if table is None:
+                unresolved += 1
+                continue
+            key = (table, column.lower())
+            columns[key]["kinds"][kind] += 1
+            columns[key]["statements" if kind in INDEXABLE else "unusable"].add(index)
+            shape = per_table[table]
+            if kind == "eq" and column.lower() not in shape["eq"]:
+                shape["eq"].append(column.lower())
+            elif kind in ("range", "like", "order") and shape["tail"] is None:
+                shape["tail"] = column.lower()
+        for table, shape in per_table.items():
+            candidate = tuple(sorted(shape["eq"])) + ((shape["tail"],) if shape["tail"] and shape["tail"] not in shape["eq"] else ())
+            if len(candidate) > 1:
+                composites[(table, candidate)]["statements"].add(index)
+    return {"columns": columns, "composites": composites, "latencies": latencies, "unresolved": unresolved}
+
+# ---------------------------
+# Existing Indexes
+# ---------------------------
+def load_catalog():
+    """
+    Existing indexes (table -> list of column tuples) and columns per table
+    from information_schema, over the backend's shared engine.
+    """
+    from sqlalchemy import text
+    from db import get_engine
+
+    indexes = defaultdict(dict)
+    columns_by_table = defaultdict(set)
+    with get_engine().connect() as conn:
+        rows = conn.execute(text(
+            "SELECT TABLE_NAME, INDEX_NAME, COLUMN_NAME FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX"
+        ))
+        for table, index_name, column in rows:
+            indexes[table].setdefault(index_name, []).append((column or "").lower())
+        rows = conn.execute(text(
+            "SELECT TABLE_NAME, COLUMN_NAME FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE()"
+        ))
+        for table, column in rows:
+            columns_by_table[table].add(column.lower())
+    return {table: [tuple(cols) for cols in by_name.values()] for table, by_name in indexes.items()}, columns_by_table
+
+def is_covered(indexes, table, columns):
+    """True when an existing index starts with these columns (equality columns in any order)"""
+    *eq, last = columns
+    for index in indexes.get(table, ()):
+        if len(index) < len(columns):
+            continue
+        if set(index[:len(eq)]) == set(eq) and index[len(eq)] == last:
+            return True
+    return False
+
+# ---------------------------
+# Recommendations
+# ---------------------------
+# Without the catalog, columns with these names are taken to be primary keys
+# (every table in this schema has an `id` primary key)
+PRIMARY_KEY_NAMES = {"id"}
+
+def _already_indexed(indexes, table, columns):
+    """Covered by an existing index; offline, anything involving a primary-key column"""
+    if indexes is None:
+        return any(column in PRIMARY_KEY_NAMES for column in columns)
+    return is_covered(indexes, table, columns)
+
+def _share(statements, latencies, total):
+    return sum(latencies[i] for i in statements) / total if total else 0.0
+
+def recommend(usage, indexes=None, min_statements=2):
+    """Ranked index recommendations and non-sargable predicates"""
+    latencies = usage["latencies"]
+    total = sum(latencies)
+    recommendations, unusable = [], []
+
+    for (table, column), info in usage["columns"].items():
+        kinds = info["kinds"]
+        if info["unusable"]:
+            unusable.append({
+                "table": table, "column": column, "share": _share(info["unusable"], latencies, total), "kinds": dict(kinds),
+            })
+        if len(info["statements"]) < min_statements:
+            continue
+        if _already_indexed(indexes, table, (column,)):
+            continue
+        recommendations.append({
+            "table": table, "columns": (column,), "share": _share(info["statements"], latencies, total),
+            "statements": len(info["statements"]), "kinds": dict(kinds), "verified": indexes is not None,
+        })
+
+    for (table, columns), info in usage["composites"].items():
+        if len(info["statements"]) < min_statements:
+            continue
+        if _already_indexed(indexes, table, columns):
+            continue
+        recommendations.append({
+            "table": table, "columns": columns, "share": _share(info["statements"], latencies, total),
+            "statements": len(info["statements"]), "kinds": {"composite": len(info["statements"])},
+            "verified": indexes is not None,
+        })
+
+    # A recommended composite already serves lookups on its leading column
+    leading = {(r["table"], r["columns"][0]) for r in recommendations if len(r["columns"]) > 1}
+    recommendations = [r for r in recommendations if len(r["columns"]) > 1 or (r["table"], r["columns"][0]) not in leading]
+    recommendations.sort(key=lambda r: (r["share"], r["statements"], len(r["columns"])), reverse=True)
+    unusable.sort(key=lambda u: u["share"], reverse=True)
+    return recommendations, unusable
+
+def _ddl(table, columns):
+    name = f"idx_{table}_{'_'.join(columns)}"[:64]
+    return f"CREATE INDEX {name} ON {table} ({', '.join(columns)});"
+
+def print_report(entries, usage, recommendations, unusable, top, offline):
+    total_ms = sum(usage["latencies"])
+    print(f"📊 {len(entries)} logged statements, {total_ms / 1000:.1f}s total latency")
+    if usage["unresolved"]:
+        print(f"   ({usage['unresolved']} column references could not be tied to a table)")
+    if offline:
+        print("⚠️  Offline: recommendations are unverified against existing indexes "
+              f"(only {', '.join(sorted(PRIMARY_KEY_NAMES))} columns are assumed to be primary keys)")
+
+    verified = "unverified, " if offline else ""
+    print(f"\n📋 Top {min(top, len(recommendations))} index recommendations ({verified}by share of logged latency):")
+    for rank, rec in enumerate(recommendations[:top], 1):
+        uses = ", ".join(f"{kind} {count}" for kind, count in sorted(rec["kinds"].items(), key=lambda kv: -kv[1]))
+        print(f"{rank:>3}. {rec['table']}({', '.join(rec['columns'])})  {rec['share']:6.1%}  "
+              f"{rec['statements']} statements  [{uses}]")
+        print(f"     {_ddl(rec['table'], rec['columns'])}")
+    if not recommendations:
+        print("   ✅ Nothing to add: every frequently used column leads an index")
+
+    if unusable:
+        print("\n🔍 Predicates no index can serve (functions on the column or leading wildcards):")
+        for item in unusable[:top]:
+            kinds = ", ".join(f"{kind} {count}" for kind, count in item["kinds"].items() if kind in ("function", "wildcard"))
+            print(f"   {item['table']}.{item['column']}  {item['share']:6.1%}  [{kinds}]")
+
+def main():
+    parser = argparse.ArgumentParser(description="Recommend MySQL indexes from the chatbot's executed-SQL log")
+    parser.add_argument("--log", default=DEFAULT_LOG, help="Executed-SQL JSONL log")
+    parser.add_argument("--top", type=int, default=20, help="Recommendations to print")
+    parser.add_argument("--min-statements", type=int, default=2, help="Ignore columns used by fewer statements")
+    parser.add_argument("--offline", action="store_true", help="Do not connect to MySQL for existing indexes")
+    args = parser.parse_args()
+
+    entries = read_log(args.log)
+    if not entries:
+        print(f"❌ No logged statements in {args.log}")
+        sys.exit(1)
+
+    indexes, columns_by_table = None, None
+    if not args.offline:
+        print("🔗 Reading existing indexes from information_schema...")
+        indexes, columns_by_table = load_catalog()
+
+    usage = aggregate(entries, columns_by_table)
+    recommendations, unusable = recommend(usage, indexes, args.min_statements)
+    print_report(entries, usage, recommendations, unusable, args.top, args.offline)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+# Backend modules import each other as top-level modules (see backend/ai_agent.py)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, "backend"))
+sys.path.append(os.path.join(ROOT, "scripts"))
+
+
+@pytest.fixture(scope="session")
+def agent():
+    """The ai_agent module, imported with a placeholder OpenAI key and the SQL log disabled"""
+    os.environ.setdefault("OPENAI_API_KEY", "test-key")
+    os.environ.setdefault("SQL_LOG_PATH", "")
+    try:
+        import ai_agent
+    except Exception as e:  # before warm-up became lazy, importing connects to MySQL
+        pytest.skip(f"ai_agent cannot be imported here: {e}")
+    return ai_agent
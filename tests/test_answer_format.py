@@ -0,0 +1,43 @@
+from datetime import date, datetime
+
+from answer_format import format_answer, format_label, format_value
+
+
+def test_labels_come_from_column_names_and_aggregates():
+    assert format_label("b.branch_name") == "Branch Name"
+    assert format_label("`city`") == "City"
+    assert format_label("COUNT(*)") == "Count"
+    assert format_label("avg(budget)") == "Average"
+
+
+def test_values_are_formatted_for_reading():
+    assert format_value(1234567) == "1,234,567"
+    assert format_value(2.5) == "2.50"
+    assert format_value(3.0) == "3"
+    assert format_value(None) == "-"
+    assert format_value(True) == "Yes"
+    assert format_value(datetime(2024, 5, 1, 9, 30)) == "2024-05-01 09:30"
+    assert format_value(date(2024, 5, 1)) == "2024-05-01"
+
+
+def test_scalar_and_single_row_results():
+    assert format_answer(["COUNT(*)"], [(1520,)]) == "Count: 1,520"
+    assert format_answer(["name", "city"], [("Andheri", "Mumbai")]) == "Name: Andheri; City: Mumbai"
+
+
+def test_small_tables_render_as_markdown():
+    answer = format_answer(["name", "calls"], [("Andheri", 1200), ("Dadar|West", 3)])
+
+    assert answer.splitlines() == [
+        "Found 2 results:",
+        "",
+        "| Name | Calls |",
+        "|---|---|",
+        "| Andheri | 1,200 |",
+        "| Dadar/West | 3 |",
+    ]
+
+
+def test_empty_and_large_results_are_left_to_the_llm():
+    assert format_answer(["name"], []) is None
+    assert format_answer(["name"], [(f"Branch {i}",) for i in range(21)], max_rows=20) is None
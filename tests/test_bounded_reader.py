@@ -0,0 +1,24 @@
+def test_stops_at_the_row_cap_and_marks_truncation(agent):
+    reader = agent.BoundedReader(max_rows=3, max_bytes=10_000)
+
+    assert reader.add([(1,), (2,)])
+    assert not reader.add([(3,), (4,)])
+    assert reader.rows == [(1,), (2,), (3,)]
+    assert reader.truncated
+
+
+def test_stops_at_the_byte_cap_but_keeps_at_least_one_row(agent):
+    reader = agent.BoundedReader(max_rows=100, max_bytes=25)
+
+    assert not reader.add([("x" * 40,), ("y",)])
+    assert reader.rows == [("x" * 40,)]
+    assert reader.truncated
+
+
+def test_exhausted_results_are_not_truncated(agent):
+    reader = agent.BoundedReader(max_rows=3, max_bytes=10_000)
+
+    assert reader.add([(1,), (2,), (3,)])
+    assert not reader.add([])
+    assert reader.rows == [(1,), (2,), (3,)]
+    assert not reader.truncated
@@ -0,0 +1,67 @@
+import time
+
+from cache import TTLCache, canonical_question_key, canonicalize_text
+
+
+def test_get_returns_stored_value_and_counts_hits():
+    cache = TTLCache(max_size=4, ttl=60)
+    cache.set("a", 1)
+
+    assert cache.get("a") == 1
+    assert cache.get("missing", "default") == "default"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hit_ratio"] == 0.5
+
+
+def test_expired_entries_are_dropped(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = TTLCache(max_size=4, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=100)
+
+    now[0] += 11
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert len(cache) == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_least_recently_used_entry_is_evicted_first():
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_pop_and_clear():
+    cache = TTLCache(max_size=4, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    assert cache.pop("a") == 1
+    assert cache.pop("a", "gone") == "gone"
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_canonical_keys_fold_case_punctuation_and_whitespace():
+    assert canonicalize_text("  How many   Branches?! ") == "how many branches"
+    assert canonicalize_text(None) == ""
+    assert canonical_question_key("How many branches?") == canonical_question_key("how many  branches")
+    assert canonical_question_key("branches", "Mumbai") != canonical_question_key("branches", "Pune")
+
+
+def test_canonical_keys_keep_comparison_operators_and_numbers():
+    assert canonical_question_key("campaigns with budget > 100000") != canonical_question_key("campaigns with budget < 100000")
+    assert canonical_question_key("campaigns with budget >= 100000") != canonical_question_key("campaigns with budget > 100000")
+    assert canonical_question_key("budget over 2.5") != canonical_question_key("budget over 25")
+    assert canonical_question_key("growth above 5%") != canonical_question_key("growth above 5")
+    assert canonical_question_key("budget>100,000") == canonical_question_key("budget > 100000")
+    assert canonicalize_text("Calls since 2024-01-01.") == "calls since 2024-01-01"
@@ -0,0 +1,115 @@
+from datetime import datetime
+
+from cost_guard import CostGuard, inject_date_range, parse_active_hours, summarize_plan
+
+COLUMNS = ["id", "select_type", "table", "type", "key", "rows", "filtered"]
+
+
+def scan(table, rows, join_type="ALL", key=None, filtered=100.0, select_id=1):
+    return (select_id, "SIMPLE", table, join_type, key, rows, filtered)
+
+
+def summary_of(*rows):
+    return summarize_plan(COLUMNS, rows)
+
+
+def test_summary_estimates_nested_loop_rows_examined():
+    summary = summary_of(scan("b", 1000, filtered=10.0), scan("c", 1, join_type="eq_ref", key="PRIMARY"))
+
+    assert summary["rows_examined"] == 1000 + 100
+    assert summary["full_scans"] == ["b"]
+    assert [t["table"] for t in summary["tables"]] == ["b", "c"]
+
+
+def test_summary_ignores_rows_without_a_table():
+    assert summary_of((1, "SIMPLE", None, None, None, None, None))["tables"] == []
+
+
+def test_inject_date_range_adds_or_extends_the_where_clause():
+    assert inject_date_range("SELECT * FROM calls ORDER BY id LIMIT 10", "start_time", 30) == (
+        "SELECT * FROM calls WHERE `start_time` >= CURDATE() - INTERVAL 30 DAY ORDER BY id LIMIT 10"
+    )
+    assert inject_date_range("SELECT * FROM calls WHERE a = 1 OR b = 2 LIMIT 10", "start_time", 30) == (
+        "SELECT * FROM calls WHERE `start_time` >= CURDATE() - INTERVAL 30 DAY AND (a = 1 OR b = 2) LIMIT 10"
+    )
+
+
+def test_cheap_queries_run():
+    guard = CostGuard()
+    decision = guard.review("SELECT * FROM branch LIMIT 10", summary_of(scan("branch", 500)))
+
+    assert decision["action"] == "run"
+    assert guard.stats()["passed"] == 1
+
+
+def test_unordered_scans_are_limited():
+    guard = CostGuard(max_scan_rows=1000, rewrite_limit=20)
+    decision = guard.review("SELECT name FROM calls LIMIT 101", summary_of(scan("calls", 50000)))
+
+    assert decision["action"] == "rewrite"
+    assert decision["sql"] == "SELECT name FROM calls LIMIT 20"
+    assert not decision["recheck"]
+
+
+def test_ordered_scans_get_a_date_range_and_a_recheck():
+    guard = CostGuard(max_scan_rows=1000, date_range_days=90)
+    sql = "SELECT c.medium, COUNT(*) FROM campaigns c GROUP BY c.medium LIMIT 101"
+
+    decision = guard.review(sql, summary_of(scan("c", 50000)), date_column="created_at")
+
+    assert decision["action"] == "rewrite"
+    assert "`created_at` >= CURDATE() - INTERVAL 90 DAY" in decision["sql"]
+    assert decision["recheck"]
+    final = guard.review(decision["sql"], summary_of(scan("c", 500)), rechecked=True)
+    assert final["action"] == "run"
+    assert guard.stats()["rewritten"] == 1
+
+
+def test_expensive_joins_are_rejected():
+    guard = CostGuard(max_rows_examined=10000)
+    sql = "SELECT * FROM branch b JOIN calls c ON c.branch_id = b.id LIMIT 101"
+
+    decision = guard.review(sql, summary_of(scan("b", 1000), scan("c", 500, join_type="ref", key="branch_id")))
+
+    assert decision["action"] == "reject"
+    assert "rows examined" in decision["reason"]
+    assert guard.stats()["rejected"] == 1
+
+
+def test_outside_active_hours_only_warns():
+    guard = CostGuard(max_scan_rows=1000, active_hours=parse_active_hours("9-19"))
+
+    assert guard.is_active(datetime(2024, 1, 1, 10))
+    assert not guard.is_active(datetime(2024, 1, 1, 20))
+    assert parse_active_hours("") is None
+    overnight = CostGuard(active_hours=parse_active_hours("22-6"))
+    assert overnight.is_active(datetime(2024, 1, 1, 23)) and overnight.is_active(datetime(2024, 1, 1, 3))
+    assert not overnight.is_active(datetime(2024, 1, 1, 12))
+
+
+def test_default_thresholds_catch_a_wildcard_scan_of_cities():
+    guard = CostGuard()
+    sql = "SELECT name FROM cities WHERE LOWER(name) LIKE LOWER('%pur%') LIMIT 101"
+
+    decision = guard.review(sql, summary_of(scan("cities", 48000)))
+
+    assert decision["action"] == "rewrite"
+    assert decision["sql"].endswith("LIMIT 20")
+    assert "first 20 matching rows" in decision["note"]
+
+
+def test_full_index_scans_count_as_scans():
+    summary = summary_of(scan("cities", 48000, join_type="index", key="idx_name"))
+
+    assert summary["full_scans"] == ["cities"]
+    assert CostGuard().violations(summary)
+
+
+def test_date_range_rewrites_explain_the_window():
+    guard = CostGuard(date_range_days=90)
+    sql = "SELECT COUNT(*) FROM callcenter_calls LIMIT 101"
+
+    decision = guard.review(sql, summary_of(scan("callcenter_calls", 500000)), date_column="start_time")
+
+    assert decision["note"] == "Results cover only the last 90 days of start_time to keep the query within cost limits."
+    assert guard.review("SELECT 1 FROM branch", summary_of(scan("branch", 10)))["note"] is None
@@ -0,0 +1,71 @@
+import pytest
+
+import db
+from metrics import render_prometheus
+
+
+@pytest.fixture
+def replicas(monkeypatch):
+    pool = [db.Replica("replica-a:3306"), db.Replica("replica-b:3306")]
+    for replica in pool:
+        replica.healthy, replica.replicating, replica.lag_seconds = True, True, 1.0
+        monkeypatch.setattr(replica, "load", lambda: 0)
+    monkeypatch.setattr(db, "replicas", pool)
+    monkeypatch.setattr(db, "_primary_reads", 0)
+    return pool
+
+
+def test_picking_does_not_count_until_a_read_is_recorded(replicas):
+    for _ in range(5):
+        db.pick_replica()
+
+    assert [r.picks for r in replicas] == [0, 0]
+    assert db.replica_stats()["primary_reads"] == 0
+
+
+def test_recorded_reads_spread_over_replicas(replicas):
+    for _ in range(4):
+        db.record_read(db.pick_replica())
+
+    assert [r.picks for r in replicas] == [2, 2]
+
+
+def test_fresh_reads_and_unroutable_replicas_go_to_the_primary(replicas):
+    replicas[0].lag_seconds = db.MYSQL_REPLICA_MAX_LAG + 1
+    replicas[1].healthy = False
+
+    assert db.pick_replica() is None
+    db.record_read(db.pick_replica(fresh=True))
+    assert db.replica_stats()["primary_reads"] == 1
+
+
+def test_uncounted_engines_leave_routing_counts_alone(replicas, monkeypatch):
+    monkeypatch.setattr(db.Replica, "engine", lambda self: f"engine:{self.name}")
+
+    assert db.get_read_engine(count=False) == "engine:replica-a:3306"
+    assert [r.picks for r in replicas] == [0, 0]
+    db.get_read_engine()
+    assert [r.picks for r in replicas] == [1, 0]
+
+
+def test_replica_pools_are_timed_separately_from_the_primary(tmp_path):
+    replica = db.Replica(f"sqlite:///{tmp_path / 'replica.db'}")
+    primary_checkouts = db.TimedQueuePool.metrics.wait.snapshot()["count"]
+
+    with replica.engine().connect() as conn:
+        conn.execute(db.text("SELECT 1"))
+
+    assert isinstance(replica.engine().pool, db.TimedQueuePool)
+    assert replica.pool_stats()["sync"]["checkout_wait"]["count"] == 1
+    assert db.TimedQueuePool.metrics.wait.snapshot()["count"] == primary_checkouts
+    replica.engine().dispose()
+
+
+def test_pool_gauges_are_labelled_per_server(replicas):
+    stats = db.pool_stats()
+    servers = {"primary": {"sync": stats["sync"]}, **stats["replicas"]}
+
+    rendered = render_prometheus(pools=servers)
+
+    assert 'nlsql_db_pool_utilization{server="primary",pool="sync"}' in rendered
+    assert 'nlsql_db_pool_checkout_timeouts_total{server="replica-b:3306",pool="async"} 0' in rendered
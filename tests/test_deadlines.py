@@ -0,0 +1,95 @@
+import asyncio
+import contextvars
+from contextlib import asynccontextmanager
+
+import pytest
+
+
+class FakeResult:
+    def __init__(self, value):
+        self.value = value
+
+    def scalar(self):
+        return self.value
+
+
+class FakeServer:
+    """Async engine whose streamed statements never finish"""
+
+    def __init__(self):
+        self.statements = []
+        self.streaming = asyncio.Event()
+
+    @asynccontextmanager
+    async def connect(self):
+        yield self
+
+    async def execute(self, statement):
+        self.statements.append(str(statement))
+        return FakeResult(42)
+
+    async def stream(self, statement, params=None, execution_options=None):
+        self.statements.append(str(statement))
+        self.streaming.set()
+        await asyncio.Event().wait()
+
+
+def in_request(agent, fn, seconds):
+    """Run fn under a request deadline without leaking it into other tests"""
+    def run():
+        agent.start_deadline(seconds)
+        return fn()
+    return contextvars.copy_context().run(run)
+
+
+def test_queries_get_the_shorter_of_query_timeout_and_budget_left(agent, monkeypatch):
+    monkeypatch.setattr(agent, "QUERY_TIMEOUT_SECONDS", 30)
+
+    assert agent.remaining_budget() is None
+    assert agent._with_deadline("SELECT 1") == "SELECT /*+ MAX_EXECUTION_TIME(30000) */ 1"
+    hinted = in_request(agent, lambda: agent._with_deadline("SELECT 1"), seconds=2)
+    assert hinted.startswith("SELECT /*+ MAX_EXECUTION_TIME(")
+    assert int(hinted.split("(")[1].split(")")[0]) <= 2000
+
+
+def test_server_timeouts_are_recognised(agent):
+    assert agent._is_query_timeout(Exception("(3024, 'Query execution was interrupted, maximum statement execution time exceeded')"))
+    assert not agent._is_query_timeout(Exception("(1146, \"Table 'x' doesn't exist\")"))
+
+
+def test_work_past_the_budget_is_cancelled(agent):
+    async def run():
+        agent.start_deadline(0.05)
+        await agent._within_budget(asyncio.sleep(5))
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(run())
+
+
+def test_cancelled_reads_kill_the_query_on_the_server(agent, monkeypatch):
+    server = FakeServer()
+    monkeypatch.setattr(agent, "async_engine_for", lambda target: server)
+    monkeypatch.setattr(agent, "record_read", lambda target: None)
+
+    async def run():
+        task = asyncio.create_task(agent._stream_into(agent.BoundedReader(), "SELECT SLEEP(60)", None))
+        await server.streaming.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+
+    assert server.statements[0] == "SELECT CONNECTION_ID()"
+    assert "MAX_EXECUTION_TIME" in server.statements[1]
+    assert server.statements[-1] == "KILL QUERY 42"
+
+
+def test_failed_kills_are_reported_not_raised(agent, capsys):
+    class Unreachable:
+        def connect(self):
+            raise ConnectionError("server gone")
+
+    asyncio.run(agent._kill_query(Unreachable(), 42))
+
+    assert "Could not kill query on MySQL connection 42" in capsys.readouterr().out
@@ -0,0 +1,114 @@
+import json
+from datetime import date
+
+from fast_path import FastPathRouter
+
+
+def _router_with_cities(*cities):
+    router = FastPathRouter.from_config()
+    router.load_vocabulary("city", cities)
+    return router
+
+
+def test_matches_catalogued_question_with_parameters():
+    router = _router_with_cities("Mumbai", "Navi Mumbai")
+
+    route, params = router.match("Please, how many active branches are there in Navi Mumbai?")
+
+    assert route["name"] == "active_branches_in_city"
+    assert params == {"city": "Navi Mumbai"}
+
+
+def test_specific_routes_win_over_general_ones():
+    router = FastPathRouter.from_config()
+
+    assert router.match("how many active branches")[0]["name"] == "active_branch_count"
+    assert router.match("how many branches in the database")[0]["name"] == "branch_count"
+
+
+def test_year_parameters_become_a_date_range():
+    router = FastPathRouter.from_config()
+
+    route, params = router.match("total calls in 2024")
+
+    assert route["name"] == "calls_in_year"
+    assert params == {"year": 2024, "year_start": date(2024, 1, 1), "year_end": date(2025, 1, 1)}
+
+
+def test_unknown_questions_miss():
+    router = FastPathRouter.from_config()
+
+    assert router.match("which campaign converted best last quarter") is None
+    assert router.stats()["misses"] == 1
+
+
+def test_render_answer_formats_values_and_empty_results():
+    router = FastPathRouter.from_config()
+    route, params = router.match("show campaigns with budget over 50000")
+
+    assert router.render_answer(route, params, [("Diwali",), ("Summer",)]) == (
+        "Found 2 campaigns with a budget over 50,000: Diwali, Summer."
+    )
+    assert router.render_answer(route, params, []) == "No campaigns have a budget over 50,000."
+
+
+def test_config_file_overrides_routes_by_name(tmp_path):
+    path = tmp_path / "routes.json"
+    path.write_text(json.dumps([{
+        "name": "city_count",
+        "patterns": ["how many towns"],
+        "sql": "SELECT COUNT(*) FROM cities",
+        "answer": "{value} towns.",
+    }]))
+    router = FastPathRouter.from_config(str(path))
+
+    assert router.match("how many towns")[0]["name"] == "city_count"
+    assert router.match("how many cities") is None
+    assert router.stats()["hits_by_route"] == {"city_count": 1}
+
+
+def test_trailing_courtesy_is_not_part_of_the_city():
+    router = _router_with_cities("Pune")
+
+    route, params = router.match("show active branches in Pune please")
+
+    assert route["name"] == "list_active_branches_in_city"
+    assert params == {"city": "Pune"}
+
+
+def test_cities_bind_only_to_known_names_spelled_as_stored():
+    router = _router_with_cities("Mumbai", "Pune", "Navi-Mumbai")
+
+    assert router.match("how many branches in navi-mumbai")[1] == {"city": "Navi-Mumbai"}
+    assert router.match("How many branches in Mumbai and Pune?") is None
+    assert router.match("how many branches in mumbai without an email") is None
+    assert router.match("count active branches in mumbai opened recently") is None
+    assert router.match("list active branches in Mumbai today") is None
+
+
+def test_city_routes_miss_until_the_vocabulary_is_loaded():
+    router = FastPathRouter.from_config()
+
+    assert router.match("how many branches in Mumbai") is None
+    assert router.match("how many branches in the database")[0]["name"] == "branch_count"
+
+
+def test_zero_and_empty_city_results_fall_through():
+    router = _router_with_cities("Mumbai")
+    count_route, _ = router.match("how many active branches in Mumbai")
+    list_route, _ = router.match("list active branches in Mumbai")
+    budget_route, _ = router.match("show campaigns with budget over 100")
+
+    assert router.falls_through(count_route, [(0,)])
+    assert router.falls_through(list_route, [])
+    assert not router.falls_through(count_route, [(3,)])
+    assert not router.falls_through(budget_route, [])
+    assert router.stats()["fall_throughs"] == 2
+
+
+def test_amounts_bind_integers_only():
+    router = FastPathRouter.from_config()
+
+    assert router.match("Show campaigns with budget over 100,000")[1] == {"amount": 100000}
+    assert router.match("Show campaigns with budget over 2.5") is None
+    assert router.match("Show campaigns with budget over 100 000") is None
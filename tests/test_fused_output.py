@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+
+def fused(**overrides):
+    payload = {
+        "intent": "count_records",
+        "tables": ["branch"],
+        "entities": "None",
+        "filters": "status = 1",
+        "aggregation": "COUNT",
+        "normalized_question": "How many active branches are there?",
+        "sql": "SELECT COUNT(*)\nFROM branch WHERE status = 1",
+    }
+    payload.update(overrides)
+    return json.dumps(payload)
+
+
+def test_parses_fenced_json_into_sql_and_normalized_info(agent):
+    plan = agent.parse_fused_output(f"```json\n{fused()}\n```")
+
+    assert plan["sql"] == "SELECT COUNT(*) FROM branch WHERE status = 1"
+    assert plan["normalized_info"].splitlines() == [
+        "Intent: count_records",
+        "Tables: branch",
+        "Entities: None",
+        "Filters: status = 1",
+        "Aggregation: COUNT",
+        "Normalized Question: How many active branches are there?",
+    ]
+
+
+def test_accepts_tables_as_a_comma_separated_string(agent):
+    plan = agent.parse_fused_output("Here you go: " + fused(tables="branch, cities"))
+
+    assert "Tables: branch, cities" in plan["normalized_info"]
+
+
+@pytest.mark.parametrize("raw, message", [
+    ("SELECT 1", "not a JSON object"),
+    (fused(sql=""), "missing fields: sql"),
+    (fused(tables=[]), "missing fields: tables"),
+    (fused(sql="SELECT COUNT(*) FROM campaigns"), "does not reference"),
+    (fused(sql="DELETE FROM branch"), "must start with SELECT"),
+])
+def test_rejects_incomplete_or_unsafe_output(agent, raw, message):
+    with pytest.raises(ValueError, match=message):
+        agent.parse_fused_output(raw)
@@ -0,0 +1,48 @@
+import asyncio
+
+from health import HealthProber
+
+
+def failing():
+    raise ConnectionError("connection refused")
+
+
+def test_unprobed_dependencies_have_no_status():
+    prober = HealthProber()
+    prober.add_probe("database", lambda: None, interval=30)
+
+    assert prober.snapshot() == {"database": None}
+
+
+def test_probe_records_health_error_and_latency():
+    prober = HealthProber()
+    prober.add_probe("database", lambda: None, interval=30)
+    prober.add_probe("openai", failing, interval=60)
+
+    results = prober.probe_all()
+    snapshot = prober.snapshot()
+
+    assert results["database"]["healthy"] and results["database"]["error"] is None
+    assert not results["openai"]["healthy"]
+    assert results["openai"]["error"] == "connection refused"
+    assert snapshot["openai"]["latency"]["count"] == 1
+    assert snapshot["openai"]["latency"]["success_rate"] == 0.0
+
+
+def test_background_loops_probe_on_their_interval_until_stopped():
+    calls = []
+    prober = HealthProber()
+    prober.add_probe("database", lambda: calls.append(1), interval=0.01)
+
+    async def run():
+        prober.start()
+        prober.start()  # already running: no second loop
+        await asyncio.sleep(0.1)
+        await prober.stop()
+
+    asyncio.run(run())
+    stopped_at = len(calls)
+
+    assert stopped_at >= 2
+    assert prober.snapshot()["database"]["healthy"]
+    assert len(calls) == stopped_at
@@ -0,0 +1,77 @@
+import json
+
+from index_advisor import aggregate, is_covered, parse_statement, read_log, recommend
+
+LOG = [
+    {"sql": "SELECT /*+ MAX_EXECUTION_TIME(1000) */ COUNT(*) FROM callcenter_calls "
+            "WHERE start_time >= '2024-01-01' LIMIT 101", "latency_ms": 500},
+    {"sql": "SELECT COUNT(*) FROM callcenter_calls cc WHERE cc.start_time >= '2024-01-01' AND cc.user_id = 3",
+     "latency_ms": 300},
+    {"sql": "SELECT b.name FROM branch b JOIN cities c ON b.city_id = c.id "
+            "WHERE b.status = 1 AND LOWER(c.name) LIKE LOWER('%mumbai%') LIMIT 101", "latency_ms": 100},
+    {"sql": "SELECT b.name FROM branch b JOIN cities c ON b.city_id = c.id WHERE c.name LIKE '%pune%'",
+     "latency_ms": 100},
+]
+
+
+def recommended(recommendations):
+    return [(r["table"], r["columns"]) for r in recommendations]
+
+
+def test_parse_statement_classifies_column_uses():
+    parsed = parse_statement(
+        "SELECT EXTRACT(YEAR FROM b.created_at) FROM branch b JOIN cities c ON b.city_id = c.id "
+        "WHERE b.status = 1 AND DATE(b.created_at) = '2024-01-01' AND c.name LIKE '%pu%' "
+        "AND b.zone_id BETWEEN 1 AND 3 ORDER BY b.name"
+    )
+
+    assert parsed["tables"] == {"branch": "branch", "b": "branch", "cities": "cities", "c": "cities"}
+    assert set(parsed["uses"]) == {
+        ("b", "city_id", "join"), ("c", "id", "join"), ("b", "status", "eq"),
+        ("b", "created_at", "function"), ("c", "name", "wildcard"), ("b", "zone_id", "range"),
+        ("b", "name", "order"),
+    }
+
+
+def test_read_log_reads_rotated_file_first_and_skips_bad_lines(tmp_path):
+    path = tmp_path / "executed_sql.jsonl"
+    (tmp_path / "executed_sql.jsonl.1").write_text(json.dumps({"sql": "SELECT 1"}) + "\n", encoding="utf-8")
+    path.write_text("not json\n" + json.dumps({"sql": "SELECT 2"}) + "\n", encoding="utf-8")
+
+    assert [entry["sql"] for entry in read_log(str(path))] == ["SELECT 1", "SELECT 2"]
+
+
+def test_recommendations_rank_by_latency_share():
+    recommendations, unusable = recommend(aggregate(LOG), min_statements=1)
+
+    assert recommendations[0]["table"] == "callcenter_calls"
+    assert recommendations[0]["columns"] == ("start_time",)
+    assert recommendations[0]["share"] == 0.8
+    assert ("callcenter_calls", ("user_id", "start_time")) in recommended(recommendations)
+    assert [(u["table"], u["column"]) for u in unusable] == [("cities", "name")]
+
+
+def test_offline_recommendations_skip_primary_keys():
+    recommendations, _ = recommend(aggregate(LOG), min_statements=1)
+
+    assert ("cities", ("id",)) not in recommended(recommendations)
+    assert not any("id" in r["columns"] for r in recommendations)
+    assert not any(r["verified"] for r in recommendations)
+
+
+def test_existing_indexes_are_not_recommended_again():
+    indexes = {"callcenter_calls": [("start_time",)], "branch": [("id",), ("city_id", "status")], "cities": [("id",)]}
+
+    recommendations, _ = recommend(aggregate(LOG), indexes, min_statements=1)
+
+    assert ("callcenter_calls", ("start_time",)) not in recommended(recommendations)
+    assert ("branch", ("city_id",)) not in recommended(recommendations)
+    assert all(r["verified"] for r in recommendations)
+
+
+def test_is_covered_accepts_equality_columns_in_any_order():
+    indexes = {"calls": [("user_id", "branch_id", "start_time")]}
+
+    assert is_covered(indexes, "calls", ("branch_id", "user_id", "start_time"))
+    assert is_covered(indexes, "calls", ("user_id",))
+    assert not is_covered(indexes, "calls", ("start_time",))
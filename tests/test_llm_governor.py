@@ -0,0 +1,140 @@
+import asyncio
+
+import pytest
+
+import llm_governor
+from llm_governor import LLMGovernor, is_rate_limit_error
+
+
+class _Response:
+    def __init__(self, status_code=500, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class APITimeoutError(Exception):
+    pass
+
+
+class InternalServerError(Exception):
+    def __init__(self, headers=None):
+        super().__init__("server error")
+        self.response = _Response(503, headers)
+
+
+class RateLimitError(Exception):
+    def __init__(self, headers=None):
+        super().__init__("slow down")
+        self.response = _Response(429, headers)
+
+
+def flaky(errors, result="ok"):
+    remaining = list(errors)
+
+    def fn():
+        if remaining:
+            raise remaining.pop(0)
+        return result
+    return fn
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    slept = []
+    monkeypatch.setattr(llm_governor.time, "sleep", slept.append)
+    return slept
+
+
+def test_rate_limit_errors_are_recognised():
+    assert is_rate_limit_error(RateLimitError())
+    assert not is_rate_limit_error(InternalServerError())
+
+
+def test_transient_errors_back_off_exponentially_with_jitter():
+    governor = LLMGovernor(retry_base=1.0, retry_max=5.0)
+
+    for attempt, ceiling in enumerate([1.0, 2.0, 4.0, 5.0, 5.0]):
+        delays = [governor.retry_delay(APITimeoutError(), attempt) for _ in range(50)]
+        assert all(ceiling / 2 <= d <= ceiling for d in delays)
+        assert len(set(delays)) > 1
+
+
+def test_retry_after_header_is_honoured():
+    governor = LLMGovernor(retry_max=30.0)
+
+    assert governor.retry_delay(InternalServerError({"retry-after": "7"}), 0) == 7.0
+    assert governor.retry_delay(InternalServerError({"retry-after-ms": "250"}), 0) == 0.25
+    assert governor.retry_delay(InternalServerError({"retry-after": "600"}), 0) == 30.0
+
+
+def test_call_sleeps_between_transient_retries(sleeps):
+    governor = LLMGovernor(retry_base=1.0, max_retries=3)
+
+    result = governor.call(flaky([APITimeoutError(), InternalServerError({"retry-after": "3"})]), 10)
+
+    assert result == "ok"
+    assert governor.retries == 2
+    assert 0.5 <= sleeps[0] <= 1.0
+    assert sleeps[1] == 3.0
+
+
+def test_rate_limit_pauses_admission_instead_of_sleeping(sleeps):
+    governor = LLMGovernor(max_concurrency=8)
+
+    governor.acquire(10)
+    governor.release(10, latency_ms=5, error=RateLimitError({"retry-after": "2"}))
+
+    assert governor.retry_delay(RateLimitError(), 0) == 0.0
+    assert governor.stats()["concurrency_limit"] == 4
+    assert 1.9 <= governor.stats()["paused_for_s"] <= 2.0
+    assert sleeps == []
+
+
+def test_non_transient_errors_are_raised_without_retry(sleeps):
+    governor = LLMGovernor()
+
+    with pytest.raises(ValueError):
+        governor.call(flaky([ValueError("bad prompt")]), 10)
+    assert governor.retries == 0
+    assert sleeps == []
+
+
+def test_retries_stop_after_max_retries(sleeps):
+    governor = LLMGovernor(max_retries=2)
+
+    with pytest.raises(APITimeoutError):
+        governor.call(flaky([APITimeoutError()] * 5), 10)
+    assert governor.retries == 2
+    assert len(sleeps) == 2
+
+
+def test_acall_backs_off_without_blocking(monkeypatch):
+    governor = LLMGovernor(retry_base=0.01)
+    slept = []
+    real_sleep = asyncio.sleep
+
+    async def fake_sleep(delay):
+        slept.append(delay)
+        await real_sleep(0)
+    monkeypatch.setattr(llm_governor.asyncio, "sleep", fake_sleep)
+
+    errors = [APITimeoutError()]
+
+    async def factory():
+        if errors:
+            raise errors.pop()
+        return "ok"
+
+    assert asyncio.run(governor.acall(factory, 10)) == "ok"
+    assert len(slept) == 1 and 0.005 <= slept[0] <= 0.01
+
+
+def test_token_budget_is_reconciled_with_actual_usage():
+    governor = LLMGovernor(rpm=60, tpm=1000)
+
+    governor.acquire(400)
+    governor.release(400, actual=100, latency_ms=5)
+
+    assert governor.stats()["estimated_tokens"] == 400
+    assert governor.stats()["actual_tokens"] == 100
+    assert governor._token_tokens == pytest.approx(900, abs=1)
@@ -0,0 +1,130 @@
+import pytest
+
+from query_cache import QueryResultCache, is_cacheable, probe_versions, sql_fingerprint
+
+SQL = "SELECT name FROM branch WHERE status = 1 LIMIT 101"
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def fetchall(self):
+        return self.rows
+
+
+class FakeConnection:
+    def __init__(self, rows, fail_on=None):
+        self.rows = rows
+        self.fail_on = fail_on
+        self.statements = []
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        self.statements.append(sql)
+        if self.fail_on and self.fail_on in sql:
+            raise RuntimeError("boom")
+        return FakeResult(self.rows)
+
+
+def test_fingerprint_normalises_whitespace_keywords_and_semicolon():
+    assert sql_fingerprint("select  name\nfrom branch where city = 'Pune';") == (
+        "SELECT name FROM branch WHERE city = 'Pune'"
+    )
+    assert sql_fingerprint("SELECT 'a  b'") != sql_fingerprint("SELECT 'a b'")
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT COUNT(*) FROM callcenter_calls WHERE DATE(start_time) = CURDATE()",
+    "SELECT * FROM campaigns WHERE end_date > NOW()",
+    "SELECT * FROM campaigns WHERE end_date >= current_date",
+    "SELECT * FROM campaigns WHERE created_at > CURRENT_TIMESTAMP - INTERVAL 1 HOUR",
+    "SELECT * FROM campaigns WHERE created_at > UTC_TIMESTAMP()",
+    "SELECT CURTIME()",
+    "SELECT SYSDATE()",
+    "SELECT UUID()",
+    "SELECT * FROM branch ORDER BY RAND() LIMIT 1",
+    "SELECT UNIX_TIMESTAMP()",
+])
+def test_time_and_random_dependent_queries_are_not_cacheable(sql):
+    assert not is_cacheable(sql)
+
+
+def test_deterministic_queries_are_cacheable():
+    assert is_cacheable(SQL)
+    assert is_cacheable("SELECT UNIX_TIMESTAMP(created_at) FROM branch")
+    assert is_cacheable("SELECT current_date_col FROM branch")
+
+
+def test_lookup_hits_until_a_table_version_changes():
+    cache = QueryResultCache()
+    cache.update_versions(["branch"], {"branch": ("t1", 10, 11)}, 1.0)
+
+    ticket, cached = cache.lookup(SQL, ["branch"])
+    assert cached is None
+    cache.store(ticket, {"rows": [["A"]]}, db_ms=40)
+
+    assert cache.lookup(SQL.lower(), ["branch"])[1] == {"rows": [["A"]]}
+    cache.update_versions(["branch"], {"branch": ("t2", 11, 12)}, 1.0)
+    assert cache.lookup(SQL, ["branch"])[1] is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["stale_dropped"]) == (1, 2, 1)
+    assert stats["db_ms_saved"] == 40
+
+
+def test_uncacheable_queries_get_no_ticket():
+    cache = QueryResultCache()
+
+    assert cache.lookup("SELECT * FROM campaigns WHERE end_date > NOW()", ["campaigns"]) == (None, None)
+    assert cache.lookup(SQL, []) == (None, None)
+    assert cache.stats()["uncacheable"] == 2
+
+
+def test_versions_are_due_after_the_interval(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("query_cache.time.monotonic", lambda: now[0])
+    cache = QueryResultCache(version_interval=5)
+
+    assert cache.due_for_probe(["branch"]) == ["branch"]
+    cache.update_versions(["branch"], {}, 1.0)
+    assert cache.due_for_probe(["branch"]) == []
+    now[0] += 5
+    assert cache.due_for_probe(["branch"]) == ["branch"]
+
+
+def test_probe_restores_statistics_expiry():
+    conn = FakeConnection([("branch", "2024-01-01 00:00:00", 10, 11)])
+
+    versions = probe_versions(conn, ["branch"])
+
+    assert versions == {"branch": ("2024-01-01 00:00:00", 10, 11)}
+    assert "information_schema_stats_expiry = 0" in conn.statements[0]
+    assert "information_schema_stats_expiry = DEFAULT" in conn.statements[-1]
+
+
+def test_probe_restores_statistics_expiry_when_the_query_fails():
+    conn = FakeConnection([], fail_on="information_schema.TABLES")
+
+    with pytest.raises(RuntimeError):
+        probe_versions(conn, ["branch"])
+    assert "information_schema_stats_expiry = DEFAULT" in conn.statements[-1]
+
+
+def test_probe_skips_restore_where_statistics_are_not_cached():
+    conn = FakeConnection([], fail_on="information_schema_stats_expiry = 0")
+
+    assert probe_versions(conn, ["branch"]) == {}
+    assert not any("DEFAULT" in s for s in conn.statements)
+
+
+def test_entries_and_versions_are_kept_per_server():
+    cache = QueryResultCache()
+    cache.update_versions(["branch"], {"branch": ("t1", 10, 11)}, 1.0, source="replica-1")
+    ticket, _ = cache.lookup(SQL, ["branch"], source="replica-1")
+    cache.store(ticket, {"rows": [["stale"]]}, db_ms=5)
+
+    assert cache.due_for_probe(["branch"], source="primary") == ["branch"]
+    cache.update_versions(["branch"], {"branch": ("t1", 10, 11)}, 1.0, source="primary")
+    assert cache.lookup(SQL, ["branch"], source="primary")[1] is None
+    assert cache.lookup(SQL, ["branch"], source="replica-1")[1] == {"rows": [["stale"]]}
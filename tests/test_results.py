@@ -0,0 +1,71 @@
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from answer_format import format_value
+from results import column_type, make_result, render_for_prompt, typed_value
+
+
+def test_decimals_stay_exact():
+    assert typed_value(Decimal("1234")) == "1234"
+    assert typed_value(Decimal("1E+3")) == "1000"
+    assert typed_value(Decimal("12345678901234.57")) == "12345678901234.57"
+    assert typed_value(Decimal("1500.00")) == "1500.00"
+
+
+def test_other_values_become_json_native():
+    assert typed_value(date(2024, 1, 2)) == date(2024, 1, 2)
+    assert typed_value(datetime(2024, 1, 2, 3, 4)) == datetime(2024, 1, 2, 3, 4)
+    assert typed_value(time(9, 30)) == "09:30:00"
+    assert typed_value(timedelta(minutes=2)) == 120.0
+    assert typed_value(b"caf\xc3\xa9") == "café"
+    assert typed_value(None) is None
+
+
+def test_decimal_columns_keep_thousands_separators_in_answers():
+    assert format_value(typed_value(Decimal("1234567.50")), "decimal") == "1,234,567.50"
+    assert format_value(typed_value(Decimal("1234567")), "decimal") == "1,234,567"
+    assert format_value("9876543210") == "9876543210"
+
+
+def test_text_columns_that_look_numeric_are_left_alone():
+    assert format_value("10.5", "text") == "10.5"
+    assert format_value("2.10", None) == "2.10"
+
+
+def test_make_result_types_rows_and_counts_them():
+    result = make_result(["name", "budget"], [("Diwali", Decimal("2500.75"))], truncated=True)
+
+    assert result == {
+        "columns": ["name", "budget"],
+        "types": ["text", "decimal"],
+        "rows": [["Diwali", "2500.75"]],
+        "row_count": 1,
+        "truncated": True,
+    }
+
+
+def test_render_for_prompt_stops_at_token_budget():
+    result = make_result(["city", "branches"], [(f"City {i}", i) for i in range(200)], truncated=True)
+
+    rendered = render_for_prompt(result, max_tokens=60)
+    lines = rendered.splitlines()
+
+    assert lines[0] == "city | branches"
+    assert lines[1] == "City 0 | 0"
+    assert "more rows not shown" in lines[-2]
+    assert lines[-1] == "(more rows exist in the database than were fetched)"
+
+
+def test_decimal_columns_are_typed_consistently():
+    result = make_result(["total"], [(Decimal("1200"),), (None,), (Decimal("10.50"),)])
+
+    assert result["types"] == ["decimal"]
+    assert result["rows"] == [["1200"], [None], ["10.50"]]
+    assert column_type([None, None]) is None
+    assert make_result(["a", "b"], [])["types"] == [None, None]
+
+
+def test_render_for_prompt_formats_by_column_type():
+    result = make_result(["code", "budget"], [("1.10", Decimal("1500000.50"))])
+
+    assert render_for_prompt(result).splitlines()[1] == "1.10 | 1,500,000.50"
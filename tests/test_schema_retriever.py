@@ -0,0 +1,81 @@
+from schema_retriever import SchemaRetriever, infer_join_partners, split_schema, tokenize
+
+SCHEMA = """
+DATABASE: jetking
+
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+1. BRANCH & CENTER TABLES
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+🏢 branch - Training centers/branches
+   Columns: id, name, status (1=active), city_id, branch_email,
+            created_at
+   Purpose: Store branch location and contact information
+
+🏢 cities - City master data
+   Columns: id, name, state_id
+   Purpose: City names
+
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+2. CAMPAIGN & MARKETING TABLES
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+📢 campaigns - Marketing campaigns
+   Columns: id, name, medium, budget, start_date, end_date
+   Purpose: Track marketing spend
+
+╔════════════════════════════════════════════════════════════════════╗
+║                      QUERY WRITING GUIDELINES                       ║
+╚════════════════════════════════════════════════════════════════════╝
+
+1. Use backticks for reserved words
+"""
+
+
+def test_tokenize_stems_splits_and_expands_synonyms():
+    tokens = tokenize("How many centers in each city_id?")
+
+    assert "center" in tokens
+    assert "branch" in tokens
+    assert "city" in tokens
+    assert "how" not in tokens
+
+
+def test_split_schema_chunks_tables_and_columns():
+    database_line, chunks, guidelines = split_schema(SCHEMA)
+
+    assert database_line == "DATABASE: jetking"
+    assert set(chunks) == {"branch", "cities", "campaigns"}
+    assert chunks["branch"]["columns"] == ["id", "name", "status", "city_id", "branch_email", "created_at"]
+    assert chunks["campaigns"]["group"] == "Campaign & Marketing Tables"
+    assert guidelines == "1. Use backticks for reserved words"
+
+
+def test_join_partners_follow_id_columns():
+    _, chunks, _ = split_schema(SCHEMA)
+
+    assert infer_join_partners(chunks) == {"branch": ["cities"], "cities": [], "campaigns": []}
+
+
+def test_select_tables_ranks_matches_and_adds_join_partners():
+    retriever = SchemaRetriever(SCHEMA, top_k=1)
+
+    assert retriever.select_tables("active centers") == ["branch", "cities"]
+    assert retriever.select_tables("marketing budget by medium") == ["campaigns"]
+    assert retriever.select_tables("weather forecast") == []
+
+
+def test_schema_for_prunes_and_counts_savings():
+    retriever = SchemaRetriever(SCHEMA, top_k=1)
+
+    pruned = retriever.schema_for("marketing budget")
+    retriever.schema_for("marketing budget")
+    unmatched = retriever.schema_for("weather forecast")
+
+    assert "campaigns - Marketing campaigns" in pruned
+    assert "branch - " not in pruned
+    assert unmatched == SCHEMA
+    stats = retriever.stats()
+    assert stats["requests"] == 3
+    assert stats["pruned_requests"] == 2
+    assert stats["render_hits"] == 1
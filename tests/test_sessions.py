@@ -0,0 +1,92 @@
+import pytest
+
+from sessions import SessionStore, is_follow_up
+
+TABLES = ["branch", "campaigns", "cities", "callcenter_calls"]
+HISTORY = [{"question": "How many branches are in Mumbai?", "sql": "SELECT COUNT(*) FROM branch"}]
+
+
+@pytest.mark.parametrize("question", [
+    "now only the active ones",
+    "same for Pune",
+    "and in Delhi?",
+    "in 2023",
+    "for Pune branches",
+    "sort them by name",
+    "which of them opened last year",
+    "what about the rest",
+])
+def test_refinements_are_follow_ups(question):
+    assert is_follow_up(question, HISTORY)
+
+
+@pytest.mark.parametrize("question", [
+    "total active branches",
+    "active campaigns",
+    "branch emails",
+    "How many calls were made this year?",
+    "list all campaigns with budget over 100000",
+    "How many calls in the previous month?",
+    "Show campaigns with budget above 100000",
+    "List all students above 90 marks",
+    "Order count per branch",
+    "Which ones are active?",
+    "Group branches by city instead",
+])
+def test_standalone_questions_are_not_follow_ups(question):
+    assert not is_follow_up(question, HISTORY, TABLES)
+
+
+@pytest.mark.parametrize("question", [
+    "only those in Pune",
+    "them sorted by name",
+    "now only the active ones",
+    "which of them opened last year",
+])
+def test_back_references_win_over_question_words(question):
+    assert is_follow_up(question, HISTORY, TABLES)
+
+
+def test_a_named_subject_table_makes_a_full_question():
+    assert is_follow_up("sort by city", HISTORY, TABLES)
+    assert not is_follow_up("sort cities by name", HISTORY, TABLES)
+    assert not is_follow_up("calls in the previous month", HISTORY, TABLES)
+
+
+def test_nothing_is_a_follow_up_without_history():
+    assert not is_follow_up("same for Pune", [])
+
+
+def test_store_keeps_last_turns_per_session():
+    store = SessionStore(max_turns=2)
+    for i in range(3):
+        store.record("s1", {"question": f"q{i}"})
+
+    assert [t["question"] for t in store.history("s1")] == ["q1", "q2"]
+    assert store.last_turn("s1")["question"] == "q2"
+    assert store.history("unknown") == []
+
+
+def test_least_recently_used_sessions_are_evicted():
+    store = SessionStore(max_sessions=2)
+    store.record("a", {"question": "q"})
+    store.record("b", {"question": "q"})
+    store.history("a")
+    store.record("c", {"question": "q"})
+
+    assert store.history("b") == []
+    assert store.history("a") and store.history("c")
+    assert store.stats()["evictions"] == 1
+
+
+def test_sessions_are_evicted_to_stay_under_the_byte_budget():
+    store = SessionStore(max_bytes=400)
+    store.record("a", {"sql": "x" * 150})
+    store.record("b", {"sql": "y" * 150})
+    store.record("c", {"sql": "z" * 150})
+
+    assert store.history("a") == []
+    assert store.stats()["bytes"] <= 400
+    store.clear("b")
+    store.clear("c")
+    assert store.stats()["bytes"] == 0
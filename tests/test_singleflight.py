@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from singleflight import AsyncSingleFlight, SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return "answer"
+
+    def caller():
+        results.append(flight.do("q", slow))
+
+    threads = [threading.Thread(target=caller) for _ in range(4)]
+    threads[0].start()
+    while flight.stats()["in_flight"] == 0:
+        time.sleep(0.001)
+    for thread in threads[1:]:
+        thread.start()
+    while flight.stats()["coalesced"] < 3:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(results) == [("answer", False)] + [("answer", True)] * 3
+    assert flight.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 3}
+
+
+def test_errors_reach_the_caller_and_are_not_remembered():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        flight.do("q", fail)
+    assert flight.do("q", lambda: 42) == (42, False)
+
+
+def test_async_callers_share_one_task():
+    async def scenario():
+        flight = AsyncSingleFlight()
+        runs = []
+
+        async def work():
+            runs.append(1)
+            await asyncio.sleep(0.01)
+            return "answer"
+
+        results = await asyncio.gather(*(flight.do("q", work) for _ in range(3)))
+        return runs, results, flight.stats()
+
+    runs, results, stats = asyncio.run(scenario())
+
+    assert len(runs) == 1
+    assert results == [("answer", False), ("answer", True), ("answer", True)]
+    assert stats == {"in_flight": 0, "leaders": 1, "coalesced": 2, "abandoned": 0}
+
+
+def test_shared_task_survives_one_cancelled_caller():
+    async def scenario():
+        flight = AsyncSingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.02)
+            return "answer"
+
+        first = asyncio.ensure_future(flight.do("q", work))
+        second = asyncio.ensure_future(flight.do("q", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second, flight.stats()
+
+    result, stats = asyncio.run(scenario())
+
+    assert result == ("answer", True)
+    assert stats["abandoned"] == 0
+
+
+def test_shared_task_is_cancelled_when_every_caller_leaves():
+    async def scenario():
+        flight = AsyncSingleFlight()
+        cancelled = asyncio.Event()
+
+        async def work():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        caller = asyncio.ensure_future(flight.do("q", work))
+        await asyncio.sleep(0)
+        caller.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        await asyncio.sleep(0)
+        return flight.stats()
+
+    stats = asyncio.run(scenario())
+
+    assert stats["abandoned"] == 1
+    assert stats["in_flight"] == 0
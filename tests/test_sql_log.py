@@ -0,0 +1,51 @@
+import json
+import time
+
+from sql_log import SQLLog
+
+
+def wait_for(log, written):
+    deadline = time.monotonic() + 5
+    while log.stats()["written"] < written and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def read_lines(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_records_are_written_as_jsonl(tmp_path):
+    path = tmp_path / "logs" / "executed_sql.jsonl"
+    log = SQLLog(str(path))
+
+    log.record("SELECT 1", 12.345, "generated", rows=1)
+    log.record("SELECT nope", 3.0, "page", error="Unknown column")
+    wait_for(log, 2)
+
+    first, second = read_lines(path)
+    assert (first["sql"], first["latency_ms"], first["source"], first["rows"], first["success"]) == (
+        "SELECT 1", 12.3, "generated", 1, True
+    )
+    assert (second["success"], second["error"]) == (False, "Unknown column")
+    assert log.stats() == {"path": str(path), "written": 2, "dropped": 0, "queued": 0}
+
+
+def test_full_log_rotates_to_dot_one(tmp_path):
+    path = tmp_path / "executed_sql.jsonl"
+    path.write_text("x" * 200, encoding="utf-8")
+    log = SQLLog(str(path), max_bytes=100)
+
+    log.record("SELECT 1", 1.0, "generated")
+    wait_for(log, 1)
+
+    assert (tmp_path / "executed_sql.jsonl.1").read_text(encoding="utf-8") == "x" * 200
+    assert [entry["sql"] for entry in read_lines(path)] == ["SELECT 1"]
+
+
+def test_empty_path_disables_logging():
+    log = SQLLog("")
+
+    log.record("SELECT 1", 1.0, "generated")
+
+    assert log.stats()["queued"] == 0
+    assert log._thread is None
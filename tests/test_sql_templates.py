@@ -0,0 +1,96 @@
+from sql_templates import SQLTemplateCache, parse_normalized, template_shape
+
+BRANCH_SQL = (
+    "SELECT b.name FROM branch b JOIN cities c ON c.id = b.city_id "
+    "WHERE b.status = 1 AND LOWER(c.name) LIKE LOWER('%{city}%') "
+    "ORDER BY b.created_at DESC LIMIT {n}"
+)
+
+
+def branch_analysis(n, city, projection="names"):
+    return "\n".join([
+        "Intent: list_records",
+        "Tables: branch, cities",
+        f"Entities: location={city}, count={n}",
+        f"Filters: branch.status=1, cities.name LIKE '%{city}%'",
+        "Aggregation: None",
+        f"Normalized Question: List the {projection} of the {n} newest active branches in {city}",
+    ])
+
+
+def campaign_analysis(budget, written):
+    return "\n".join([
+        "Intent: list_records",
+        "Tables: campaigns",
+        f"Entities: budget_threshold={budget}",
+        f"Filters: status=1, budget > {budget}",
+        "Aggregation: None",
+        f"Normalized Question: List all active campaigns with budget exceeding {written}",
+    ])
+
+
+def test_parse_normalized_reads_labelled_fields():
+    fields = parse_normalized("**Intent**: count_records\nTables: branch\nFilters: status=1")
+
+    assert fields == {"intent": "count_records", "tables": "branch", "filters": "status=1"}
+
+
+def test_shape_masks_filter_values_and_row_counts():
+    key, values, counts_from = template_shape(branch_analysis(5, "Mumbai"))
+
+    assert "newest active branches in ?" in key
+    assert "the # newest" in key
+    assert "mumbai" not in key
+    assert values == ["1", "%Mumbai%", "5"]
+    assert counts_from == 2
+
+
+def test_general_queries_are_not_templated():
+    assert template_shape("Intent: general_query\nTables: branch") == (None, None, None)
+
+
+def test_lookup_binds_filter_values_and_limit_count():
+    cache = SQLTemplateCache()
+    assert cache.store(branch_analysis(5, "Mumbai"), BRANCH_SQL.format(city="Mumbai", n=5))
+
+    assert cache.lookup(branch_analysis(10, "Pune")) == BRANCH_SQL.format(city="Pune", n=10)
+
+
+def test_different_projection_does_not_reuse_template():
+    cache = SQLTemplateCache()
+    cache.store(branch_analysis(5, "Mumbai"), BRANCH_SQL.format(city="Mumbai", n=5))
+
+    assert cache.lookup(branch_analysis(5, "Pune", projection="emails")) is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_default_limit_stays_constant_when_question_has_no_count():
+    cache = SQLTemplateCache()
+    sql = "SELECT name FROM campaigns WHERE status = 1 AND budget > {budget} LIMIT 100"
+    assert cache.store(campaign_analysis(100000, "100,000"), sql.format(budget=100000))
+
+    assert cache.lookup(campaign_analysis(5000, "5,000")) == sql.format(budget=5000)
+
+
+def test_sql_with_untraceable_literals_is_not_stored():
+    cache = SQLTemplateCache()
+    sql = "SELECT name FROM campaigns WHERE status = 1 AND budget > 100000 AND medium = 'tv'"
+
+    assert not cache.store(campaign_analysis(100000, "100,000"), sql)
+    assert cache.stats()["uncacheable"] == 1
+
+
+def test_unused_row_count_is_not_stored():
+    cache = SQLTemplateCache()
+    sql = BRANCH_SQL.format(city="Mumbai", n=5).replace("LIMIT 5", "LIMIT 100")
+
+    assert not cache.store(branch_analysis(5, "Mumbai"), sql)
+
+
+def test_render_rejects_values_that_do_not_fit_their_slot():
+    cache = SQLTemplateCache()
+    template = cache.build_template("SELECT * FROM campaigns WHERE budget > 100", ["100"])
+
+    assert cache.render(template, ["250"]) == "SELECT * FROM campaigns WHERE budget > 250"
+    assert cache.render(template, ["many"]) is None
+    assert cache.render(template, ["1", "2"]) is None
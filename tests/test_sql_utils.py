@@ -0,0 +1,21 @@
+from sql_utils import referenced_tables, table_aliases
+
+
+def test_referenced_tables_skip_from_inside_functions():
+    sql = "SELECT EXTRACT(YEAR FROM b.created_at) FROM jetking.branch b JOIN cities c ON c.id = b.city_id"
+
+    assert referenced_tables(sql) == ["branch", "cities"]
+
+
+def test_table_aliases_map_aliases_and_names_to_tables():
+    sql = (
+        "SELECT * FROM jetking.branch AS b JOIN cities c ON c.id = b.city_id "
+        "LEFT JOIN states ON states.id = c.state_id WHERE b.status = 1"
+    )
+
+    assert table_aliases(sql) == {"branch": "branch", "b": "branch", "cities": "cities", "c": "cities", "states": "states"}
+
+
+def test_keywords_after_a_table_are_not_aliases():
+    assert table_aliases("SELECT * FROM branch WHERE status = 1") == {"branch": "branch"}
+    assert table_aliases("SELECT * FROM branch ORDER BY id") == {"branch": "branch"}
@@ -0,0 +1,86 @@
+import asyncio
+from contextlib import asynccontextmanager
+from decimal import Decimal
+
+from stats_service import StatsService
+
+METRICS = {
+    "total_branches": {
+        "label": "Total branches",
+        "sql": "SELECT COUNT(*) FROM branch",
+        "question": "How many branches are there?",
+        "answer": "There are {value} branches in total.",
+    },
+    "total_budget": {"label": "Total budget", "sql": "SELECT SUM(budget) FROM campaigns"},
+    "broken": {"label": "Broken", "sql": "SELECT nope"},
+}
+
+
+class FakeResult:
+    def __init__(self, value):
+        self.value = value
+
+    def first(self):
+        return (self.value,)
+
+
+class FakeConnection:
+    def __init__(self, values, executed):
+        self.values = values
+        self.executed = executed
+
+    async def execute(self, statement):
+        self.executed.append(str(statement))
+        value = self.values[str(statement)]
+        if isinstance(value, Exception):
+            raise value
+        return FakeResult(value)
+
+
+class FakeEngine:
+    def __init__(self, values):
+        self.values = values
+        self.executed = []
+
+    @asynccontextmanager
+    async def connect(self):
+        yield FakeConnection(self.values, self.executed)
+
+
+def make_service():
+    engine = FakeEngine({
+        "SELECT COUNT(*) FROM branch": 1520,
+        "SELECT SUM(budget) FROM campaigns": Decimal("2500000.50"),
+        "SELECT nope": RuntimeError("no such column"),
+    })
+    return StatsService(lambda: engine, METRICS, interval=60), engine
+
+
+def test_snapshot_is_empty_until_the_first_refresh():
+    service, engine = make_service()
+
+    assert service.snapshot() is None
+    assert engine.executed == []
+
+
+def test_refresh_runs_every_metric_once_and_keeps_failures_apart():
+    service, engine = make_service()
+
+    asyncio.run(service.refresh())
+    snapshot = service.snapshot()
+
+    assert len(engine.executed) == 3
+    assert snapshot["metrics"]["total_branches"]["value"] == 1520
+    assert snapshot["metrics"]["total_budget"]["answer"] == "Total budget: 2,500,000.50"
+    assert "no such column" in snapshot["metrics"]["broken"]["error"]
+    assert snapshot["age_seconds"] >= 0
+
+
+def test_answers_keep_the_question_to_sentence_shape():
+    service, _ = make_service()
+    asyncio.run(service.refresh())
+
+    assert StatsService.answers(service.snapshot()) == {
+        "How many branches are there?": "There are 1,520 branches in total.",
+        "Total budget": "Total budget: 2,500,000.50",
+    }